@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+import requests
+import threading
+
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from db.records import get_scrape_date
+from utils import metrics
+from utils.http import get_session
+
+CACHE_PATH = Path("cache/apis")
+
+
+def get_key(value):
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False, default=str)
+    tmp_path.replace(path)
+
+
+@metrics.timed("http_get")
+def conditional_get(url, timeout=None):
+    """
+    GETs the url, sending the validators stored by the previous run. The returned
+    response carries a `sha256` attribute, the hash of its body, or None if the
+    request failed.
+    """
+    key = get_key(url)
+    meta_path = CACHE_PATH / "http" / f"{key}.json"
+    body_path = CACHE_PATH / "http" / f"{key}.body"
+
+    meta = read_json(meta_path)
+    headers = {}
+    if meta and body_path.exists():
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = get_session(url).get(url, headers=headers, timeout=timeout)
+
+    if response.status_code == 304 and headers:
+        # Rebuild the response from the cached body
+        cached = requests.Response()
+        cached.status_code = 200
+        cached.url = url
+        cached.encoding = meta.get("encoding")
+        cached.headers.update(response.headers)
+        cached._content = body_path.read_bytes()
+        cached.sha256 = meta.get("sha256")
+        return cached
+
+    response.sha256 = None
+    if response.status_code == 200:
+        body_hash = hashlib.sha256(response.content).hexdigest()
+        response.sha256 = body_hash
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+        body_path.write_bytes(response.content)
+        write_json(
+            meta_path,
+            {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "sha256": body_hash,
+                "encoding": response.encoding,
+            },
+        )
+
+    return response
+
+
+def load_records(source, hashes):
+    """
+    Returns the records parsed from the source by a previous run, without past
+    events and with an updated scrape date, or None if there are none or if they
+    were parsed from resources other than the ones hashed.
+    """
+    cached = read_json(CACHE_PATH / "records" / f"{get_key(source['url'])}.json")
+    if not isinstance(cached, dict) or cached.get("hashes") != hashes:
+        return None
+
+    scrape_date = get_scrape_date()
+    upcoming = []
+    for record in cached["records"]:
+        if datetime.fromisoformat(record["start_date"]) < datetime.fromisoformat(scrape_date):
+            continue
+        record["scrape_date"] = scrape_date
+        upcoming.append(record)
+
+    logging.info(f"Reusing {len(upcoming)} records of unchanged source {source['url']}")
+    return upcoming
+
+
+def save_records(source, records, hashes):
+    """
+    Stores the records parsed from the source, along with the hashes of the
+    resources they were parsed from, by url.
+    """
+    write_json(
+        CACHE_PATH / "records" / f"{get_key(source['url'])}.json",
+        {"hashes": hashes, "records": records},
+    )
+
+
+def discard_records(source):
+    """
+    Forgets the records of the source, so that it is parsed again by the next run.
+    """
+    (CACHE_PATH / "records" / f"{get_key(source['url'])}.json").unlink(missing_ok=True)
+
+
+class ErrorCounter(logging.Handler):
+    """
+    Counts the transient errors logged by a thread, e.g. geocoder timeouts.
+    """
+
+    def __init__(self, thread):
+        super().__init__(logging.ERROR)
+        self.thread = thread
+        self.count = 0
+
+    def emit(self, record):
+        if record.thread == self.thread and getattr(record, "transient", False):
+            self.count += 1
+
+
+@contextmanager
+def count_errors():
+    """
+    Counts the transient errors logged by the current thread within the block,
+    i.e. errors logged with a true `transient` extra field. Other errors, such as
+    an address that cannot be found, happen again on every run.
+    """
+    handler = ErrorCounter(threading.get_ident())
+    logger = logging.getLogger()
+    logger.addHandler(handler)
+    try:
+        yield handler
+    finally:
+        logger.removeHandler(handler)
@@ -0,0 +1,151 @@
+import logging
+import requests
+import tempfile
+
+from geopy.exc import GeocoderTimedOut
+from pathlib import Path
+
+from apis import cache, fetch
+from apis.main import APIS_FNS, main
+from utils import location
+from utils.errors import FreskError
+from utils.sink import RecordSink, read_records
+
+SOURCE = {"id": 0, "url": "https://calendar.example.org/fresque.ics"}
+
+
+class Server:
+    """
+    Serves a feed answering conditional GETs on its ETag.
+    """
+
+    def __init__(self, body):
+        self.body = body
+
+    def get(self, url, headers=None, timeout=None):
+        response = requests.Response()
+        response.url = url
+        etag = f'"{cache.get_key(self.body)}"'
+        if (headers or {}).get("If-None-Match") == etag:
+            response.status_code = 304
+        else:
+            response.status_code = 200
+            response.encoding = "utf-8"
+            response.headers["ETag"] = etag
+            response._content = self.body.encode("utf-8")
+        return response
+
+
+class Geolocator:
+    """
+    Finds no address, or fails with an error.
+    """
+
+    def __init__(self, error=None):
+        self.error = error
+
+    def geocode(self, query, addressdetails=False):
+        if self.error:
+            raise self.error
+        return None
+
+
+class Parser:
+    """
+    Parses one upcoming record per word of the feed, unless interrupted. When
+    geocoding, words are addresses and records whose address fails are rejected.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.interrupted = False
+        self.geocoding = False
+
+    def __call__(self, source):
+        self.calls += 1
+        text = fetch.get(source["url"]).text
+        if self.interrupted:
+            raise RuntimeError("interrupted while parsing")
+
+        records = []
+        for word in text.split():
+            if self.geocoding:
+                try:
+                    location.get_address(word)
+                except FreskError:
+                    continue
+            records.append({"id": word, "start_date": "2099-01-01T10:00:00+01:00"})
+        return records
+
+
+def run(directory, name):
+    path = Path(directory) / f"{name}.jsonl"
+    main([SOURCE], RecordSink(path))
+    return sorted(record["id"] for record in read_records(path))
+
+
+def run_tests():
+    server = Server("a1 a2")
+    parser = Parser()
+    cache_path, get_session = cache.CACHE_PATH, cache.get_session
+    geolocator = location.geolocator
+    with tempfile.TemporaryDirectory() as directory:
+        cache.CACHE_PATH = Path(directory) / "cache"
+        cache.get_session = lambda url: server
+        APIS_FNS["calendar.example.org"] = parser
+        try:
+            # tuple fields:
+            # 1. Test case name or ID
+            # 2. Feed body
+            # 3. Whether parsing is interrupted
+            # 4. Expected records, or exception
+            # 5. Expected number of parses so far
+            test_cases = [
+                ("First run", "a1 a2", False, ["a1", "a2"], 1),
+                ("Unchanged feed", "a1 a2", False, ["a1", "a2"], 1),
+                ("Changed feed interrupted", "b1", True, RuntimeError, 2),
+                ("Rerun after the interruption", "b1", False, ["b1"], 3),
+                ("Unchanged feed after the rerun", "b1", False, ["b1"], 3),
+            ]
+            for index, test_case in enumerate(test_cases):
+                logging.info(f"Running {test_case[0]}")
+                server.body = test_case[1]
+                parser.interrupted = test_case[2]
+                try:
+                    actual = run(directory, index)
+                except Exception as error:
+                    actual = type(error)
+                if actual == test_case[3] and parser.calls == test_case[4]:
+                    logging.info("Result matches")
+                else:
+                    logging.error(
+                        f"{test_case[0]}: expected {test_case[3]} after {test_case[4]} parses "
+                        f"but got {actual} after {parser.calls} parses"
+                    )
+
+            # tuple fields:
+            # 1. Test case name or ID
+            # 2. Feed body, the addresses of its records
+            # 3. Geocoder error, or None when the addresses are not found
+            # 4. Whether the records are reused by the next run
+            test_cases = [
+                ("Address not found", "Nowhere", None, True),
+                ("Geocoder timeout", "Lyon", GeocoderTimedOut("timed out"), False),
+            ]
+            parser.geocoding = True
+            for test_case in test_cases:
+                logging.info(f"Running {test_case[0]}")
+                server.body = test_case[1]
+                location.geolocator = Geolocator(test_case[2])
+                run(directory, f"{test_case[0]} first")
+                calls = parser.calls
+                run(directory, f"{test_case[0]} second")
+                actual = parser.calls == calls
+                if actual == test_case[3]:
+                    logging.info("Result matches")
+                else:
+                    logging.error(f"{test_case[0]}: expected reuse {test_case[3]} but got {actual}")
+        finally:
+            del APIS_FNS["calendar.example.org"]
+            cache.CACHE_PATH, cache.get_session = cache_path, get_session
+            location.geolocator = geolocator
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import requests
+
+from urllib.parse import urlsplit
+
+from apis.cache import conditional_get
+
+# Maximum number of downloads in flight, overall and per host
+MAX_CONCURRENCY = 16
+MAX_CONCURRENCY_PER_HOST = 4
+TIMEOUT = 30
+
+# Responses (or request errors) downloaded ahead of parsing, by url
+prefetched = {}
+
+
+async def fetch(url, semaphore, host_semaphore):
+    # Wait for the host first, so that downloads waiting for a busy host do not
+    # hold the slots of the other hosts
+    async with host_semaphore, semaphore:
+        try:
+            response = await asyncio.to_thread(conditional_get, url, timeout=TIMEOUT)
+        except requests.RequestException as e:
+            return url, e
+    logging.info(f"Fetched {url} ({response.status_code})")
+    return url, response
+
+
+async def fetch_all(urls, max_concurrency, max_concurrency_per_host):
+    semaphore = asyncio.Semaphore(max_concurrency)
+    host_semaphores = {}
+    tasks = []
+    for url in urls:
+        host = urlsplit(url).netloc
+        if host not in host_semaphores:
+            host_semaphores[host] = asyncio.Semaphore(max_concurrency_per_host)
+        tasks.append(fetch(url, semaphore, host_semaphores[host]))
+
+    return dict(await asyncio.gather(*tasks))
+
+
+def prefetch(
+    urls,
+    max_concurrency=MAX_CONCURRENCY,
+    max_concurrency_per_host=MAX_CONCURRENCY_PER_HOST,
+):
+    """
+    Downloads all urls concurrently, so that handlers calling `get()` afterwards
+    find their payload already there.
+    """
+    urls = list(dict.fromkeys(urls))
+    logging.info(f"Prefetching {len(urls)} API resources")
+    prefetched.update(asyncio.run(fetch_all(urls, max_concurrency, max_concurrency_per_host)))
+
+
+def get(url):
+    """
+    Drop-in replacement for `requests.get`, returning the prefetched response
+    if any. Request errors raised while prefetching are raised again here.
+    """
+    if url not in prefetched:
+        return conditional_get(url, timeout=TIMEOUT)
+
+    response = prefetched[url]
+    if isinstance(response, requests.RequestException):
+        raise response
+    return response
+
+
+def get_hash(url):
+    """
+    Returns the hash of the prefetched body of the url, or None if it could not
+    be downloaded.
+    """
+    return getattr(prefetched.get(url), "sha256", None)
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import requests
+import threading
+import time
+
+from urllib.parse import urlsplit
+
+from apis import fetch
+
+
+class Server:
+    """
+    Answers requests after a while, recording how many were in flight at most,
+    overall and by host.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.max_in_flight = {}
+
+    def update(self, key, delta):
+        with self.lock:
+            self.in_flight[key] = self.in_flight.get(key, 0) + delta
+            self.max_in_flight[key] = max(self.max_in_flight.get(key, 0), self.in_flight[key])
+
+    def get(self, url, timeout=None):
+        host = urlsplit(url).netloc
+        self.update("all", 1)
+        self.update(host, 1)
+        time.sleep(0.05)
+        self.update(host, -1)
+        self.update("all", -1)
+        if "down" in url:
+            raise requests.ConnectionError(f"unable to connect to {host}")
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        return response
+
+
+def run_tests():
+    urls = [f"https://{host}.example.org/{index}" for host in "abc" for index in range(4)]
+    urls.append("https://down.example.org/calendar.ics")
+
+    server = Server()
+    conditional_get = fetch.conditional_get
+    fetch.conditional_get = server.get
+    try:
+        logging.info("Running concurrency limits")
+        responses = asyncio.run(fetch.fetch_all(urls, 4, 2))
+        if server.max_in_flight["all"] != 4:
+            logging.error(
+                f"fetch_all: expected 4 requests in flight but got {server.max_in_flight}"
+            )
+        for host in "abc":
+            if server.max_in_flight[f"{host}.example.org"] != 2:
+                logging.error(
+                    f"fetch_all: expected 2 requests in flight to {host} "
+                    f"but got {server.max_in_flight}"
+                )
+
+        logging.info("Running request errors")
+        if not isinstance(responses[urls[-1]], requests.ConnectionError):
+            logging.error(f"fetch_all: expected a request error but got {responses[urls[-1]]}")
+        if any(responses[url].status_code != 200 for url in urls[:-1]):
+            logging.error(f"fetch_all: unexpected responses {responses}")
+
+        logging.info("Running prefetched request errors")
+        fetch.prefetch(urls[-1:])
+        try:
+            fetch.get(urls[-1])
+            logging.error("get: expected the prefetched request error to be raised")
+        except requests.ConnectionError:
+            logging.info("Result matches")
+    finally:
+        fetch.conditional_get = conditional_get
+        for url in urls:
+            fetch.prefetched.pop(url, None)
@@ -1,12 +1,13 @@
 import json
 import requests
-import time
 import logging
 
 from datetime import datetime
 
+from apis import fetch
 from db.records import get_record_dict
 from utils.errors import FreskError
+from utils import metrics
 from utils.keywords import *
 from utils.language import detect_language_code
 from utils.location import get_address
@@ -19,7 +20,7 @@ def get_glorieuses_data(source):
     records = []
 
     try:
-        response = requests.get(source["url"])
+        response = fetch.get(source["url"])
         # Check if the request was successful (status code 200)
         if response.status_code == 200:
             json_records = response.json()
@@ -29,7 +30,7 @@ def get_glorieuses_data(source):
         logging.info(f"An error occurred: {e}")
 
     for json_record in json_records:
-        time.sleep(1.5)
+        metrics.sleep(1.5)
         logging.info("")
 
         ################################################################
@@ -6,6 +6,7 @@ import re
 import requests
 import logging
 
+from apis import fetch
 from db.records import get_record_dict
 from ics import Calendar
 import re
@@ -74,7 +75,7 @@ def get_ics_data(source):
     records = []
 
     try:
-        response = requests.get(source["url"])
+        response = fetch.get(source["url"])
         # Check if the request was successful (status code 200).
         if response.status_code == 200:
             # Remove VALARMs which incorrectly crash the ics library.
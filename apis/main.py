@@ -1,8 +1,10 @@
-import pandas as pd
+import logging
 
+from apis import cache, fetch
+from utils import metrics
 from apis.ics import get_ics_data
 from apis.glorieuses import get_glorieuses_data
-from apis.mobilite import get_mobilite_data
+from apis.mobilite import get_mobilite_data, SESSIONS_URL, VERSIONS_URL
 
 APIS_FNS = {
     "hook.eu1.make.com": get_glorieuses_data,
@@ -11,13 +13,61 @@ APIS_FNS = {
     "app.fresquedelamobilite.org": get_mobilite_data,
 }
 
+# Resources downloaded by handlers instead of the source url
+APIS_URLS = {
+    "app.fresquedelamobilite.org": [SESSIONS_URL, VERSIONS_URL],
+}
+
 
-def main(apis):
-    records = []
+def main(apis, sink, checkpoint=None):
+    """
+    Gets the records of all API sources, appending them to the sink.
+    Returns the number of records.
+    """
+    count = 0
 
+    pending = []
     for sourcek in APIS_FNS:
         for api in apis:
             if sourcek in api["url"]:
-                records += APIS_FNS[sourcek](api)
+                # Skip sources completed by an interrupted run
+                if not (checkpoint and checkpoint.is_done(api)):
+                    pending.append((sourcek, api))
+
+    # Download every source at once before parsing them one by one
+    urls = []
+    for sourcek, api in pending:
+        urls += APIS_URLS.get(sourcek, [api["url"]])
+    fetch.prefetch(urls)
+
+    for sourcek, api in pending:
+        metrics.set_source(api["url"])
+
+        # Skip parsing when the cached records were parsed from the same resources
+        hashes = {url: fetch.get_hash(url) for url in APIS_URLS.get(sourcek, [api["url"]])}
+        api_records = None
+        if all(hashes.values()):
+            api_records = cache.load_records(api, hashes)
+
+        if api_records is None:
+            with cache.count_errors() as errors:
+                api_records = APIS_FNS[sourcek](api) or []
+
+            # Records may have been dropped because of transient errors, which
+            # the next run must not reuse
+            if errors.count:
+                logging.info(
+                    f"Not caching the records of {api['url']}: {errors.count} transient errors"
+                )
+                cache.discard_records(api)
+            else:
+                cache.save_records(api, api_records, hashes)
+
+        sink.extend(api_records)
+        if checkpoint:
+            sink.flush()
+            checkpoint.save(api, len(api_records))
+        count += len(api_records)
 
-    return pd.DataFrame(records)
+    sink.flush()
+    return count
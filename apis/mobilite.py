@@ -5,16 +5,20 @@ import pandas as pd
 
 from datetime import datetime, timedelta
 
+from apis import fetch
 from db.records import get_record_dict
 from utils.errors import FreskError
 from utils.keywords import is_online, is_training, is_for_kids
 from utils.language import detect_language_code
 from utils.location import get_address
 
+SESSIONS_URL = "https://hook.eu1.make.com/ui9bvl4c3w69dxdlb7goskl3o22x74um"
+VERSIONS_URL = "https://hook.eu1.make.com/sy4ud6vxutts9h62t4tt6gv0xr5rrkyd"
+
 
 def get_df(source):
     try:
-        response = requests.get(source)
+        response = fetch.get(source)
         # Check if the request was successful (status code 200)
         if response.status_code == 200:
             try:
@@ -33,8 +37,8 @@ def get_mobilite_data(source):
     records = []
 
     # Get two make results and merge them
-    df_sessions = get_df("https://hook.eu1.make.com/ui9bvl4c3w69dxdlb7goskl3o22x74um")
-    df_versions = get_df("https://hook.eu1.make.com/sy4ud6vxutts9h62t4tt6gv0xr5rrkyd")
+    df_sessions = get_df(SESSIONS_URL)
+    df_versions = get_df(VERSIONS_URL)
     try:
         df_sessions = df_sessions.merge(
             df_versions,
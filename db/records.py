@@ -4,6 +4,11 @@ from zoneinfo import ZoneInfo
 from utils.utils import get_config
 
 
+def get_scrape_date():
+    timezone = get_config("timezone")
+    return pd.to_datetime("now", utc=True).tz_convert(timezone).isoformat()
+
+
 def get_record_dict(
     uuid,
     ids,
@@ -56,5 +61,5 @@ def get_record_dict(
         "source_link": event_link,
         "tickets_link": tickets_link,
         "description": description,
-        "scrape_date": pd.to_datetime("now", utc=True).tz_convert(timezone).isoformat(),
+        "scrape_date": get_scrape_date(),
     }
@@ -1,9 +1,11 @@
 #!/bin/zsh
+resume=""
 while true
 do
-    python scrape.py
+    python scrape.py $resume "$@"
     if [ $? != 0 ]; then  # if the command fails (returns a non-zero exit code)
         echo "Command failed, retrying..."
+        resume="--resume"  # carry on from the last completed source
         sleep 5  # wait for 5 seconds before retrying
     else
         break  # if the command succeeds, exit the loop
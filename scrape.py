@@ -6,12 +6,17 @@ import sys
 import pandas as pd
 import psycopg
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from psycopg.conninfo import make_conninfo
 
 from apis import main as main_apis
 from scraper import main as main_scraper
+from utils import metrics
+from utils.checkpoint import Checkpoint
+from utils.location import share_cache
+from utils.sink import RecordSink, read_records
 
 
 def configure_logging(log_file_path, error_log_file_path):
@@ -71,6 +76,15 @@ def get_git_commit_hash():
         sys.exit(1)
 
 
+def get_last_results_path(country):
+    """
+    Returns the results directory of the most recent run with a checkpoint, if it
+    was interrupted before completion.
+    """
+    runs = sorted(p for p in Path(f"results/{country}").glob("*") if (p / "checkpoint").is_dir())
+    return runs[-1] if runs and Checkpoint.is_resumable(runs[-1]) else None
+
+
 def get_sources(content):
     try:
         data = json.loads(content)
@@ -116,6 +130,24 @@ if __name__ == "__main__":
         default=False,
         help="run scraping in headless mode",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of scraping platforms to run in parallel, each in its own process",
+    )
+    parser.add_argument(
+        "--full-refresh",
+        action="store_true",
+        default=False,
+        help="scrape every event page again instead of reusing unchanged events",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        default=False,
+        help="resume the last interrupted run instead of starting over",
+    )
     parser.add_argument(
         "--push-to-db",
         action="store_true",
@@ -151,32 +183,68 @@ if __name__ == "__main__":
     # Parse the sources
     scrapers, apis = get_sources(content)
 
-    # Build the results path for this run
-    dt = datetime.now()
-    scraping_time = dt.strftime("%Y%m%d_%H%M%S")
-    results_path = Path(f"results/{args.country}/{scraping_time}")
-    results_path.mkdir(parents=True, exist_ok=True)
-    commit_hash = get_git_commit_hash()
-    with open(f"{results_path}/commit_hash.txt", "w") as file:
-        file.write(commit_hash)
-        if dirty:
-            file.write("\n" + "dirty" + "\n")
+    # Build the results path for this run, or reuse the one of the run to resume
+    results_path = get_last_results_path(args.country) if args.resume else None
+    if results_path is None:
+        dt = datetime.now()
+        scraping_time = dt.strftime("%Y%m%d_%H%M%S")
+        results_path = Path(f"results/{args.country}/{scraping_time}")
+        results_path.mkdir(parents=True, exist_ok=True)
+        commit_hash = get_git_commit_hash()
+        with open(f"{results_path}/commit_hash.txt", "w") as file:
+            file.write(commit_hash)
+            if dirty:
+                file.write("\n" + "dirty" + "\n")
+    checkpoint = Checkpoint(results_path)
+    stream_path = results_path / Path("events.jsonl")
+    sink = RecordSink(stream_path)
+
+    # The worker processes geocode through the same cache, one request at a time
+    share_cache(results_path)
 
     # Logging
     log_path = results_path / Path("log.txt")
     errors_path = results_path / Path("error_log.txt")
     configure_logging(log_path, errors_path)
-
-    # Launch the scraper
-    df1 = main_scraper(scrapers, headless=args.headless)
-    df2 = main_apis(apis)
-    df_merged = pd.concat([df1, df2])
+    if args.resume:
+        logging.info(f"Resuming run {results_path}")
+
+    # Launch the scraper. API sources are plain HTTP, so they are fetched in the
+    # background while the browsers are busy. Both stream their records to the
+    # same file as they go.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future_apis = executor.submit(main_apis, apis, sink, checkpoint)
+        count_scraper, failed = main_scraper(
+            scrapers,
+            sink,
+            headless=args.headless,
+            jobs=args.jobs,
+            full_refresh=args.full_refresh,
+            results_path=results_path,
+        )
+        count_apis = future_apis.result()
+    sink.close()
+    logging.info(f"Scraped {count_scraper} records from scrapers and {count_apis} from APIs")
+    metrics.write_summary(results_path / Path("metrics.json"))
+
+    # The final results are built from the record stream, which also holds the
+    # records of the sources completed before a resume
+    df_merged = pd.DataFrame(read_records(stream_path))
 
     dt = datetime.now()
     insert_time = dt.strftime("%Y%m%d_%H%M%S")
     with open(results_path / Path(f"events_{insert_time}.json"), "w", encoding="UTF-8") as file:
         df_merged.to_json(file, orient="records", force_ascii=False, indent=2)
 
+    # Sources that failed are not checkpointed: leave the run to be resumed, and
+    # fail like a sequential run would, so that loop.sh retries them
+    if failed:
+        logging.error(f"Scraping failed for {', '.join(failed)}, resume the run to retry")
+        sys.exit(1)
+
+    # The results are written, the run no longer needs to be resumed
+    checkpoint.complete()
+
     # Push the resulting json file to the database
     if args.push_to_db:
         logging.info("Pushing scraped results into db...")
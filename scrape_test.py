@@ -1,9 +1,37 @@
+from apis import cache_test
+from apis import fetch_test
 from apis import ics_test
+from scraper import billetweb_test
+from scraper import embedded_test
+from scraper import eventbrite_test
+from scraper import fdc_test
+from scraper import fec_test
+from scraper import glide_test
+from scraper import main_test
+from scraper import store_test
+from utils import checkpoint_test
 from utils import date_and_time_test
 from utils import language_test
+from utils import location_test
+from utils import metrics_test
+from utils import sink_test
 
 
 if __name__ == "__main__":
+    cache_test.run_tests()
+    fetch_test.run_tests()
     ics_test.run_tests()
+    billetweb_test.run_tests()
+    embedded_test.run_tests()
+    eventbrite_test.run_tests()
+    fdc_test.run_tests()
+    fec_test.run_tests()
+    glide_test.run_tests()
+    main_test.run_tests()
+    store_test.run_tests()
+    checkpoint_test.run_tests()
     date_and_time_test.run_tests()
     language_test.run_tests()
+    location_test.run_tests()
+    metrics_test.run_tests()
+    sink_test.run_tests()
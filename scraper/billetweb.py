@@ -2,68 +2,354 @@ import re
 import json
 import logging
 from datetime import timedelta
+from urllib.parse import urljoin
 
-from selenium import webdriver
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 
 from db.records import get_record_dict
+from scraper.dom import extract, probe
+from scraper.listing import get_listing
+from scraper.static import get_attribute, get_soup, get_text, is_static_enabled, select_text
+from scraper.store import get_fingerprint
+from scraper.wait import wait_for_element, wait_for_frame, wait_for_ready
 from utils.date_and_time import get_dates
-from utils.errors import FreskError
+from utils.errors import FreskError, FreskStaticParseError
+from utils import metrics
 from utils.keywords import *
 from utils.language import detect_language_code
 from utils.location import get_address
 
-
-def get_billetweb_data(sources, service, options):
+# Title of an event in the cards of a listing
+LISTING_TITLE = ".multi_event_name, .event_name"
+
+# Fields of an event page
+EVENT_FIELDS = {
+    "description": {"css": "#description"},
+    "title": {
+        "css": [
+            "#event_title > div.event_name",
+            "#description_block > div.event_title > div.event_name",
+        ]
+    },
+    "full_location": {
+        "css": [
+            "div.location_summary",
+            "#page_block_location > div.location > div.location_info > div.address > a",
+        ]
+    },
+    "event_time": {
+        "css": [
+            "#event_title > div.event_start_time > span.text",
+            "#description_block > div.event_title > span > a > div.event_start_time",
+        ]
+    },
+    "shop_url": {"css": "#shop_block iframe", "attribute": "src"},
+}
+
+# Fields of the shop page, embedded by the event page. It links back to the
+# sessions when it opens directly on the basket of a single session.
+SHOP_FIELDS = {
+    "back_link": {"css": ".back_header_link.summarizable", "attribute": "href"},
+    "block": {"css": "div.block"},
+}
+
+# Fields of a session page of the shop. The presence of div.block indicates
+# that the session is sold out, except if it mentions external tickets.
+SESSION_FIELDS = {
+    "context": {"css": "#context_title"},
+    "block": {"css": "div.block"},
+}
+
+
+def parse_context(context, main_title, main_full_location):
+    """
+    Parses the title, time and location of a session from its context title.
+    """
+    if match := re.match(
+        r"\s*((?P<title>.*) : )?(?P<event_time>.*)(\n\s*(?P<full_location>.*))?",
+        context,
+    ):
+        if not match.group("title"):
+            sub_title = main_title
+        elif "atelier" in match.group("title").lower():
+            sub_title = match.group("title")
+        else:
+            sub_title = main_title + " - " + match.group("title")
+
+        event_time = match.group("event_time")
+        sub_full_location = (
+            match.group("full_location") if match.group("full_location") else main_full_location
+        )
+    else:
+        raise
+
+    return sub_title, event_time, sub_full_location
+
+
+def get_session_uuid(event_id, sessions_link):
+    session_id = re.search(r"&session=(\d+)", sessions_link).group(1)
+    return f"{event_id}-{session_id}"
+
+
+def get_listing_rejection(page, link, card, title=None):
+    """
+    Returns why an event is rejected from its listing card, before loading its
+    page, or None.
+    """
+    # Useful for different workshops sharing same event link
+    if "filter" in page and page["filter"] not in link:
+        return "expected filter keyword not present in current link"
+
+    # All the sessions of an event are named after it, as checked on its page
+    if title is not None and is_gift_card(title):
+        return "gift card"
+
+    return None
+
+
+def get_static_listing(page):
+    """
+    Returns the (link, card text, title) triples of the events listed by a page,
+    fetched without a browser.
+    """
+    soup, url = get_soup(page["url"])
+    iframe_url = get_attribute(soup, f"iframe#{page['iframe']}", "src", url)
+    if iframe_url is None:
+        raise FreskStaticParseError(page["url"], "iframe not found")
+
+    soup, url = get_soup(iframe_url)
+    cards = [
+        (urljoin(url, a["href"]), get_text(a.parent), select_text(a.parent, LISTING_TITLE))
+        for a in soup.select("a.naviguate")
+        if a.get("href")
+    ]
+    if not cards:
+        # The listing may be rendered by scripts
+        raise FreskStaticParseError(iframe_url, "no events found")
+    return cards
+
+
+def get_static_event(link, event_id):
+    """
+    Returns the description, title, location and sessions of an event, fetched
+    without a browser.
+    """
+    soup, url = get_soup(link)
+
+    description = select_text(soup, EVENT_FIELDS["description"]["css"])
+    if description is None:
+        raise FreskStaticParseError(link, "no description")
+
+    main_title = select_text(soup, *EVENT_FIELDS["title"]["css"])
+    if main_title is None:
+        raise FreskStaticParseError(link, "no title")
+
+    main_full_location = select_text(soup, *EVENT_FIELDS["full_location"]["css"]) or ""
+
+    # Retrieve sessions if exist
+    shop_url = get_attribute(soup, EVENT_FIELDS["shop_url"]["css"], "src", url)
+    if shop_url is None:
+        raise FreskStaticParseError(link, "no shop")
+    shop, shop_base_url = get_soup(shop_url)
+    sessions, sessions_base_url = shop, shop_base_url
+    back_link = get_attribute(shop, SHOP_FIELDS["back_link"]["css"], "href", shop_base_url)
+    if back_link:
+        # Case of Multi-time with only one date, we arrive directly to Basket, so get back to sessions
+        sessions, sessions_base_url = get_soup(back_link)
+    sessions_links = [
+        urljoin(sessions_base_url, a["href"])
+        for a in sessions.select("a.sesssion_href")
+        if a.get("href")
+    ]  # No sessions for Mono-time
+
+    event_info = []
+
+    # Multi-time management
+    for sessions_link in sessions_links:
+        session, _ = get_soup(sessions_link)
+        context = select_text(session, SESSION_FIELDS["context"]["css"])
+        if context is None:
+            raise FreskStaticParseError(sessions_link, "no context title")
+        sub_title, event_time, sub_full_location = parse_context(
+            context, main_title, main_full_location
+        )
+
+        empty = select_text(session, SESSION_FIELDS["block"]["css"])
+        sold_out = empty is not None and not has_external_tickets(empty)
+
+        event_info.append(
+            [
+                sub_title,
+                event_time,
+                sub_full_location,
+                sold_out,
+                sessions_link,
+                get_session_uuid(event_id, sessions_link),
+            ]
+        )
+
+    # Mono-time management
+    if not sessions_links:
+        event_time = select_text(soup, *EVENT_FIELDS["event_time"]["css"])
+        if event_time is None:
+            raise FreskStaticParseError(link, "no event time")
+
+        empty = select_text(shop, SHOP_FIELDS["block"]["css"])
+        sold_out = empty is not None and not has_external_tickets(empty)
+
+        event_info.append([main_title, event_time, main_full_location, sold_out, link, event_id])
+
+    return description, main_title, main_full_location, event_info
+
+
+def get_selenium_listing(pool, driver, page):
+    """
+    Returns the (link, card text, title) triples of the events listed by a page,
+    or None if its iframe cannot be found.
+    """
+    pool.load(driver, page["url"])
+
+    if not wait_for_frame(driver, By.ID, page["iframe"]):
+        return None
+
+    wait_for_ready(driver)
+    return get_listing(driver, "a.naviguate", title_selector=LISTING_TITLE)
+
+
+def get_selenium_event(pool, driver, link, event_id):
+    """
+    Returns the description, title, location and sessions of an event, or None
+    if it has no description.
+    """
+    pool.load(driver, link)
+    wait_for_ready(driver)
+
+    # Description, not always with more info
+    more_info = probe(driver, more_info="#more_info")["more_info"]
+    if more_info is not None:
+        try:
+            more_info.click()
+        except Exception:
+            pass
+
+    fields = extract(driver, EVENT_FIELDS)
+    description = fields["description"]
+    if description is None:
+        return None
+
+    main_title = fields["title"]
+    if main_title is None:
+        raise NoSuchElementException("Event title not found")
+
+    # Location data
+    main_full_location = fields["full_location"] or ""
+
+    event_info = []
+
+    # Retrieve sessions if exist, from the shop loaded as a page of its own
+    shop_url = fields["shop_url"]
+    if shop_url is None:
+        iframe = wait_for_element(driver, By.CSS_SELECTOR, EVENT_FIELDS["shop_url"]["css"])
+        if iframe is None:
+            raise TimeoutException("Shop iframe not found")
+        shop_url = iframe.get_attribute("src")
+    pool.load(driver, shop_url)
+    wait_for_ready(driver)
+    shop = extract(driver, SHOP_FIELDS)
+    if shop["back_link"]:
+        # Case of Multi-time with only one date, we arrive directly to Basket, so get back to sessions
+        pool.load(driver, shop["back_link"])
+        wait_for_ready(driver)
+    # No sessions for Mono-time
+    sessions_links = [href for href, _ in get_listing(driver, "a.sesssion_href")]
+
+    ################################################################
+    # Multi-time management
+    ################################################################
+    for sessions_link in sessions_links:
+        pool.load(driver, sessions_link)
+        wait_for_ready(driver)
+        session = extract(driver, SESSION_FIELDS, required=("context",))
+
+        # Parse title, dates, location
+        sub_title, event_time, sub_full_location = parse_context(
+            session["context"], main_title, main_full_location
+        )
+
+        # Is it full?
+        sold_out = session["block"] is not None and not has_external_tickets(session["block"])
+
+        event_info.append(
+            [
+                sub_title,
+                event_time,
+                sub_full_location,
+                sold_out,
+                sessions_link,
+                get_session_uuid(event_id, sessions_link),
+            ]
+        )
+
+    ################################################################
+    # Mono-time management
+    ################################################################
+    if not sessions_links:
+        # Parse start and end dates
+        event_time = fields["event_time"]
+        if event_time is None:
+            raise NoSuchElementException("Event time not found")
+
+        # Is it full?
+        sold_out = shop["block"] is not None and not has_external_tickets(shop["block"])
+
+        event_info.append([main_title, event_time, main_full_location, sold_out, link, event_id])
+
+    return description, main_title, main_full_location, event_info
+
+
+def get_billetweb_data(sources, pool, store, sink):
     logging.info("Scraping data from www.billetweb.fr")
 
-    driver = webdriver.Firefox(service=service, options=options)
-    wait = WebDriverWait(driver, 10)
+    # Pages are fetched without a browser when possible, the webdriver is
+    # only acquired for those which cannot be parsed statically
+    driver = None
 
     records = []
 
     for page in sources:
         logging.info(f"==================\nProcessing page {page}")
-        driver.get(page["url"])
-
-        try:
-            wait.until(EC.frame_to_be_available_and_switch_to_it((By.ID, page["iframe"])))
-        except TimeoutException:
-            logging.info("Rejecting record: iframe not found")
-            continue
 
-        wait.until(lambda driver: driver.execute_script("return document.readyState") == "complete")
-        ele = driver.find_elements(By.CSS_SELECTOR, "a.naviguate")
-        links = [e.get_attribute("href") for e in ele]
+        static = is_static_enabled(page["url"])
+        cards = None
+        if static:
+            try:
+                cards = get_static_listing(page)
+            except FreskStaticParseError as error:
+                logging.info(f"{error} Falling back to the webdriver.")
+
+        if cards is None:
+            driver = driver or pool.acquire()
+            cards = get_selenium_listing(pool, driver, page)
+            if cards is None:
+                logging.info("Rejecting record: iframe not found")
+                continue
 
-        for link in links:
+        for link, card, title in cards:
             logging.info(f"------------------\nProcessing event {link}")
-            driver.get(link)
-            wait.until(
-                lambda driver: driver.execute_script("return document.readyState") == "complete"
-            )
-
-            # Useful for different workshops sharing same event link
-            if "filter" in page:
-                if page["filter"] not in link:
-                    logging.info(
-                        "Rejecting filter: expected filter keyword not present in current link"
-                    )
-                    continue
+            metrics.set_event(link)
 
-            # Description
-            try:
-                driver.find_element(By.ID, "more_info").click()
-            except Exception:
-                pass  # normal case if description is without more info
+            reason = get_listing_rejection(page, link, card, title)
+            if reason:
+                store.skip(reason)
+                continue
 
-            try:
-                description = driver.find_element(by=By.CSS_SELECTOR, value="#description").text
-            except Exception:
-                logging.info("Rejecting record: no description")
+            # Reuse the records of events unchanged since the previous run
+            fingerprint = get_fingerprint(card)
+            stored_records = store.get(page, link, fingerprint)
+            if stored_records is not None:
+                records += stored_records
+                sink.extend(stored_records)
                 continue
 
             # Parse event id
@@ -72,145 +358,26 @@ def get_billetweb_data(sources, service, options):
                 logging.info("Rejecting record: event_id not found")
                 continue
 
-            # Parse main title
-            try:
-                main_title = driver.find_element(
-                    by=By.CSS_SELECTOR, value="#event_title > div.event_name"
-                ).text
-            except NoSuchElementException:
-                main_title = driver.find_element(
-                    by=By.CSS_SELECTOR,
-                    value="#description_block > div.event_title > div.event_name",
-                ).text
-
-            # Location data
-            try:
-                try:
-                    main_full_location = driver.find_element(
-                        by=By.CSS_SELECTOR, value="div.location_summary"
-                    ).text
-                except NoSuchElementException:
-                    main_full_location = driver.find_element(
-                        by=By.CSS_SELECTOR,
-                        value="#page_block_location > div.location > div.location_info > div.address > a",
-                    ).text
-            except Exception:
-                main_full_location = ""
-
-            event_info = []
-
-            # Retrieve sessions if exist
-            wait.until(
-                EC.frame_to_be_available_and_switch_to_it((By.CSS_SELECTOR, "#shop_block iframe"))
-            )
-            wait.until(
-                lambda driver: driver.execute_script("return document.readyState") == "complete"
-            )
-            back_links = driver.find_elements(By.CSS_SELECTOR, ".back_header_link.summarizable")
-            if back_links:
-                # Case of Multi-time with only one date, we arrive directly to Basket, so get back to sessions
-                driver.get(back_links[0].get_attribute("href"))
-                wait.until(
-                    lambda driver: driver.execute_script("return document.readyState") == "complete"
-                )
-            sessions = driver.find_elements(By.CSS_SELECTOR, "a.sesssion_href")
-            sessions_links = [
-                s.get_attribute("href") for s in sessions
-            ]  # No sessions for Mono-time
-            driver.switch_to.parent_frame()
-
-            ################################################################
-            # Multi-time management
-            ################################################################
-            for sessions_link in sessions_links:
-                driver.get(sessions_link)
-                wait.until(
-                    lambda driver: driver.execute_script("return document.readyState") == "complete"
-                )
-                context = driver.find_element(By.CSS_SELECTOR, "#context_title").text
-
-                # Parse title, dates, location
-                if match := re.match(
-                    r"\s*((?P<title>.*) : )?(?P<event_time>.*)(\n\s*(?P<full_location>.*))?",
-                    context,
-                ):
-                    if not match.group("title"):
-                        sub_title = main_title
-                    elif "atelier" in match.group("title").lower():
-                        sub_title = match.group("title")
-                    else:
-                        sub_title = main_title + " - " + match.group("title")
-
-                    event_time = match.group("event_time")
-                    sub_full_location = (
-                        match.group("full_location")
-                        if match.group("full_location")
-                        else main_full_location
-                    )
-                else:
-                    raise
-
-                # Is it full?
+            event = None
+            if static:
                 try:
-                    # The presence of div.block indicates that the event is sold out,
-                    # except if the text below is displayed.
-                    empty = driver.find_element(By.CSS_SELECTOR, "div.block")
-                    sold_out = not has_external_tickets(empty.text)
-                except NoSuchElementException:
-                    sold_out = False
-
-                # Parse session id
-                session_id = re.search(r"&session=(\d+)", sessions_link).group(1)
-                uuid = f"{event_id}-{session_id}"
-
-                event_info.append(
-                    [sub_title, event_time, sub_full_location, sold_out, sessions_link, uuid]
-                )
+                    event = get_static_event(link, event_id)
+                except FreskStaticParseError as error:
+                    logging.info(f"{error} Falling back to the webdriver.")
+
+            if event is None:
+                driver = pool.recycle(driver) if driver else pool.acquire()
+                event = get_selenium_event(pool, driver, link, event_id)
+                if event is None:
+                    logging.info("Rejecting record: no description")
+                    continue
 
-            ################################################################
-            # Mono-time management
-            ################################################################
-            if not sessions_links:
-                # Parse start and end dates
-                try:
-                    event_time = driver.find_element(
-                        by=By.CSS_SELECTOR,
-                        value="#event_title > div.event_start_time > span.text",
-                    ).text
-                except NoSuchElementException:
-                    event_time = driver.find_element(
-                        by=By.CSS_SELECTOR,
-                        value="#description_block > div.event_title > span > a > div.event_start_time",
-                    ).text
-
-                # Is it full?
-                try:
-                    wait.until(
-                        EC.frame_to_be_available_and_switch_to_it(
-                            (By.CSS_SELECTOR, "#shop_block iframe")
-                        )
-                    )
-                    wait.until(
-                        lambda driver: driver.execute_script("return document.readyState")
-                        == "complete"
-                    )
-
-                    # The presence of div.block indicates that the event is sold out,
-                    # except if the text below is displayed.
-                    empty = driver.find_element(By.CSS_SELECTOR, "div.block")
-                    sold_out = not has_external_tickets(empty.text)
-                except NoSuchElementException:
-                    sold_out = False
-                finally:
-                    driver.switch_to.parent_frame()
-
-                event_info.append(
-                    [main_title, event_time, main_full_location, sold_out, link, event_id]
-                )
+            description, main_title, main_full_location, event_info = event
 
             ################################################################
             # Session loop
             ################################################################
+            link_records = []
             for index, (title, event_time, full_location, sold_out, ticket_link, uuid) in enumerate(
                 event_info
             ):
@@ -295,9 +462,14 @@ def get_billetweb_data(sources, service, options):
                     ticket_link,
                     description,
                 )
-                records.append(record)
+                link_records.append(record)
+                sink.append(record)
                 logging.info(f"Successfully scraped:\n{json.dumps(record, indent=4)}")
 
-    driver.quit()
+            records += link_records
+            store.put(page, link, fingerprint, link_records)
+
+    if driver is not None:
+        pool.release(driver)
 
     return records
@@ -0,0 +1,180 @@
+import logging
+
+from bs4 import BeautifulSoup
+
+from scraper import billetweb
+from utils.errors import FreskStaticParseError
+
+PAGE = {
+    "name": "Fresque du Numérique",
+    "url": "https://www.billetweb.fr/pro/fdnr",
+    "type": "scraper",
+    "iframe": "event21569",
+    "id": 0,
+}
+
+# Pages served by Billetweb, by url
+PAGES = {
+    "https://www.billetweb.fr/pro/fdnr": """
+        <html><body>
+        <iframe id="event21569" src="/multi_event.php?user=82762&multi=21569"></iframe>
+        </body></html>
+    """,
+    "https://www.billetweb.fr/multi_event.php?user=82762&multi=21569": """
+        <html><body>
+        <div class="multi_event">
+            <a class="naviguate" href="/atelier-paris&multi=21569"></a>
+            <div class="multi_event_name">Atelier Fresque du Numérique - Paris</div>
+            <div class="multi_event_date">Thu Oct 19, 2099 from 01:00 PM to 04:00 PM</div>
+        </div>
+        <div class="multi_event">
+            <a class="naviguate" href="/carte-cadeau&multi=21569"></a>
+            <div class="multi_event_name">Carte cadeau</div>
+        </div>
+        </body></html>
+    """,
+    # Mono-time event
+    "https://www.billetweb.fr/atelier-paris&multi=21569": """
+        <html><body>
+        <div id="event_title">
+            <div class="event_name">Atelier Fresque du Numérique - Paris</div>
+            <div class="event_start_time">
+                <span class="text">Thu Oct 19, 2099 from 01:00 PM to 04:00 PM</span>
+            </div>
+        </div>
+        <div id="description"><p>Un atelier de 3 heures.</p></div>
+        <div class="location_summary">Maison des associations, 75011 Paris</div>
+        <div id="shop_block"><iframe src="/shop.php?event=atelier-paris"></iframe></div>
+        </body></html>
+    """,
+    "https://www.billetweb.fr/shop.php?event=atelier-paris": """
+        <html><body><div class="block">Complet</div></body></html>
+    """,
+    # Multi-time event
+    "https://www.billetweb.fr/atelier-lyon&multi=21569": """
+        <html><body>
+        <div id="description_block">
+            <div class="event_title"><div class="event_name">Fresque du Numérique</div></div>
+        </div>
+        <div id="description">Deux sessions.</div>
+        <div class="location_summary">Lyon</div>
+        <div id="shop_block"><iframe src="/shop.php?event=atelier-lyon"></iframe></div>
+        </body></html>
+    """,
+    "https://www.billetweb.fr/shop.php?event=atelier-lyon": """
+        <html><body>
+        <a class="sesssion_href" href="/shop.php?event=atelier-lyon&session=101"></a>
+        <a class="sesssion_href" href="/shop.php?event=atelier-lyon&session=102"></a>
+        </body></html>
+    """,
+    "https://www.billetweb.fr/shop.php?event=atelier-lyon&session=101": """
+        <html><body>
+        <div id="context_title">Thu Oct 19, 2099 from 07:00 PM to 10:00 PM</div>
+        </body></html>
+    """,
+    "https://www.billetweb.fr/shop.php?event=atelier-lyon&session=102": """
+        <html><body>
+        <div id="context_title">Atelier du soir : Fri Oct 20, 2099 from 07:00 PM to 10:00 PM<br>
+            Café associatif, 69001 Lyon</div>
+        <div class="block">Inscriptions uniquement via le site du café</div>
+        </body></html>
+    """,
+}
+
+
+def get_soup(url):
+    if url not in PAGES:
+        raise FreskStaticParseError(url, "not captured")
+    return BeautifulSoup(PAGES[url], "html.parser"), url
+
+
+def run_tests():
+    # Pages are served from the captured payloads instead of the network
+    fetch = billetweb.get_soup
+    billetweb.get_soup = get_soup
+    try:
+        run_parsing_tests()
+    finally:
+        billetweb.get_soup = fetch
+
+
+def run_parsing_tests():
+    logging.info("Running static listing")
+    cards = billetweb.get_static_listing(PAGE)
+    expected = [
+        (
+            "https://www.billetweb.fr/atelier-paris&multi=21569",
+            "Atelier Fresque du Numérique - Paris",
+        ),
+        ("https://www.billetweb.fr/carte-cadeau&multi=21569", "Carte cadeau"),
+    ]
+    if [(link, title) for link, _, title in cards] != expected:
+        logging.error(f"Static listing: expected {expected} but got {cards}")
+
+    # tuple fields:
+    # 1. Test case name or ID
+    # 2. Page
+    # 3. Listing card
+    # 4. Expected rejection reason
+    test_cases = [
+        ("Event", PAGE, cards[0], None),
+        ("Gift card", PAGE, cards[1], "gift card"),
+        (
+            "Filter",
+            {**PAGE, "filter": "lyon"},
+            cards[0],
+            "expected filter keyword not present in current link",
+        ),
+    ]
+    for test_case in test_cases:
+        logging.info(f"Running {test_case[0]}")
+        actual = billetweb.get_listing_rejection(test_case[1], *test_case[2])
+        if actual == test_case[3]:
+            logging.info("Result matches")
+        else:
+            logging.error(f"{test_case[0]}: expected {test_case[3]} but got {actual}")
+
+    logging.info("Running mono-time event")
+    link = "https://www.billetweb.fr/atelier-paris&multi=21569"
+    event = billetweb.get_static_event(link, "atelier-paris")
+    expected = (
+        "Un atelier de 3 heures.",
+        "Atelier Fresque du Numérique - Paris",
+        "Maison des associations, 75011 Paris",
+        [
+            [
+                "Atelier Fresque du Numérique - Paris",
+                "Thu Oct 19, 2099 from 01:00 PM to 04:00 PM",
+                "Maison des associations, 75011 Paris",
+                True,
+                link,
+                "atelier-paris",
+            ]
+        ],
+    )
+    if event != expected:
+        logging.error(f"Mono-time event: expected {expected} but got {event}")
+
+    logging.info("Running multi-time event")
+    link = "https://www.billetweb.fr/atelier-lyon&multi=21569"
+    _, _, _, event_info = billetweb.get_static_event(link, "atelier-lyon")
+    expected = [
+        [
+            "Fresque du Numérique",
+            "Thu Oct 19, 2099 from 07:00 PM to 10:00 PM",
+            "Lyon",
+            False,
+            "https://www.billetweb.fr/shop.php?event=atelier-lyon&session=101",
+            "atelier-lyon-101",
+        ],
+        [
+            "Atelier du soir",
+            "Fri Oct 20, 2099 from 07:00 PM to 10:00 PM",
+            "Café associatif, 69001 Lyon",
+            False,
+            "https://www.billetweb.fr/shop.php?event=atelier-lyon&session=102",
+            "atelier-lyon-102",
+        ],
+    ]
+    if event_info != expected:
+        logging.error(f"Multi-time event: expected {expected} but got {event_info}")
@@ -0,0 +1,152 @@
+import json
+
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from utils.utils import get_config
+
+# Special indices of devalue payloads
+DEVALUE_CONSTANTS = {
+    -1: None,  # undefined
+    -2: None,  # array hole
+    -3: float("nan"),
+    -4: float("inf"),
+    -5: float("-inf"),
+    -6: -0.0,
+}
+
+
+def parse_json(text):
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def find_dicts(data, predicate):
+    """
+    Returns the dicts nested anywhere in data which match the predicate, in
+    document order.
+    """
+    found = []
+    visited = set()
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, (dict, list)):
+            # Decoded payloads may share or cycle through their containers
+            if id(value) in visited:
+                continue
+            visited.add(id(value))
+        if isinstance(value, dict):
+            if predicate(value):
+                found.append(value)
+            stack.extend(reversed(list(value.values())))
+        elif isinstance(value, list):
+            stack.extend(reversed(value))
+    return found
+
+
+def get_json_ld(texts):
+    """
+    Returns the objects described by the contents of JSON-LD scripts, including
+    those of @graph lists.
+    """
+    items = []
+    for text in texts:
+        data = parse_json(text)
+        for item in data if isinstance(data, list) else [data]:
+            if not isinstance(item, dict):
+                continue
+            items.append(item)
+            items.extend(node for node in item.get("@graph", []) if isinstance(node, dict))
+    return items
+
+
+def has_type(item, suffix):
+    """
+    Returns whether a JSON-LD object has a type ending with suffix, e.g. "Event"
+    for the "Event", "EducationEvent" or "SocialEvent" types.
+    """
+    types = item.get("@type") if isinstance(item, dict) else None
+    if isinstance(types, str):
+        types = [types]
+    return any(isinstance(t, str) and t.endswith(suffix) for t in types or [])
+
+
+def is_sold_out_offer(offers):
+    """
+    Returns whether all the JSON-LD offers of an event are sold out.
+    """
+    if isinstance(offers, dict):
+        offers = [offers]
+    availabilities = [
+        str(offer.get("availability", "")) for offer in offers or [] if isinstance(offer, dict)
+    ]
+    return bool(availabilities) and all(a.endswith("SoldOut") for a in availabilities)
+
+
+def to_local_datetime(value):
+    """
+    Parses an ISO 8601 date and returns the naive time it expresses in the
+    configured timezone, e.g. 2025-04-11 14:00 for "2025-04-11T12:00:00Z" with
+    "Europe/Paris". Dates without an offset are returned as is.
+    """
+    date = datetime.fromisoformat(value)
+    if date.tzinfo is not None:
+        date = date.astimezone(ZoneInfo(get_config("timezone")))
+    return date.replace(tzinfo=None)
+
+
+def unflatten(values):
+    """
+    Decodes a devalue payload, as embedded by Nuxt in its __NUXT_DATA__ script:
+    a flat list of values whose objects and arrays reference other values by
+    index. Types devalue or Nuxt wrap (Date, Reactive, Ref...) are unwrapped.
+    """
+    if not isinstance(values, list) or not values:
+        return None
+
+    hydrated = {}
+
+    def hydrate(index):
+        if not isinstance(index, int) or isinstance(index, bool):
+            return None
+        if index in DEVALUE_CONSTANTS:
+            return DEVALUE_CONSTANTS[index]
+        if index in hydrated:
+            return hydrated[index]
+
+        value = values[index]
+        if isinstance(value, dict):
+            result = hydrated[index] = {}
+            for key, child in value.items():
+                result[key] = hydrate(child)
+        elif isinstance(value, list) and value and isinstance(value[0], str):
+            tag = value[0]
+            if tag in ("Date", "BigInt", "RegExp"):
+                result = value[1] if len(value) > 1 else None
+            elif tag == "Set":
+                result = hydrated[index] = []
+                result.extend(hydrate(child) for child in value[1:])
+            elif tag == "Map":
+                result = hydrated[index] = {}
+                for key, child in zip(value[1::2], value[2::2]):
+                    result[str(hydrate(key))] = hydrate(child)
+            elif tag == "null":
+                # Object without prototype, stored as key and index pairs
+                result = hydrated[index] = {}
+                for key, child in zip(value[1::2], value[2::2]):
+                    result[key] = hydrate(child)
+            else:
+                result = hydrate(value[1]) if len(value) > 1 else None
+        elif isinstance(value, list):
+            result = hydrated[index] = []
+            result.extend(hydrate(child) for child in value)
+        else:
+            result = value
+
+        hydrated[index] = result
+        return result
+
+    return hydrate(0)
@@ -0,0 +1,74 @@
+import json
+import logging
+
+from scraper import embedded
+
+# JSON-LD scripts of an event page, one of them with a @graph list
+JSON_LD_SCRIPTS = [
+    json.dumps(
+        {
+            "@context": "https://schema.org",
+            "@graph": [
+                {"@type": "Organization", "name": "La Fresque du Climat"},
+                {
+                    "@type": "EducationEvent",
+                    "name": "Atelier Fresque du Climat",
+                    "startDate": "2025-04-11T14:00:00+02:00",
+                    "offers": [{"@type": "Offer", "availability": "https://schema.org/SoldOut"}],
+                },
+            ],
+        }
+    ),
+    json.dumps([{"@type": ["Thing", "SocialEvent"], "name": "Plénière"}]),
+    "not json",
+]
+
+# __NUXT_DATA__ payload of a HelloAsso event page, as serialized by devalue
+NUXT_DATA = [
+    ["Reactive", 1],
+    {"data": 2, "state": 8},
+    ["ShallowReactive", 3],
+    {"forms": 4},
+    [5],
+    {"formSlug": 6, "startDate": 7, "place": -1},
+    "atelier-fresque",
+    ["Date", "2025-04-11T12:00:00.000Z"],
+    ["null", "form", 5, "tags", 9],
+    ["Set", 10, 11],
+    "climat",
+    "atelier",
+]
+
+
+def run_tests():
+    logging.info("Running JSON-LD with @graph")
+    items = embedded.get_json_ld(JSON_LD_SCRIPTS)
+    events = [item for item in items if embedded.has_type(item, "Event")]
+    if [event["name"] for event in events] != ["Atelier Fresque du Climat", "Plénière"]:
+        logging.error(f"JSON-LD: unexpected events {events}")
+    if not embedded.is_sold_out_offer(events[0]["offers"]):
+        logging.error(f"JSON-LD: expected sold out offers {events[0]['offers']}")
+    if embedded.is_sold_out_offer(events[1].get("offers")):
+        logging.error("JSON-LD: expected no sold out offers without offers")
+
+    logging.info("Running unflatten")
+    data = embedded.unflatten(NUXT_DATA)
+    form = data["data"]["forms"][0]
+    expected = {
+        "formSlug": "atelier-fresque",
+        "startDate": "2025-04-11T12:00:00.000Z",
+        "place": None,
+    }
+    if form != expected:
+        logging.error(f"unflatten: expected {expected} but got {form}")
+    if data["state"]["form"] is not form:
+        logging.error("unflatten: shared references should decode to the same object")
+    if data["state"]["tags"] != ["climat", "atelier"]:
+        logging.error(f"unflatten: unexpected set {data['state']['tags']}")
+    if embedded.unflatten([]) is not None:
+        logging.error("unflatten: expected None for an empty payload")
+
+    logging.info("Running find_dicts")
+    forms = embedded.find_dicts(data, lambda value: "formSlug" in value)
+    if forms != [form]:
+        logging.error(f"find_dicts: expected a single form but got {forms}")
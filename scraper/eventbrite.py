@@ -1,383 +1,626 @@
-import numpy as np
-import time
 import json
 import logging
 import re
 
-from selenium import webdriver
-from selenium.common.exceptions import (
-    StaleElementReferenceException,
-    NoSuchElementException,
-    TimeoutException,
-)
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from selenium.common.exceptions import StaleElementReferenceException, NoSuchElementException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 
 from db.records import get_record_dict
+from scraper.dom import extract, probe, require
+from scraper.embedded import get_json_ld, has_type, is_sold_out_offer, to_local_datetime
+from scraper.listing import get_listing
+from scraper.static import get_json, is_static_enabled
+from scraper.store import get_fingerprint
+from scraper.wait import (
+    count_elements,
+    wait_for_clickable,
+    wait_for_element,
+    wait_for_network_idle,
+    wait_for_stable_count,
+)
 from utils.date_and_time import get_dates
-from utils.errors import FreskError, FreskDateBadFormat, FreskDateNotFound
+from utils.errors import (
+    FreskError,
+    FreskDateBadFormat,
+    FreskDateNotFound,
+    FreskStaticParseError,
+)
+from utils import metrics
 from utils.keywords import *
 from utils.language import detect_language_code
 from utils.location import get_address
 
+# Number of events per request to the organizer events endpoint
+SHOWMORE_PAGE_SIZE = 50
 
-def delete_cookies_overlay(driver):
-    try:
-        transcend_element = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "#transcend-consent-manager"))
-        )
+# Statuses of the organizer endpoint events which cannot be attended anymore
+EXPIRED_STATUSES = ("ended", "completed", "canceled")
+
+SHOW_MORE_BUTTON = (
+    "div.organizer-profile__section--content div.organizer-profile__show-more > button"
+)
+
+# Reads the structured data and the description of an event page in one round-trip
+EMBEDDED_DATA_SCRIPT = """
+var description = document.querySelector("div.eds-text--left");
+return {
+    jsonLd: Array.from(
+        document.querySelectorAll('script[type="application/ld+json"]')
+    ).map(function (e) {
+        return e.textContent;
+    }),
+    description: description ? description.innerText : null,
+};
+"""
+
+# Fields of an event page. Badges are displayed when they have children.
+PAGE_FIELDS = {
+    "expired_badge": {
+        "xpath": '//div[@data-testid="enhancedExpiredEventsBadge"]/*',
+        "exists": True,
+    },
+    "expired": {"css": "div.enhanced-expired-badge", "exists": True},
+    "sales_ended": {"xpath": '//div[@data-testid="salesEndedMessage"]/*', "exists": True},
+    "title": {"css": "h1"},
+    "address_text": {"css": "p.location-info__address-text"},
+    "location": {"css": "div.location-info__address"},
+    "description": {"css": "div.eds-text--left"},
+    "date_time": {"css": "div.select-date-and-time", "element": True},
+}
+
+# Fields read after selecting a date
+DATE_FIELDS = {
+    "event_time": {"css": "span.date-info__full-datetime"},
+}
 
-        # Use JavaScript to remove the transcend-consent-manager element
-        script = """
-        var element = arguments[0];
+
+def delete_cookies_overlay(driver):
+    """
+    Removes the consent overlay if it was rendered anyway, e.g. with the consent
+    manager hosts not blocked, without waiting for it.
+    """
+    script = """
+    var element = document.getElementById("transcend-consent-manager");
+    if (element) {
         element.parentNode.removeChild(element);
-        """
-        driver.execute_script(script, transcend_element)
+    }
+    return element !== null;
+    """
+    try:
+        if driver.execute_script(script):
+            logging.info("Removed the Transcend consent manager element")
     except Exception as e:
         logging.info(f"Transcend consent manager element couldn't be removed: {e}")
 
 
 def scroll_to_bottom(driver):
-    more_content = True
-    while more_content:
+    while True:
         logging.info("Scrolling to the bottom...")
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        # The button is removed once all events are displayed
+        if probe(driver, button=SHOW_MORE_BUTTON)["button"] is None:
+            break
+        next_button = wait_for_clickable(driver, By.CSS_SELECTOR, SHOW_MORE_BUTTON)
+        if next_button is None:
+            break
+
         try:
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(5)  # Give the page some time to load new content
+            desired_y = (next_button.size["height"] / 2) + next_button.location["y"]
+            window_h = driver.execute_script("return window.innerHeight")
+            window_y = driver.execute_script("return window.pageYOffset")
+            current_y = (window_h / 2) + window_y
+            scroll_y_by = desired_y - current_y
+
+            driver.execute_script("window.scrollBy(0, arguments[0]);", scroll_y_by)
+            count = count_elements(driver, By.CSS_SELECTOR, "div.event-card")
+            next_button.click()
+        except StaleElementReferenceException:
+            continue  # Retry with the new button
+
+        # Give the page the time to load new content
+        wait_for_stable_count(driver, By.CSS_SELECTOR, "div.event-card", minimum=count + 1)
+
+
+def get_organizer_listing(url):
+    """
+    Returns the (link, card text, title) triples of the future events of an organizer,
+    paging through the JSON endpoint its profile page loads them from.
+    """
+    match = re.search(r"/o/(?:[^/?]*-)?(\d+)", url)
+    if not match:
+        raise FreskStaticParseError(url, "organizer id not found")
+    parts = urlsplit(url)
+    endpoint = f"{parts.scheme}://{parts.netloc}/org/{match.group(1)}/showmore/"
+
+    cards = []
+    page_number = 1
+    while True:
+        data = get_json(
+            endpoint,
+            params={"type": "future", "page_size": SHOWMORE_PAGE_SIZE, "page": page_number},
+        )
+        payload = (data.get("data") if isinstance(data, dict) else None) or {}
+        events = payload.get("events") or []
+        for event in events:
+            if event.get("url"):
+                cards.append((event["url"], get_card_text(event), get_card_title(event)))
+        if not events or not payload.get("has_next_page"):
+            break
+        page_number += 1
+
+    return cards
+
+
+def get_card_title(event):
+    """
+    Returns the name of an event of the organizer endpoint.
+    """
+    name = event.get("name") or ""
+    if isinstance(name, dict):
+        name = name.get("text") or ""
+    return name
+
+
+def get_card_text(event):
+    """
+    Returns what the listing shows about an event of the organizer endpoint.
+    """
+    name = get_card_title(event)
+    start = event.get("start") or {}
+    end = event.get("end") or {}
+    return "\n".join(
+        str(part)
+        for part in [
+            name,
+            start.get("local", "") if isinstance(start, dict) else start,
+            end.get("local", "") if isinstance(end, dict) else end,
+            event.get("status", ""),
+            "Sold out" if event.get("is_sold_out") else "",
+        ]
+    )
+
+
+def get_listing_rejection(page, link, card, title=None):
+    """
+    Returns why an event is rejected from its listing card, before loading its
+    page, or None.
+    """
+    # Organizers and venues may be named after plenaries: only the title tells
+    if is_plenary(title if title is not None else card.split("\n")[0]):
+        return "plénière"
+
+    # Statuses and badges are the lines of the card other than its title
+    if title is None:
+        return None
+    statuses = [line for line in card.split("\n") if line.strip() != title.strip()]
+
+    # Organizer endpoint cards list the status of the event
+    if any(line.strip().lower() in EXPIRED_STATUSES for line in statuses):
+        return "event expired"
+
+    # Sold out events are rejected, as the Eventbrite UX then hides relevant info
+    if any(is_sales_ended(line) for line in statuses):
+        return "sold out"
+
+    return None
+
+
+def get_event_id(link):
+    match = re.search(r"/e/(?:[^/?]*-)?(\d+)", link)
+    return match.group(1) if match else link
+
+
+def get_uuid(link):
+    match = re.search(r"/e/([^/?]+)", link or "")
+    return match.group(1) if match else None
+
+
+def get_embedded_fields(driver):
+    """
+    Returns the fields of the event page loaded by the driver, read from its
+    JSON-LD data, or None if the page has none.
+    """
+    data = driver.execute_script(EMBEDDED_DATA_SCRIPT)
+    events = [
+        item
+        for item in get_json_ld(data["jsonLd"])
+        if has_type(item, "Event") and item.get("startDate")
+    ]
+    if not events:
+        return None
+    event = events[0]
+
+    ################################################################
+    # Sessions
+    ################################################################
+    # Events with multiple dates list them as sub-events, or as distinct events
+    occurrences = [
+        item
+        for item in event.get("subEvent", [])
+        if isinstance(item, dict) and item.get("startDate")
+    ] or events
+
+    now = datetime.now()
+    sessions = []
+    upcoming = 0
+    for occurrence in occurrences:
+        tickets_link = occurrence.get("url") or event.get("url")
+        uuid = get_uuid(tickets_link)
+        if uuid is None or uuid in [session[0] for session in sessions]:
+            continue
 
-            # Function to safely click the next button
-            def click_next_button():
-                try:
-                    next_button = WebDriverWait(driver, 10).until(
-                        EC.element_to_be_clickable(
-                            (
-                                By.CSS_SELECTOR,
-                                "div.organizer-profile__section--content div.organizer-profile__show-more > button",
-                            )
-                        )
-                    )
+        try:
+            event_start_datetime = to_local_datetime(occurrence["startDate"])
+            event_end_datetime = to_local_datetime(
+                occurrence.get("endDate", occurrence["startDate"])
+            )
+        except ValueError as error:
+            logging.info(f"Reject record: {error}")
+            continue
+
+        if event_end_datetime < now:
+            continue
+        upcoming += 1
+
+        if is_sold_out_offer(occurrence.get("offers", event.get("offers"))):
+            continue
+
+        sessions.append([uuid, event_start_datetime, event_end_datetime, tickets_link])
+
+    ################################################################
+    # Location data
+    ################################################################
+    location = event.get("location") or {}
+    if isinstance(location, list):
+        location = location[0] if location else {}
+    location_name = location.get("name") or ""
+    address = location.get("address") or ""
+    if isinstance(address, dict):
+        city = " ".join(
+            part for part in [address.get("postalCode"), address.get("addressLocality")] if part
+        )
+        address = ", ".join(part for part in [address.get("streetAddress"), city] if part)
+
+    return {
+        "expired": upcoming == 0,
+        "sold_out": upcoming > 0 and not sessions,
+        "title": event.get("name", ""),
+        "online": has_type(location, "VirtualLocation") or is_online(location_name),
+        "location_name": location_name,
+        "full_location": f"{location_name}, {address}",
+        "description": data["description"],
+        "sessions": sessions,
+    }
+
+
+def get_page_fields(driver):
+    """
+    Returns the fields of the event page loaded by the driver, read from the
+    page itself, clicking through its dates.
+    """
+    wait_for_network_idle(driver)  # Pages are quite long to load
+    delete_cookies_overlay(driver)
+
+    fields = extract(driver, PAGE_FIELDS)
+
+    ################################################################
+    # Has it expired?
+    ################################################################
+    if fields["expired_badge"] or fields["expired"]:
+        return {"expired": True}
+
+    ################################################################
+    # Is it full?
+    ################################################################
+    if fields["sales_ended"]:
+        return {"sold_out": True}
+
+    ################################################################
+    # Parse event title
+    ################################################################
+    require(fields, "title")
+    title = fields["title"]
+
+    ###########################################################
+    # Is it an online event?
+    ################################################################
+    online = fields["address_text"] is not None and is_online(fields["address_text"])
+
+    ################################################################
+    # Location data
+    ################################################################
+    location_name = ""
+    full_location = ""
+    if not online:
+        require(fields, "location")
+        full_location_text = fields["location"].split("\n")
+        location_name = full_location_text[0]
+        address_and_city = full_location_text[1]
+        full_location = f"{location_name}, {address_and_city}"
+
+    ################################################################
+    # Description
+    ################################################################
+    description = fields["description"]
+
+    ################################################################
+    # Multiple events
+    ################################################################
+    event_info = []
+
+    date_time_div = fields["date_time"]
+    if date_time_div is not None:
+        driver.execute_script("window.scrollBy(0, arguments[0]);", 800)
+
+        li_elements = date_time_div.find_elements(By.CSS_SELECTOR, "li:not([data-heap-id])")
+        for li in li_elements:
+            clickable_li = wait_for_clickable(driver, li)
+            if clickable_li is None:
+                continue
+            clickable_li.click()
 
-                    desired_y = (next_button.size["height"] / 2) + next_button.location["y"]
-                    window_h = driver.execute_script("return window.innerHeight")
-                    window_y = driver.execute_script("return window.pageYOffset")
-                    current_y = (window_h / 2) + window_y
-                    scroll_y_by = desired_y - current_y
+            ################################################################
+            # Dates
+            ################################################################
+            event_time = extract(driver, DATE_FIELDS)["event_time"]
+            if event_time is None:
+                raise FreskDateNotFound
 
-                    driver.execute_script("window.scrollBy(0, arguments[0]);", scroll_y_by)
-                    next_button.click()
+            try:
+                event_start_datetime, event_end_datetime = get_dates(event_time)
+            except FreskDateBadFormat as error:
+                logging.info(f"Reject record: {error}")
+                continue
 
-                except StaleElementReferenceException:
-                    click_next_button()  # Retry if the element is stale
+            ################################################################
+            # Parse tickets link
+            ################################################################
+            tickets_link = driver.current_url
 
-            click_next_button()
+            ################################################################
+            # Parse event id
+            ################################################################
+            uuid = get_uuid(tickets_link)
+
+            # Selenium clicks on "sold out" cards (li elements), but this
+            # has no effect. Worse, this adds the previous non-sold out
+            # event another time. One can detect such cases by scanning
+            # through previous event ids.
+            already_scanned = False
+            for event in event_info:
+                if uuid in event[0]:
+                    already_scanned = True
+
+            if not already_scanned:
+                event_info.append([uuid, event_start_datetime, event_end_datetime, tickets_link])
 
-        except TimeoutException:
-            more_content = False
+    # There is only one event on this page.
+    else:
+        ################################################################
+        # Dates
+        ################################################################
+        try:
+            event_time = extract(driver, DATE_FIELDS, required=("event_time",))["event_time"]
+            event_start_datetime, event_end_datetime = get_dates(event_time)
 
+            ################################################################
+            # Parse tickets link and event id
+            ################################################################
+            tickets_link = driver.current_url
+            uuid = get_uuid(tickets_link)
+
+            event_info.append([uuid, event_start_datetime, event_end_datetime, tickets_link])
+        except (NoSuchElementException, FreskDateBadFormat) as error:
+            logging.info(f"Reject record: {error}")
+
+    return {
+        "expired": False,
+        "sold_out": False,
+        "title": title,
+        "online": online,
+        "location_name": location_name,
+        "full_location": full_location,
+        "description": description,
+        "sessions": event_info,
+    }
+
+
+def get_eventbrite_records(page, fields):
+    """
+    Returns the records of the sessions of an event from its fields, or None
+    if the event is rejected.
+    """
+    if fields.get("expired"):
+        logging.info("Rejecting record: event expired")
+        return None
+
+    if fields.get("sold_out"):
+        # We reject sold out events as the Eventbrite UX hides
+        # relevant info in this case (which looks like an awful practice)
+        logging.info("Rejecting record: sold out")
+        return None
+
+    title = fields["title"]
+    if is_plenary(title):
+        logging.info("Rejecting record: plénière")
+        return None
+
+    description = fields["description"]
+    if description is None:
+        logging.info("Rejecting record: Description not found.")
+        return None
+
+    if not fields["sessions"]:
+        logging.info("Rejecting record: no upcoming session")
+        return None
+
+    ################################################################
+    # Location data
+    ################################################################
+    online = fields["online"]
+    full_location = ""
+    location_name = ""
+    address = ""
+    city = ""
+    department = ""
+    longitude = ""
+    latitude = ""
+    zip_code = ""
+    country_code = ""
+
+    if not online:
+        full_location = fields["full_location"]
+        try:
+            address_dict = get_address(full_location)
+            (
+                location_name,
+                address,
+                city,
+                department,
+                zip_code,
+                country_code,
+                latitude,
+                longitude,
+            ) = address_dict.values()
+        except FreskError as error:
+            logging.info(f"Rejecting record: {error}.")
+            return None
+
+    ################################################################
+    # Training?
+    ################################################################
+    training = is_training(title)
+
+    ################################################################
+    # Is it suited for kids?
+    ################################################################
+    kids = False
+
+    ################################################################
+    # Session loop
+    ################################################################
+    records = []
+    for index, (
+        uuid,
+        event_start_datetime,
+        event_end_datetime,
+        session_link,
+    ) in enumerate(fields["sessions"]):
+        record = get_record_dict(
+            f"{page['id']}-{uuid}",
+            page["id"],
+            title,
+            event_start_datetime,
+            event_end_datetime,
+            full_location,
+            location_name,
+            address,
+            city,
+            department,
+            zip_code,
+            country_code,
+            latitude,
+            longitude,
+            page.get(
+                "language_code",
+                detect_language_code(title, description),
+            ),
+            online,
+            training,
+            False,
+            kids,
+            session_link,
+            session_link,
+            description,
+        )
+        records.append(record)
+        logging.info(f"Successfully scraped {session_link}\n{json.dumps(record, indent=4)}")
 
-def get_eventbrite_data(sources, service, options):
+    return records
+
+
+def get_eventbrite_data(sources, pool, store, sink):
     logging.info("Scraping data from eventbrite.fr")
 
-    driver = webdriver.Firefox(service=service, options=options)
+    driver = pool.acquire()
 
     records = []
 
     for page in sources:
         logging.info(f"==================\nProcessing page {page}")
-        driver.get(page["url"])
-        driver.implicitly_wait(5)
 
-        # Scroll to bottom to load all events
-        scroll_to_bottom(driver)
-        driver.execute_script("window.scrollTo(0, 0);")
-
-        elements = []
-        future_events = driver.find_element(
-            By.CSS_SELECTOR, 'div[data-testid="organizer-profile__future-events"]'
-        )
-        event_card_divs = future_events.find_elements(By.CSS_SELECTOR, "div.event-card")
-
-        logging.info(f"Found {len(event_card_divs)} events")
+        # Organizer pages load their events from a paginated JSON endpoint,
+        # collections (/cc/ urls) are still scrolled through
+        cards = None
+        if "/o/" in page["url"] and is_static_enabled(page["url"]):
+            try:
+                cards = get_organizer_listing(page["url"])
+            except FreskStaticParseError as error:
+                logging.info(f"{error} Falling back to the webdriver.")
+
+        if cards is None:
+            pool.load(driver, page["url"])
+
+            # Scroll to bottom to load all events
+            scroll_to_bottom(driver)
+            driver.execute_script("window.scrollTo(0, 0);")
+
+            future_events_selector = 'div[data-testid="organizer-profile__future-events"]'
+            if wait_for_element(driver, By.CSS_SELECTOR, future_events_selector) is None:
+                raise NoSuchElementException("Future events not found")
+            cards = get_listing(
+                driver,
+                f"{future_events_selector} div.event-card a.event-card-link",
+                "div.event-card",
+                "h3",
+            )
 
-        for event_card_div in event_card_divs:
-            link_elements = event_card_div.find_elements(By.CSS_SELECTOR, "a.event-card-link")
-            elements.extend(link_elements)
+        logging.info(f"Found {len(cards)} events")
 
-        links = []
-        for link_element in elements:
-            href = link_element.get_attribute("href")
+        # Events may be listed several times, keep the first link of each
+        unique_cards = {}
+        for href, card, title in cards:
             if href:
-                links.append(href)
-        links = np.unique(links)
+                unique_cards.setdefault(get_event_id(href), (href, card, title))
 
-        for link in links:
+        for link, card, title in unique_cards.values():
             logging.info(f"\n-> Processing {link} ...")
-            driver.get(link)
-            delete_cookies_overlay(driver)
-            driver.implicitly_wait(3)
-            time.sleep(3)  # Pages are quite long to load
-
-            ################################################################
-            # Has it expired?
-            ################################################################
-            try:
-                badge = driver.find_element(
-                    By.XPATH, '//div[@data-testid="enhancedExpiredEventsBadge"]'
-                )
-                # If the element has children elements, it is enabled
-                try:
-                    if badge.find_elements(By.XPATH, "./*"):
-                        logging.info("Rejecting record: event expired")
-                        continue
-                except StaleElementReferenceException:
-                    if driver.find_element(
-                        By.XPATH, '//div[@data-testid="enhancedExpiredEventsBadge"]'
-                    ).find_elements(By.XPATH, "./*"):
-                        logging.info("Rejecting record: event expired")
-                        continue
-
-            except NoSuchElementException:
-                pass
+            metrics.set_event(link)
 
-            try:
-                badge = driver.find_element(By.CSS_SELECTOR, "div.enhanced-expired-badge")
-                logging.info("Rejecting record: event expired")
+            reason = get_listing_rejection(page, link, card, title)
+            if reason:
+                store.skip(reason)
                 continue
-            except NoSuchElementException:
-                pass
 
-            ################################################################
-            # Is it full?
-            ################################################################
-            sold_out = False
-            try:
-                badge = driver.find_element(By.XPATH, '//div[@data-testid="salesEndedMessage"]')
-                # If the element has children elements, it is enabled
-                sold_out = bool(badge.find_elements(By.XPATH, "./*"))
-            except NoSuchElementException:
-                pass
-
-            if sold_out:
-                # We reject sold out events as the Eventbrite UX hides
-                # relevant info in this case (which looks like an awful practice)
-                logging.info("Rejecting record: sold out")
+            # Reuse the records of events unchanged since the previous run
+            fingerprint = get_fingerprint(card)
+            stored_records = store.get(page, link, fingerprint)
+            if stored_records is not None:
+                records += stored_records
+                sink.extend(stored_records)
                 continue
 
-            ################################################################
-            # Parse event title
-            ################################################################
-            title_el = driver.find_element(
-                by=By.TAG_NAME,
-                value="h1",
-            )
-            title = title_el.text
-
-            if is_plenary(title):
-                logging.info("Rejecting record: plénière")
-                continue
-
-            ###########################################################
-            # Is it an online event?
-            ################################################################
-            online = False
-            try:
-                online_el = driver.find_element(By.CSS_SELECTOR, "p.location-info__address-text")
-                online = is_online(online_el.text)
-            except NoSuchElementException:
-                pass
+            driver = pool.recycle(driver)
+            pool.load(driver, link)
 
-            ################################################################
-            # Location data
-            ################################################################
-            full_location = ""
-            location_name = ""
-            address = ""
-            city = ""
-            department = ""
-            longitude = ""
-            latitude = ""
-            zip_code = ""
-            country_code = ""
-
-            if not online:
-                location_el = driver.find_element(By.CSS_SELECTOR, "div.location-info__address")
-                full_location_text = location_el.text.split("\n")
-                location_name = full_location_text[0]
-                address_and_city = full_location_text[1]
-                full_location = f"{location_name}, {address_and_city}"
-
-                try:
-                    address_dict = get_address(full_location)
-                    (
-                        location_name,
-                        address,
-                        city,
-                        department,
-                        zip_code,
-                        country_code,
-                        latitude,
-                        longitude,
-                    ) = address_dict.values()
-                except FreskError as error:
-                    logging.info(f"Rejecting record: {error}.")
-                    continue
+            # All dates, the venue and the availability are embedded in the page,
+            # the page itself is only read when they are missing
+            fields = get_embedded_fields(driver)
+            if fields is None:
+                logging.info("Embedded event data not found, reading the page instead")
+                fields = get_page_fields(driver)
 
-            ################################################################
-            # Description
-            ################################################################
-            try:
-                description_title_el = driver.find_element(By.CSS_SELECTOR, "div.eds-text--left")
-                description = description_title_el.text
-            except NoSuchElementException:
-                logging.info("Rejecting record: Description not found.")
+            link_records = get_eventbrite_records(page, fields)
+            if link_records is None:
                 continue
 
-            ################################################################
-            # Training?
-            ################################################################
-            training = is_training(title)
-
-            ################################################################
-            # Is it suited for kids?
-            ################################################################
-            kids = False
+            records += link_records
+            sink.extend(link_records)
+            store.put(page, link, fingerprint, link_records)
 
-            ################################################################
-            # Multiple events
-            ################################################################
-            event_info = []
-
-            try:
-                date_time_div = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "div.select-date-and-time"))
-                )
-                if date_time_div:
-                    driver.execute_script("window.scrollBy(0, arguments[0]);", 800)
-
-                    li_elements = date_time_div.find_elements(
-                        By.CSS_SELECTOR, "li:not([data-heap-id])"
-                    )
-                    for li in li_elements:
-                        clickable_li = WebDriverWait(driver, 10).until(
-                            EC.element_to_be_clickable(li)
-                        )
-                        clickable_li.click()
-
-                        ################################################################
-                        # Dates
-                        ################################################################
-                        try:
-                            date_info_el = driver.find_element(
-                                by=By.CSS_SELECTOR,
-                                value="span.date-info__full-datetime",
-                            )
-                            event_time = date_info_el.text
-                        except NoSuchElementException:
-                            raise FreskDateNotFound
-
-                        try:
-                            event_start_datetime, event_end_datetime = get_dates(event_time)
-                        except FreskDateBadFormat as error:
-                            logging.info(f"Reject record: {error}")
-                            continue
-
-                        ################################################################
-                        # Parse tickets link
-                        ################################################################
-                        tickets_link = driver.current_url
-
-                        ################################################################
-                        # Parse event id
-                        ################################################################
-                        uuid = re.search(r"/e/([^/?]+)", tickets_link).group(1)
-
-                        # Selenium clicks on "sold out" cards (li elements), but this
-                        # has no effect. Worse, this adds the previous non-sold out
-                        # event another time. One can detect such cases by scanning
-                        # through previous event ids.
-                        already_scanned = False
-                        for event in event_info:
-                            if uuid in event[0]:
-                                already_scanned = True
-
-                        if not already_scanned:
-                            event_info.append(
-                                [uuid, event_start_datetime, event_end_datetime, tickets_link]
-                            )
-
-            # There is only one event on this page.
-            except TimeoutException:
-                ################################################################
-                # Dates
-                ################################################################
-                try:
-                    date_info_el = driver.find_element(
-                        by=By.CSS_SELECTOR,
-                        value="span.date-info__full-datetime",
-                    )
-                    event_time = date_info_el.text
-                except NoSuchElementException as error:
-                    logging.info(f"Reject record: {error}")
-                    continue
-
-                try:
-                    event_start_datetime, event_end_datetime = get_dates(event_time)
-                except FreskDateBadFormat as error:
-                    logging.info(f"Reject record: {error}")
-                    continue
-
-                ################################################################
-                # Parse tickets link
-                ################################################################
-                tickets_link = driver.current_url
-
-                ################################################################
-                # Parse event id
-                ################################################################
-                uuid = re.search(r"/e/([^/?]+)", tickets_link).group(1)
-
-                event_info.append([uuid, event_start_datetime, event_end_datetime, tickets_link])
-
-            ################################################################
-            # Session loop
-            ################################################################
-            for index, (
-                uuid,
-                event_start_datetime,
-                event_end_datetime,
-                link,
-            ) in enumerate(event_info):
-                record = get_record_dict(
-                    f"{page['id']}-{uuid}",
-                    page["id"],
-                    title,
-                    event_start_datetime,
-                    event_end_datetime,
-                    full_location,
-                    location_name,
-                    address,
-                    city,
-                    department,
-                    zip_code,
-                    country_code,
-                    latitude,
-                    longitude,
-                    page.get(
-                        "language_code",
-                        detect_language_code(title, description),
-                    ),
-                    online,
-                    training,
-                    sold_out,
-                    kids,
-                    link,
-                    link,
-                    description,
-                )
-                records.append(record)
-                logging.info(f"Successfully scraped {link}\n{json.dumps(record, indent=4)}")
-
-    driver.quit()
+    pool.release(driver)
 
     return records
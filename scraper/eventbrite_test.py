@@ -0,0 +1,138 @@
+import logging
+
+from scraper import eventbrite
+from utils.errors import FreskStaticParseError
+
+PAGE = {
+    "name": "Fresque du Climat",
+    "url": "https://www.eventbrite.fr/o/la-fresque-du-climat-18716137245",
+    "type": "scraper",
+    "id": 200,
+}
+
+
+def get_event(name, status="live", is_sold_out=False):
+    """
+    Returns an event as listed by the organizer events endpoint.
+    """
+    return {
+        "name": {"text": name},
+        "url": "https://www.eventbrite.fr/e/atelier-fresque-du-climat-tickets-1116862910029",
+        "start": {"local": "2099-04-12T10:00:00"},
+        "end": {"local": "2099-04-12T13:00:00"},
+        "status": status,
+        "is_sold_out": is_sold_out,
+    }
+
+
+class Endpoint:
+    """
+    Serves the pages of the organizer events endpoint, recording the requests.
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+
+    def get_json(self, url, params=None):
+        self.requests.append((url, params["page"]))
+        events, has_next_page = self.pages[params["page"] - 1]
+        return {"data": {"events": events, "has_next_page": has_next_page}}
+
+
+def get_card(event):
+    return (event["url"], eventbrite.get_card_text(event), eventbrite.get_card_title(event))
+
+
+def run_tests():
+    link = "https://www.eventbrite.fr/e/atelier-fresque-du-climat-tickets-1116862910029"
+
+    # tuple fields:
+    # 1. Test case name or ID
+    # 2. Listing card: link, text and title
+    # 3. Expected rejection reason
+    test_cases = [
+        ("Live event", get_card(get_event("Atelier Fresque du Climat")), None),
+        ("Ended event", get_card(get_event("Atelier Fresque du Climat", "ended")), "event expired"),
+        (
+            "Sold out event",
+            get_card(get_event("Atelier Fresque du Climat", is_sold_out=True)),
+            "sold out",
+        ),
+        ("Plenary", get_card(get_event("Plénière de la Fresque du Climat")), "plénière"),
+        ("Title with a status word", get_card(get_event("Atelier complet en ligne")), None),
+        (
+            "Venue named after plenaries",
+            (
+                link,
+                "Atelier Fresque du Climat\nsam. 12 avr. 10:00\nSalle Plénière - Mairie du 11e",
+                "Atelier Fresque du Climat",
+            ),
+            None,
+        ),
+        (
+            "Card with ended sales",
+            (
+                link,
+                "Atelier Fresque du Climat\nsam. 12 avr. 10:00\nSales Ended",
+                "Atelier Fresque du Climat",
+            ),
+            "sold out",
+        ),
+        (
+            "Card without title",
+            (link, "Plénière\nsam. 12 avr. 10:00\nSales Ended", None),
+            "plénière",
+        ),
+    ]
+    for test_case in test_cases:
+        logging.info(f"Running {test_case[0]}")
+        actual = eventbrite.get_listing_rejection(PAGE, *test_case[1])
+        if actual == test_case[2]:
+            logging.info("Result matches")
+        else:
+            logging.error(f"{test_case[0]}: expected {test_case[2]} but got {actual}")
+
+    # tuple fields:
+    # 1. Test case name or ID
+    # 2. Pages of the endpoint: events and whether there is a next page
+    # 3. Expected number of cards
+    # 4. Expected number of requests
+    test_cases = [
+        ("Single page", [([get_event("Atelier")], False)], 1, 1),
+        (
+            "Several pages",
+            [([get_event("Atelier")] * 2, True), ([get_event("Atelier")], False)],
+            3,
+            2,
+        ),
+        ("Empty page announcing a next one", [([], True), ([get_event("Atelier")], False)], 0, 1),
+        ("Event without link", [([{**get_event("Atelier"), "url": None}], False)], 0, 1),
+    ]
+    get_json = eventbrite.get_json
+    try:
+        for test_case in test_cases:
+            logging.info(f"Running {test_case[0]}")
+            endpoint = Endpoint(test_case[1])
+            eventbrite.get_json = endpoint.get_json
+            cards = eventbrite.get_organizer_listing(PAGE["url"])
+            if len(cards) == test_case[2] and len(endpoint.requests) == test_case[3]:
+                logging.info("Result matches")
+            else:
+                logging.error(
+                    f"{test_case[0]}: expected {test_case[2]} cards in {test_case[3]} requests "
+                    f"but got {cards} in {endpoint.requests}"
+                )
+
+        logging.info("Running endpoint url")
+        if endpoint.requests[0][0] != "https://www.eventbrite.fr/org/18716137245/showmore/":
+            logging.error(f"Organizer listing: unexpected endpoint {endpoint.requests[0][0]}")
+
+        logging.info("Running url without organizer id")
+        try:
+            eventbrite.get_organizer_listing("https://www.eventbrite.fr/d/france/fresque/")
+            logging.error("Organizer listing: expected an error without organizer id")
+        except FreskStaticParseError:
+            logging.info("Result matches")
+    finally:
+        eventbrite.get_json = get_json
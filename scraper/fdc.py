@@ -1,242 +1,400 @@
 import json
 import re
-import time
 import logging
 
-from selenium import webdriver
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from urllib.parse import urldefrag, urljoin
+
+from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 
 from db.records import get_record_dict
+from scraper.dom import extract, probe
+from scraper.listing import get_listing
+from scraper.static import fetch_all, get_attribute, get_soup, get_text, is_static_enabled
+from scraper.store import get_fingerprint
+from scraper.wait import (
+    get_url,
+    wait_for_clickable,
+    wait_for_element,
+    wait_for_ready,
+    wait_for_stable_count,
+    wait_for_url_change,
+)
 from utils.date_and_time import get_dates
-from utils.errors import FreskError, FreskDateBadFormat, FreskLanguageNotRecognized
+from utils.errors import (
+    FreskError,
+    FreskDateBadFormat,
+    FreskLanguageNotRecognized,
+    FreskStaticParseError,
+)
+from utils import metrics
 from utils.keywords import *
 from utils.language import get_language_code
 from utils.location import get_address
 
+# Define the regex pattern for UUIDs
+UUID_PATTERN = r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+
+# Fields of an event page, most of them next to an icon
+EVENT_FIELDS = {
+    "title": {"css": "h3"},
+    "event_time": {"css": ".fa-clock", "parent": 1},
+    "language": {"css": "div.mb-3 > i.fa-globe", "parent": 1},
+    "online": {"css": ".fa-video", "exists": True},
+    "full_location": {"css": ".fa-map-pin", "parent": 1},
+    "description": {"xpath": "//strong[text()='Description']", "parent": 1},
+    "sold_out": {"css": ".fa-user", "parent": 2},
+    "tickets_link": {"css": ".fa-user", "parent": 1, "attribute": "href"},
+}
+
+# Link to the next page of the listing iframe
+NEXT_BUTTON = "//a[@class='page-link' and contains(text(), 'Suivant')]"
+
+
+def get_static_listing(page):
+    """
+    Returns the (link, card text) pairs of the events listed by all the pages of
+    the listing iframe, fetched without a browser.
+    """
+    soup, url = get_soup(page["url"])
+    listing_url = get_attribute(soup, "iframe", "src", url)
+    if listing_url is None:
+        raise FreskStaticParseError(page["url"], "iframe not found")
+
+    cards = []
+    visited = set()
+    while listing_url and listing_url not in visited:
+        visited.add(listing_url)
+        soup, url = get_soup(listing_url)
+        for a in soup.select("a.link-dark"):
+            if a.get("href"):
+                card = a.find_parent("div", class_="card") or a.parent
+                cards.append((urljoin(url, a["href"]), get_text(card)))
+
+        # The "Suivant" link points to the same listing with the next page parameter
+        next_link = next(
+            (a for a in soup.select("a.page-link") if "Suivant" in a.get_text() and a.get("href")),
+            None,
+        )
+        listing_url = urldefrag(urljoin(url, next_link["href"])).url if next_link else None
+
+    if not cards:
+        # The listing may be rendered by scripts
+        raise FreskStaticParseError(page["url"], "no events found")
+    return cards
+
+
+def get_static_fields(soup, url, link):
+    """
+    Returns the raw fields of an event page fetched without a browser.
+    """
+    title = soup.select_one("h3")
+    clock_icon = soup.select_one(".fa-clock")
+    description_title = soup.find("strong", string="Description")
+    user_icon = soup.select_one(".fa-user")
+    if title is None or clock_icon is None or description_title is None or user_icon is None:
+        raise FreskStaticParseError(link, "event details not found")
+
+    globe_in_event = soup.select_one("div.mb-3 > i.fa-globe")
+    online = soup.select_one(".fa-video") is not None
+
+    full_location = ""
+    if not online:
+        pin_icon = soup.select_one(".fa-map-pin")
+        if pin_icon is None:
+            raise FreskStaticParseError(link, "location not found")
+        full_location = get_text(pin_icon.parent)
+
+    tickets_link = user_icon.parent.get("href")
+
+    return {
+        "title": get_text(title),
+        "event_time": get_text(clock_icon.parent),
+        "language": get_text(globe_in_event.parent) if globe_in_event else None,
+        "online": online,
+        "full_location": full_location,
+        "description": get_text(description_title.parent),
+        "sold_out": get_text(user_icon.parent.parent),
+        "tickets_link": urljoin(url, tickets_link) if tickets_link else None,
+    }
+
+
+def get_selenium_fields(driver):
+    """
+    Returns the raw fields of the event page loaded by the driver.
+    """
+    wait_for_element(driver, By.CSS_SELECTOR, EVENT_FIELDS["title"]["css"], timeout=3)
+    fields = extract(
+        driver,
+        EVENT_FIELDS,
+        required=("title", "event_time", "description", "sold_out"),
+    )
+    if fields["online"]:
+        fields["full_location"] = ""
+    elif fields["full_location"] is None:
+        raise NoSuchElementException("Location not found")
+    return fields
+
+
+def get_fdc_record(page, link, uuid, fields):
+    """
+    Returns the record of an event from the raw fields of its page, or None if
+    the event is rejected.
+    """
+    title = fields["title"]
+
+    ################################################################
+    # Parse start and end dates
+    ################################################################
+    try:
+        event_start_datetime, event_end_datetime = get_dates(fields["event_time"])
+    except FreskDateBadFormat as error:
+        logging.info(f"Reject record: {error}")
+        return None
+
+    ################################################################
+    # Workshop language
+    ################################################################
+    language_code = None
+    if fields["language"] is None:
+        logging.warning("Unable to find workshop language on the page.")
+    else:
+        try:
+            language_code = get_language_code(fields["language"])
+        except FreskLanguageNotRecognized as e:
+            logging.warning(f"Unable to parse workshop language: {e}")
+
+    ################################################################
+    # Location data
+    ################################################################
+    online = fields["online"]
+    full_location = fields["full_location"]
+    location_name = ""
+    address = ""
+    city = ""
+    department = ""
+    longitude = ""
+    latitude = ""
+    zip_code = ""
+    country_code = ""
+
+    if not online:
+        try:
+            logging.info(f"Full location: {full_location}")
+            address_dict = get_address(full_location)
+            (
+                location_name,
+                address,
+                city,
+                department,
+                zip_code,
+                country_code,
+                latitude,
+                longitude,
+            ) = address_dict.values()
+        except FreskError as error:
+            logging.info(f"Rejecting record: {error}.")
+            return None
+
+    ################################################################
+    # Training?
+    ################################################################
+    training = is_training(title)
+
+    ################################################################
+    # Is it full?
+    ################################################################
+    sold_out = is_sold_out(fields["sold_out"])
+
+    ################################################################
+    # Is it suited for kids?
+    ################################################################
+    kids = is_for_kids(fields["description"]) and not training
+
+    ################################################################
+    # Building final object
+    ################################################################
+    return get_record_dict(
+        f"{page['id']}-{uuid}",
+        page["id"],
+        title,
+        event_start_datetime,
+        event_end_datetime,
+        full_location,
+        location_name,
+        address,
+        city,
+        department,
+        zip_code,
+        country_code,
+        latitude,
+        longitude,
+        language_code,
+        online,
+        training,
+        sold_out,
+        kids,
+        link,
+        fields["tickets_link"],
+        fields["description"],
+    )
+
+
+def switch_to_listing(driver):
+    """
+    Switches to the listing iframe of the page loaded by the driver, once its
+    events are displayed.
+    """
+    iframe = wait_for_element(driver, By.TAG_NAME, "iframe")
+    if iframe is None:
+        raise NoSuchElementException("Listing iframe not found")
+    driver.switch_to.frame(iframe)
+    wait_for_ready(driver)
+    wait_for_stable_count(driver, By.CSS_SELECTOR, "a.link-dark")
+
+
+def get_selenium_listing(pool, driver, page):
+    """
+    Returns the (link, card text) pairs of the events listed by all the pages of
+    the listing iframe, loaded by the webdriver.
+    """
+    pool.load(driver, page["url"])
+    switch_to_listing(driver)
 
-def get_fdc_data(sources, service, options):
+    cards = []
+    while True:
+        cards += get_listing(driver, "a.link-dark", "div.card")
+
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        # The last page has no next button
+        next_button = probe(driver, next=NEXT_BUTTON)["next"]
+        if next_button is None or wait_for_clickable(driver, next_button, timeout=3) is None:
+            break
+        next_button.location_once_scrolled_into_view
+        listing_url = get_url(driver)
+        next_button.click()
+        wait_for_url_change(driver, listing_url)
+        wait_for_ready(driver)
+        wait_for_stable_count(driver, By.CSS_SELECTOR, "a.link-dark")
+
+    driver.switch_to.default_content()
+    return cards
+
+
+def get_selenium_records(pool, driver, page, store, sink):
+    """
+    Scrapes the events of a page with the webdriver. All the pages of the listing
+    are read first, then events are loaded by url.
+    """
+    records = []
+
+    for link, card in get_selenium_listing(pool, driver, page):
+        logging.info(f"\n-> Processing {link} ...")
+        metrics.set_event(link)
+
+        # Reuse the record of events unchanged since the previous run
+        fingerprint = get_fingerprint(card)
+        stored_records = store.get(page, link, fingerprint)
+        if stored_records is not None:
+            records += stored_records
+            sink.extend(stored_records)
+            continue
+
+        uuids = re.findall(UUID_PATTERN, link)
+        if not uuids:
+            logging.info("Rejecting record: UUID not found")
+            continue
+
+        pool.load(driver, link)
+
+        record = get_fdc_record(page, link, uuids[0], get_selenium_fields(driver))
+        if record is not None:
+            records.append(record)
+            sink.append(record)
+            store.put(page, link, fingerprint, [record])
+            logging.info(f"Successfully scraped {link}\n{json.dumps(record, indent=4)}")
+
+    return records
+
+
+def get_fdc_data(sources, pool, store, sink):
     logging.info("Scraping data from fresqueduclimat.org")
 
-    driver = webdriver.Firefox(service=service, options=options)
+    # Pages are fetched without a browser when possible, the webdriver is
+    # only acquired for those which cannot be parsed statically
+    driver = None
 
     records = []
 
     for page in sources:
         logging.info("========================")
-        driver.get(page["url"])
-        driver.implicitly_wait(2)
-
-        wait = WebDriverWait(driver, 10)
-        iframe = wait.until(EC.presence_of_element_located((By.TAG_NAME, "iframe")))
-        driver.switch_to.frame(iframe)
-
-        while True:
-            ele = driver.find_elements(By.CSS_SELECTOR, "a.link-dark")
-            links = [e.get_attribute("href") for e in ele]
-
-            for link in links:
-                logging.info(f"\n-> Processing {link} ...")
-                driver.get(link)
-                driver.implicitly_wait(3)
-
-                ################################################################
-                # Parse event id
-                ################################################################
-                # Define the regex pattern for UUIDs
-                uuid_pattern = (
-                    r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
-                )
-                uuids = re.findall(uuid_pattern, link)
-                if not uuids:
-                    logging.info("Rejecting record: UUID not found")
-                    driver.back()
-                    wait = WebDriverWait(driver, 10)
-                    iframe = wait.until(EC.presence_of_element_located((By.TAG_NAME, "iframe")))
-                    driver.switch_to.frame(iframe)
-                    continue
-
-                ################################################################
-                # Parse event title
-                ################################################################
-                title_el = driver.find_element(
-                    by=By.TAG_NAME,
-                    value="h3",
-                )
-                title = title_el.text
-
-                ################################################################
-                # Parse start and end dates
-                ################################################################
-                clock_icon = driver.find_element(By.CLASS_NAME, "fa-clock")
-                parent_div = clock_icon.find_element(By.XPATH, "..")
-                event_time = parent_div.text
 
+        cards = None
+        if is_static_enabled(page["url"]):
+            try:
+                cards = get_static_listing(page)
+            except FreskStaticParseError as error:
+                logging.info(f"{error} Falling back to the webdriver.")
+
+        if cards is None:
+            driver = pool.recycle(driver) if driver else pool.acquire()
+            records += get_selenium_records(pool, driver, page, store, sink)
+            continue
+
+        pending = []
+        for link, card in cards:
+            logging.info(f"\n-> Processing {link} ...")
+            metrics.set_event(link)
+
+            # Reuse the record of events unchanged since the previous run
+            fingerprint = get_fingerprint(card)
+            stored_records = store.get(page, link, fingerprint)
+            if stored_records is not None:
+                records += stored_records
+                sink.extend(stored_records)
+                continue
+
+            ################################################################
+            # Parse event id
+            ################################################################
+            uuids = re.findall(UUID_PATTERN, link)
+            if not uuids:
+                logging.info("Rejecting record: UUID not found")
+                continue
+
+            pending.append((link, uuids[0], fingerprint))
+
+        # Event pages are independent, fetch them all at once
+        event_pages = fetch_all([link for link, _, _ in pending])
+
+        for link, uuid, fingerprint in pending:
+            logging.info(f"\n-> Parsing {link} ...")
+            metrics.set_event(link)
+
+            fields = None
+            result = event_pages[link]
+            if not isinstance(result, FreskStaticParseError):
                 try:
-                    event_start_datetime, event_end_datetime = get_dates(event_time)
-                except FreskDateBadFormat as error:
-                    logging.info(f"Reject record: {error}")
-                    driver.back()
-                    wait = WebDriverWait(driver, 10)
-                    iframe = wait.until(EC.presence_of_element_located((By.TAG_NAME, "iframe")))
-                    driver.switch_to.frame(iframe)
-                    continue
-
-                ################################################################
-                # Workshop language
-                ################################################################
-                language_code = None
-                try:
-                    globe_in_event = driver.find_element(
-                        By.XPATH, '//div[contains(@class, "mb-3")]/i[contains(@class, "fa-globe")]'
-                    )
-                    parent = globe_in_event.find_element(By.XPATH, "..")
-                    language_code = get_language_code(parent.text)
-                except FreskLanguageNotRecognized as e:
-                    logging.warning(f"Unable to parse workshop language: {e}")
-                    language_code = None
-                except NoSuchElementException:
-                    logging.warning("Unable to find workshop language on the page.")
-                    language_code = None
-
-                ################################################################
-                # Is it an online event?
-                ################################################################
-                online = True
-                try:
-                    driver.find_element(By.CLASS_NAME, "fa-video")
-                except NoSuchElementException:
-                    online = False
-
-                ################################################################
-                # Location data
-                ################################################################
-                full_location = ""
-                location_name = ""
-                address = ""
-                city = ""
-                department = ""
-                longitude = ""
-                latitude = ""
-                zip_code = ""
-                country_code = ""
-
-                if not online:
-                    pin_icon = driver.find_element(By.CLASS_NAME, "fa-map-pin")
-                    parent_div = pin_icon.find_element(By.XPATH, "..")
-                    full_location = parent_div.text
-
-                    try:
-                        logging.info(f"Full location: {full_location}")
-                        address_dict = get_address(full_location)
-                        (
-                            location_name,
-                            address,
-                            city,
-                            department,
-                            zip_code,
-                            country_code,
-                            latitude,
-                            longitude,
-                        ) = address_dict.values()
-                    except FreskError as error:
-                        logging.info(f"Rejecting record: {error}.")
-                        driver.back()
-                        wait = WebDriverWait(driver, 10)
-                        iframe = wait.until(EC.presence_of_element_located((By.TAG_NAME, "iframe")))
-                        driver.switch_to.frame(iframe)
-                        continue
-
-                ################################################################
-                # Description
-                ################################################################
-                description_title_el = driver.find_element(
-                    By.XPATH, "//strong[text()='Description']"
-                )
-                parent_description_el = description_title_el.find_element(By.XPATH, "..")
-                description = parent_description_el.text
-
-                ################################################################
-                # Training?
-                ################################################################
-                training = is_training(title)
-
-                ################################################################
-                # Is it full?
-                ################################################################
-                user_icon = driver.find_element(By.CLASS_NAME, "fa-user")
-                parent_container = user_icon.find_element(By.XPATH, "../..")
-                sold_out = is_sold_out(parent_container.text)
-
-                ################################################################
-                # Is it suited for kids?
-                ################################################################
-                kids = is_for_kids(description) and not training
-
-                ################################################################
-                # Parse tickets link
-                ################################################################
-                user_icon = driver.find_element(By.CLASS_NAME, "fa-user")
-                parent_link = user_icon.find_element(By.XPATH, "..")
-                tickets_link = parent_link.get_attribute("href")
-
-                ################################################################
-                # Building final object
-                ################################################################
-                record = get_record_dict(
-                    f"{page['id']}-{uuids[0]}",
-                    page["id"],
-                    title,
-                    event_start_datetime,
-                    event_end_datetime,
-                    full_location,
-                    location_name,
-                    address,
-                    city,
-                    department,
-                    zip_code,
-                    country_code,
-                    latitude,
-                    longitude,
-                    language_code,
-                    online,
-                    training,
-                    sold_out,
-                    kids,
-                    link,
-                    tickets_link,
-                    description,
-                )
-
-                records.append(record)
-                logging.info(f"Successfully scraped {link}\n{json.dumps(record, indent=4)}")
-
-                driver.back()
-                wait = WebDriverWait(driver, 10)
-                iframe = wait.until(EC.presence_of_element_located((By.TAG_NAME, "iframe")))
-                driver.switch_to.frame(iframe)
+                    fields = get_static_fields(*result, link)
+                except FreskStaticParseError as error:
+                    result = error
 
-            try:
-                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                driver.implicitly_wait(2)
-                time.sleep(2)
-                next_button = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable(
-                        (
-                            By.XPATH,
-                            "//a[@class='page-link' and contains(text(), 'Suivant')]",
-                        )
-                    )
-                )
-                next_button.location_once_scrolled_into_view
-                time.sleep(2)
-                next_button.click()
-                time.sleep(10)
-            except TimeoutException:
-                break
-
-    driver.quit()
+            if fields is None:
+                logging.info(f"{result} Falling back to the webdriver.")
+                driver = pool.recycle(driver) if driver else pool.acquire()
+                pool.load(driver, link)
+                fields = get_selenium_fields(driver)
+
+            record = get_fdc_record(page, link, uuid, fields)
+            if record is None:
+                continue
+
+            records.append(record)
+            sink.append(record)
+            store.put(page, link, fingerprint, [record])
+            logging.info(f"Successfully scraped {link}\n{json.dumps(record, indent=4)}")
+
+    if driver is not None:
+        pool.release(driver)
 
     return records
@@ -0,0 +1,157 @@
+import logging
+
+from bs4 import BeautifulSoup
+
+from scraper import fdc
+from utils.errors import FreskStaticParseError
+
+PAGE = {
+    "name": "Fresque du Climat",
+    "url": "https://fresqueduclimat.org/participer-a-un-atelier-grand-public",
+    "type": "scraper",
+    "id": 200,
+}
+
+LISTING_URL = "https://association.climatefresk.org/training_sessions/search_public_wp?lang=fr"
+
+# Pages served by the Fresque du Climat, by url
+PAGES = {
+    "https://fresqueduclimat.org/participer-a-un-atelier-grand-public": f"""
+        <html><body><iframe src="{LISTING_URL}"></iframe></body></html>
+    """,
+    LISTING_URL: """
+        <html><body>
+        <div class="card">
+            <a class="link-dark" href="/training_sessions/5d1b8f0e-3c2a-4f6e-9b7d-2a4c6e8f0a1b/show_public">
+                Atelier Fresque du Climat</a>
+            <div>19/10/2099, 14:00 - 17:00</div>
+        </div>
+        <div class="card">
+            <a class="link-dark" href="/training_sessions/7e3d0a2c-5b4f-4a8e-8c1d-4b6e8a0c2d3f/show_public">
+                Atelier Fresque du Climat en ligne</a>
+            <div>20/10/2099, 18:00 - 21:00</div>
+        </div>
+        <a class="page-link" href="/training_sessions/search_public_wp?lang=fr&page=2#top">Suivant ›</a>
+        </body></html>
+    """,
+    f"{LISTING_URL}&page=2": """
+        <html><body>
+        <div class="card">
+            <a class="link-dark" href="/training_sessions/9a5f2c4e-7d6b-4c0a-ae3f-6d8a0c2e4f5b/show_public">
+                Atelier Fresque du Climat Junior</a>
+            <div>21/10/2099, 10:00 - 12:00</div>
+        </div>
+        <a class="page-link" href="/training_sessions/search_public_wp?lang=fr">‹ Précédent</a>
+        </body></html>
+    """,
+}
+
+# Event pages, in person and online
+EVENT_PAGE = """
+    <html><body>
+    <h3>Atelier Fresque du Climat</h3>
+    <div class="mb-3"><i class="fa fa-clock"></i> 19 octobre 2099, 14:00 - 17:00</div>
+    <div class="mb-3"><i class="fa fa-globe"></i> Français</div>
+    <div class="mb-3"><i class="fa fa-map-pin"></i> 12 rue de la Paix, 75002 Paris</div>
+    <div><strong>Description</strong> Un atelier de 3 heures.</div>
+    <div><a href="/training_sessions/5d1b8f0e/register"><i class="fa fa-user"></i> S'inscrire</a></div>
+    </body></html>
+"""
+
+ONLINE_EVENT_PAGE = """
+    <html><body>
+    <h3>Atelier Fresque du Climat en ligne</h3>
+    <div class="mb-3"><i class="fa fa-clock"></i> 20 octobre 2099, 18:00 - 21:00</div>
+    <div class="mb-3"><i class="fa fa-video"></i> En ligne</div>
+    <div><strong>Description</strong> Un atelier en visio.</div>
+    <div><span><i class="fa fa-user"></i> Complet</span></div>
+    </body></html>
+"""
+
+
+def get_soup(url):
+    if url not in PAGES:
+        raise FreskStaticParseError(url, "not captured")
+    return BeautifulSoup(PAGES[url], "html.parser"), url
+
+
+def run_tests():
+    # Pages are served from the captured payloads instead of the network
+    fetch = fdc.get_soup
+    fdc.get_soup = get_soup
+    try:
+        logging.info("Running static listing across pages")
+        cards = fdc.get_static_listing(PAGE)
+        links = [link for link, _ in cards]
+        expected = [
+            "https://association.climatefresk.org/training_sessions/5d1b8f0e-3c2a-4f6e-9b7d-2a4c6e8f0a1b/show_public",
+            "https://association.climatefresk.org/training_sessions/7e3d0a2c-5b4f-4a8e-8c1d-4b6e8a0c2d3f/show_public",
+            "https://association.climatefresk.org/training_sessions/9a5f2c4e-7d6b-4c0a-ae3f-6d8a0c2e4f5b/show_public",
+        ]
+        if links != expected:
+            logging.error(f"Static listing: expected {expected} but got {links}")
+        if "20/10/2099, 18:00 - 21:00" not in cards[1][1]:
+            logging.error(f"Static listing: unexpected card text {cards[1][1]}")
+
+        logging.info("Running static listing without iframe")
+        try:
+            fdc.get_static_listing({**PAGE, "url": LISTING_URL + "&page=2"})
+            logging.error("Static listing: expected an error without iframe")
+        except FreskStaticParseError:
+            logging.info("Result matches")
+    finally:
+        fdc.get_soup = fetch
+
+    link = expected[0]
+
+    # tuple fields:
+    # 1. Test case name or ID
+    # 2. Event page
+    # 3. Expected fields, or exception
+    test_cases = [
+        (
+            "In person event",
+            EVENT_PAGE,
+            {
+                "title": "Atelier Fresque du Climat",
+                "event_time": "19 octobre 2099, 14:00 - 17:00",
+                "language": "Français",
+                "online": False,
+                "full_location": "12 rue de la Paix, 75002 Paris",
+                "description": "Description Un atelier de 3 heures.",
+                "sold_out": "S'inscrire",
+                "tickets_link": "https://association.climatefresk.org/training_sessions/5d1b8f0e/register",
+            },
+        ),
+        (
+            "Online event",
+            ONLINE_EVENT_PAGE,
+            {
+                "title": "Atelier Fresque du Climat en ligne",
+                "event_time": "20 octobre 2099, 18:00 - 21:00",
+                "language": None,
+                "online": True,
+                "full_location": "",
+                "description": "Description Un atelier en visio.",
+                "sold_out": "Complet",
+                "tickets_link": None,
+            },
+        ),
+        ("Event details rendered by scripts", "<html><body></body></html>", FreskStaticParseError),
+        (
+            "In person event without location",
+            EVENT_PAGE.replace("fa-map-pin", "fa-map"),
+            FreskStaticParseError,
+        ),
+    ]
+    for test_case in test_cases:
+        logging.info(f"Running {test_case[0]}")
+        soup = BeautifulSoup(test_case[1], "html.parser")
+        try:
+            actual = fdc.get_static_fields(soup, link, link)
+        except Exception as error:
+            actual = type(error)
+        if actual == test_case[2]:
+            logging.info("Result matches")
+        else:
+            logging.error(f"{test_case[0]}: expected {test_case[2]} but got {actual}")
@@ -1,231 +1,235 @@
 import json
-import time
 import logging
 
-from selenium import webdriver
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from bs4 import BeautifulSoup
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 
 from db.records import get_record_dict
+from scraper.dom import extract, probe
+from scraper.embedded import find_dicts, parse_json
+from scraper.listing import get_listing
+from scraper.static import get_soup, get_text, is_static_enabled
+from scraper.store import get_fingerprint
+from scraper.wait import (
+    count_elements,
+    wait_for_clickable,
+    wait_for_element,
+    wait_for_stable_count,
+)
 from utils.date_and_time import get_dates
 from utils.errors import (
     FreskError,
     FreskDateBadFormat,
     FreskDateNotFound,
     FreskDateDifferentTimezone,
+    FreskStaticParseError,
 )
+from utils import metrics
 from utils.keywords import *
 from utils.language import detect_language_code
 from utils.location import get_address
 
+EVENT_URL = "https://www.lafresquedeleconomiecirculaire.com/event-details/{slug}"
 
-def scroll_to_bottom(driver):
-    while True:
-        logging.info("Scrolling to the bottom...")
-        try:
-            time.sleep(2)
-            next_button = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable(
-                    (
-                        By.CSS_SELECTOR,
-                        'button[data-hook="load-more-button"]',
-                    )
-                )
-            )
-            desired_y = (next_button.size["height"] / 2) + next_button.location["y"]
-            window_h = driver.execute_script("return window.innerHeight")
-            window_y = driver.execute_script("return window.pageYOffset")
-            current_y = (window_h / 2) + window_y
-            scroll_y_by = desired_y - current_y
-            driver.execute_script("window.scrollBy(0, arguments[0]);", scroll_y_by)
-            time.sleep(2)
-            next_button.click()
-        except TimeoutException:
-            break
-
+# Offsets handled by TuF, as for dates parsed from the pages
+SUPPORTED_UTC_OFFSETS = (timedelta(hours=1), timedelta(hours=2))
 
-def get_fec_data(sources, service, options):
-    logging.info("Scraping data from lafresquedeleconomiecirculaire.com")
+# Registration statuses of events which cannot be booked anymore
+CLOSED_REGISTRATION_STATUSES = ("CLOSED_AUTOMATICALLY", "SOLD_OUT")
 
-    driver = webdriver.Firefox(service=service, options=options)
+EVENT_CARDS = 'li[data-hook="events-card"]'
 
-    records = []
+# Fields of an event page
+EVENT_FIELDS = {
+    "title": {"css": "h1"},
+    "event_time": {"css": 'p[data-hook="event-full-date"]'},
+    "full_location": {"css": 'p[data-hook="event-full-location"]'},
+    "description": {
+        "css": ['div[data-hook="about-section-text"]', 'div[data-hook="about-section"]']
+    },
+    "sold_out": {"css": 'div[data-hook="event-sold-out"]', "exists": True},
+}
 
-    for page in sources:
-        logging.info("========================")
-        driver.get(page["url"])
-        driver.implicitly_wait(2)
+WARMUP_DATA_SCRIPT = """
+var element = document.getElementById("wix-warmup-data");
+return element ? element.textContent : null;
+"""
 
-        # Scroll to bottom to load all events
-        scroll_to_bottom(driver)
-        driver.execute_script("window.scrollTo(0, 0);")
 
-        ele = driver.find_elements(
-            By.CSS_SELECTOR, 'li[data-hook="events-card"] a[data-hook="title"]'
+def scroll_to_bottom(driver):
+    while True:
+        logging.info("Scrolling to the bottom...")
+        # The button is removed once all events are displayed
+        if probe(driver, button='button[data-hook="load-more-button"]')["button"] is None:
+            break
+        next_button = wait_for_clickable(
+            driver, By.CSS_SELECTOR, 'button[data-hook="load-more-button"]', timeout=3
         )
-        links = [e.get_attribute("href") for e in ele]
-
-        # Only events published on lafresquedeleconomiecirculaire.com can be extracted
-        links = [l for l in links if "lafresquedeleconomiecirculaire.com" in l]
-
-        for link in links:
-            logging.info(f"\n-> Processing {link} ...")
-            driver.get(link)
-            driver.implicitly_wait(3)
-            time.sleep(5)
-
-            ################################################################
-            # Parse event id
-            ################################################################
-            # Define the regex pattern for UUIDs
-            uuid = link.split("/event-details/")[-1]
-            if not uuid:
-                logging.info("Rejecting record: UUID not found")
-                continue
-
-            ################################################################
-            # Parse event title
-            ################################################################
-            title_el = driver.find_element(
-                by=By.TAG_NAME,
-                value="h1",
-            )
-            title = title_el.text
-
-            ################################################################
-            # Parse start and end dates
-            ################################################################
-            try:
-                date_info_el = driver.find_element(
-                    by=By.CSS_SELECTOR,
-                    value='p[data-hook="event-full-date"]',
-                )
-                event_time = date_info_el.text
-            except NoSuchElementException:
-                raise FreskDateNotFound
-
-            try:
-                event_start_datetime, event_end_datetime = get_dates(event_time)
-            except FreskDateBadFormat as error:
-                logging.info(f"Reject record: {error}")
-                continue
-
-            ################################################################
-            # Is it an online event?
-            ################################################################
-            online = False
-            try:
-                online_el = driver.find_element(
-                    By.CSS_SELECTOR, 'p[data-hook="event-full-location"]'
-                )
-                if is_online(online_el.text):
-                    online = True
-            except NoSuchElementException:
-                pass
-
-            ################################################################
-            # Location data
-            ################################################################
-            full_location = ""
-            location_name = ""
-            address = ""
-            city = ""
-            department = ""
-            longitude = ""
-            latitude = ""
-            zip_code = ""
-            country_code = ""
-
-            if not online:
-                location_el = driver.find_element(
-                    By.CSS_SELECTOR, 'p[data-hook="event-full-location"]'
-                )
-                full_location = location_el.text
-
-                try:
-                    address_dict = get_address(full_location)
-                    (
-                        location_name,
-                        address,
-                        city,
-                        department,
-                        zip_code,
-                        country_code,
-                        latitude,
-                        longitude,
-                    ) = address_dict.values()
-                except FreskError as error:
-                    logging.info(f"Rejecting record: {error}.")
-                    continue
-
-            ################################################################
-            # Description
-            ################################################################
-            driver.execute_script("window.scrollBy(0, document.body.scrollHeight);")
-
-            # Click on "show more" button
-            try:
-                show_more_el = driver.find_element(
-                    By.CSS_SELECTOR, 'button[data-hook="about-section-button"]'
-                )
-                show_more_el.click()
-            except NoSuchElementException:
-                pass
+        if next_button is None:
+            break
+        desired_y = (next_button.size["height"] / 2) + next_button.location["y"]
+        window_h = driver.execute_script("return window.innerHeight")
+        window_y = driver.execute_script("return window.pageYOffset")
+        current_y = (window_h / 2) + window_y
+        scroll_y_by = desired_y - current_y
+        driver.execute_script("window.scrollBy(0, arguments[0]);", scroll_y_by)
+        count = count_elements(driver, By.CSS_SELECTOR, EVENT_CARDS)
+        next_button.click()
+        wait_for_stable_count(driver, By.CSS_SELECTOR, EVENT_CARDS, minimum=count + 1)
+
+
+def is_wix_event(value):
+    return bool(value.get("slug")) and isinstance(value.get("scheduling"), dict)
+
+
+def get_warmup_events(text):
+    """
+    Returns the events found in the warmup data of a Wix page, de-duplicated by slug.
+    """
+    events = {}
+    for event in find_dicts(parse_json(text), is_wix_event):
+        events.setdefault(event["slug"], event)
+    return list(events.values())
+
+
+def get_event_dates(event):
+    """
+    Returns the local start and end times of a Wix event.
+    """
+    config = event["scheduling"].get("config") or event["scheduling"]
+    if config.get("scheduleTbd") or not config.get("startDate"):
+        raise FreskDateNotFound
+
+    try:
+        timezone = ZoneInfo(config.get("timeZoneId") or "Europe/Paris")
+        event_start_datetime = datetime.fromisoformat(config["startDate"]).astimezone(timezone)
+        event_end_datetime = datetime.fromisoformat(
+            config.get("endDate") or config["startDate"]
+        ).astimezone(timezone)
+    except (ValueError, ZoneInfoNotFoundError):
+        raise FreskDateBadFormat(str(config))
+
+    if event_start_datetime.utcoffset() not in SUPPORTED_UTC_OFFSETS:
+        raise FreskDateDifferentTimezone(str(config))
+
+    return event_start_datetime.replace(tzinfo=None), event_end_datetime.replace(tzinfo=None)
+
+
+def get_warmup_fields(event):
+    """
+    Returns the fields of a Wix event, or None if it is rejected.
+    """
+    try:
+        event_start_datetime, event_end_datetime = get_event_dates(event)
+    except FreskError as error:
+        logging.info(f"Reject record: {error}")
+        return None
+
+    # The warmup data may also list past events
+    if event_end_datetime < datetime.now():
+        logging.info("Rejecting record: event is over")
+        return None
+
+    location = event.get("location") or {}
+    address = location.get("address") or (location.get("fullAddress") or {}).get("formatted")
+    full_location = ", ".join(str(part) for part in [location.get("name"), address] if part)
+
+    # The long description is rich text, the short one plain text
+    description = None
+    if event.get("about"):
+        description = get_text(BeautifulSoup(event["about"], "html.parser"))
+    elif event.get("description"):
+        description = event["description"]
+
+    registration = event.get("registration") or {}
+    status = str(registration.get("status", ""))
+
+    return {
+        "title": event.get("title", ""),
+        "start": event_start_datetime,
+        "end": event_end_datetime,
+        "online": location.get("type") == "ONLINE" or is_online(full_location),
+        "full_location": full_location,
+        "description": description,
+        "sold_out": status in CLOSED_REGISTRATION_STATUSES,
+    }
+
+
+def get_selenium_fields(driver):
+    """
+    Returns the fields of the event page loaded by the driver, or None if the
+    event is rejected.
+    """
+    # Click on "show more" button, to get the whole description
+    driver.execute_script("window.scrollBy(0, document.body.scrollHeight);")
+    show_more_el = probe(driver, show_more='button[data-hook="about-section-button"]')["show_more"]
+    if show_more_el is not None:
+        show_more_el.click()
+
+    fields = extract(driver, EVENT_FIELDS, required=("title",))
+
+    ################################################################
+    # Parse start and end dates
+    ################################################################
+    if fields["event_time"] is None:
+        raise FreskDateNotFound
+
+    try:
+        event_start_datetime, event_end_datetime = get_dates(fields["event_time"])
+    except FreskDateBadFormat as error:
+        logging.info(f"Reject record: {error}")
+        return None
+
+    ################################################################
+    # Location, and is it an online event?
+    ################################################################
+    full_location = fields["full_location"]
+    online = full_location is not None and is_online(full_location)
+
+    return {
+        "title": fields["title"],
+        "start": event_start_datetime,
+        "end": event_end_datetime,
+        "online": online,
+        "full_location": full_location,
+        "description": fields["description"],
+        "sold_out": fields["sold_out"],
+    }
+
+
+def get_fec_record(page, link, uuid, fields):
+    """
+    Returns the record of an event from its fields, or None if the event is rejected.
+    """
+    title = fields["title"]
+    online = fields["online"]
+
+    ################################################################
+    # Location data
+    ################################################################
+    full_location = ""
+    location_name = ""
+    address = ""
+    city = ""
+    department = ""
+    longitude = ""
+    latitude = ""
+    zip_code = ""
+    country_code = ""
+
+    if not online:
+        if fields["full_location"] is None:
+            logging.info("Rejecting record: no location")
+            return None
+
+        full_location = fields["full_location"]
 
-            try:
-                description_el = driver.find_element(
-                    By.CSS_SELECTOR, 'div[data-hook="about-section-text"]'
-                )
-            except NoSuchElementException:
-                try:
-                    description_el = driver.find_element(
-                        By.CSS_SELECTOR, 'div[data-hook="about-section"]'
-                    )
-                except NoSuchElementException:
-                    logging.info(f"Rejecting record: no description")
-                    continue
-
-            description = description_el.text
-
-            ################################################################
-            # Training?
-            ################################################################
-            training = is_training(title)
-
-            ################################################################
-            # Is it full?
-            ################################################################
-            sold_out = True
-            try:
-                _ = driver.find_element(
-                    by=By.CSS_SELECTOR,
-                    value='div[data-hook="event-sold-out"]',
-                )
-            except NoSuchElementException:
-                sold_out = False
-
-            ################################################################
-            # Is it suited for kids?
-            ################################################################
-            kids = is_for_kids(title)
-
-            ################################################################
-            # Parse tickets link
-            ################################################################
-            tickets_link = link
-
-            ################################################################
-            # Building final object
-            ################################################################
-            record = get_record_dict(
-                f"{page['id']}-{uuid}",
-                page["id"],
-                title,
-                event_start_datetime,
-                event_end_datetime,
-                full_location,
+        try:
+            address_dict = get_address(full_location)
+            (
                 location_name,
                 address,
                 city,
@@ -234,22 +238,212 @@ def get_fec_data(sources, service, options):
                 country_code,
                 latitude,
                 longitude,
-                page.get(
-                    "language_code",
-                    detect_language_code(title, description),
-                ),
-                online,
-                training,
-                sold_out,
-                kids,
-                link,
-                tickets_link,
-                description,
-            )
-
-            records.append(record)
-            logging.info(f"Successfully scraped {link}\n{json.dumps(record, indent=4)}")
-
-    driver.quit()
+            ) = address_dict.values()
+        except FreskError as error:
+            logging.info(f"Rejecting record: {error}.")
+            return None
+
+    ################################################################
+    # Description
+    ################################################################
+    description = fields["description"]
+    if description is None:
+        logging.info(f"Rejecting record: no description")
+        return None
+
+    ################################################################
+    # Training?
+    ################################################################
+    training = is_training(title)
+
+    ################################################################
+    # Is it suited for kids?
+    ################################################################
+    kids = is_for_kids(title)
+
+    ################################################################
+    # Parse tickets link
+    ################################################################
+    tickets_link = link
+
+    ################################################################
+    # Building final object
+    ################################################################
+    return get_record_dict(
+        f"{page['id']}-{uuid}",
+        page["id"],
+        title,
+        fields["start"],
+        fields["end"],
+        full_location,
+        location_name,
+        address,
+        city,
+        department,
+        zip_code,
+        country_code,
+        latitude,
+        longitude,
+        page.get(
+            "language_code",
+            detect_language_code(title, description),
+        ),
+        online,
+        training,
+        fields["sold_out"],
+        kids,
+        link,
+        tickets_link,
+        description,
+    )
+
+
+def get_warmup_records(page, events, store, sink):
+    """
+    Returns the records of the events found in the warmup data of a page.
+    """
+    records = []
+
+    for event in events:
+        link = EVENT_URL.format(slug=event["slug"])
+        logging.info(f"\n-> Processing {link} ...")
+        metrics.set_event(link)
+
+        # Only events registered on lafresquedeleconomiecirculaire.com can be extracted
+        registration = event.get("registration") or {}
+        if registration.get("type") == "EXTERNAL" or registration.get("external"):
+            logging.info("Rejecting record: external registration")
+            continue
+
+        # The whole event is in the warmup data, which serves as fingerprint
+        fingerprint = get_fingerprint(json.dumps(event, sort_keys=True, default=str))
+        stored_records = store.get(page, link, fingerprint)
+        if stored_records is not None:
+            records += stored_records
+            sink.extend(stored_records)
+            continue
+
+        fields = get_warmup_fields(event)
+        if fields is None:
+            continue
+
+        record = get_fec_record(page, link, event["slug"], fields)
+        if record is None:
+            continue
+
+        records.append(record)
+        sink.append(record)
+        store.put(page, link, fingerprint, [record])
+        logging.info(f"Successfully scraped {link}\n{json.dumps(record, indent=4)}")
+
+    return records
+
+
+def get_listing_rejection(page, link, card):
+    """
+    Returns why an event is rejected from its listing card, before loading its
+    page, or None.
+    """
+    # Only events published on lafresquedeleconomiecirculaire.com can be extracted
+    if "lafresquedeleconomiecirculaire.com" not in link:
+        return "external registration"
+    return None
+
+
+def get_selenium_records(pool, driver, page, store, sink):
+    """
+    Scrapes the events of a page loaded with the webdriver, visiting each of them.
+    """
+    records = []
+
+    # Scroll to bottom to load all events
+    wait_for_stable_count(driver, By.CSS_SELECTOR, EVENT_CARDS)
+    scroll_to_bottom(driver)
+    driver.execute_script("window.scrollTo(0, 0);")
+
+    cards = get_listing(driver, f'{EVENT_CARDS} a[data-hook="title"]', EVENT_CARDS)
+
+    for link, card in cards:
+        logging.info(f"\n-> Processing {link} ...")
+        metrics.set_event(link)
+
+        reason = get_listing_rejection(page, link, card)
+        if reason:
+            store.skip(reason)
+            continue
+
+        # Reuse the record of events unchanged since the previous run
+        fingerprint = get_fingerprint(card)
+        stored_records = store.get(page, link, fingerprint)
+        if stored_records is not None:
+            records += stored_records
+            sink.extend(stored_records)
+            continue
+
+        ################################################################
+        # Parse event id
+        ################################################################
+        uuid = link.split("/event-details/")[-1]
+        if not uuid:
+            logging.info("Rejecting record: UUID not found")
+            continue
+
+        driver = pool.recycle(driver)
+        pool.load(driver, link)
+        wait_for_element(driver, By.CSS_SELECTOR, 'p[data-hook="event-full-date"]')
+
+        fields = get_selenium_fields(driver)
+        if fields is None:
+            continue
+
+        record = get_fec_record(page, link, uuid, fields)
+        if record is None:
+            continue
+
+        records.append(record)
+        sink.append(record)
+        store.put(page, link, fingerprint, [record])
+        logging.info(f"Successfully scraped {link}\n{json.dumps(record, indent=4)}")
+
+    return records, driver
+
+
+def get_fec_data(sources, pool, store, sink):
+    logging.info("Scraping data from lafresquedeleconomiecirculaire.com")
+
+    # The events are read from the warmup data of the listing, fetched without
+    # a browser when possible
+    driver = None
+
+    records = []
+
+    for page in sources:
+        logging.info("========================")
+
+        events = []
+        if is_static_enabled(page["url"]):
+            try:
+                soup, _ = get_soup(page["url"])
+                script = soup.select_one("script#wix-warmup-data")
+                events = get_warmup_events(script.string if script else None)
+            except FreskStaticParseError as error:
+                logging.info(f"{error} Falling back to the webdriver.")
+
+        if not events:
+            driver = pool.recycle(driver) if driver else pool.acquire()
+            pool.load(driver, page["url"])
+            events = get_warmup_events(driver.execute_script(WARMUP_DATA_SCRIPT))
+
+        if events:
+            logging.info(f"Found {len(events)} events in the warmup data")
+            records += get_warmup_records(page, events, store, sink)
+            continue
+
+        logging.info("Warmup data not found, visiting each event instead")
+        page_records, driver = get_selenium_records(pool, driver, page, store, sink)
+        records += page_records
+
+    if driver is not None:
+        pool.release(driver)
 
     return records
@@ -0,0 +1,152 @@
+import json
+import logging
+
+from datetime import datetime
+
+from scraper import fec
+from utils.errors import FreskDateDifferentTimezone, FreskDateNotFound
+
+# Events of the wix-warmup-data script of the agenda page, listed by two widgets
+EVENT = {
+    "id": "0b6c1e2a-4c1f-4a5e-9d0b-7c7f0c4b2f11",
+    "slug": "fresque-de-l-economie-circulaire-lyon-2099-03-03-14-00",
+    "title": "Fresque de l'Économie Circulaire - Lyon",
+    "description": "Atelier de 3 heures",
+    "about": "<p>Venez découvrir <strong>l'économie circulaire</strong>.</p>",
+    "scheduling": {
+        "config": {
+            "scheduleTbd": False,
+            "startDate": "2099-03-03T13:00:00.000Z",
+            "endDate": "2099-03-03T16:00:00.000Z",
+            "timeZoneId": "Europe/Paris",
+        },
+        "formatted": "3 mars 2099, 14:00 – 17:00 UTC+1",
+    },
+    "location": {"name": "La Cordée", "address": "3 Rue Alphonse Fochier, 69002 Lyon"},
+    "registration": {"type": "RSVP", "status": "SOLD_OUT"},
+}
+
+WARMUP_DATA = json.dumps(
+    {
+        "appsWarmupData": {
+            "140603ad-af8d-84a5-2c80-a0f60cb47351": {
+                "widgetcomp-list": {"events": {"events": [EVENT], "hasMore": False}},
+                "widgetcomp-calendar": {
+                    "calendar": {"events": [{**EVENT, "title": "Duplicate"}]},
+                    "settings": {"slug": "agenda"},
+                },
+            }
+        }
+    }
+)
+
+
+def get_scheduling(start, end, timezone="Europe/Paris", tbd=False):
+    return {
+        "scheduling": {
+            "config": {
+                "scheduleTbd": tbd,
+                "startDate": start,
+                "endDate": end,
+                "timeZoneId": timezone,
+            }
+        }
+    }
+
+
+def run_tests():
+    logging.info("Running warmup events")
+    events = fec.get_warmup_events(WARMUP_DATA)
+    if [event["title"] for event in events] != [EVENT["title"]]:
+        logging.error(f"Warmup events: expected a single event but got {events}")
+    if fec.get_warmup_events(None) != []:
+        logging.error("Warmup events: expected no events without warmup data")
+
+    # tuple fields:
+    # 1. Test case name or ID
+    # 2. Wix event
+    # 3. Expected start datetime, or exception
+    # 4. Expected end datetime
+    test_cases = [
+        (
+            "Winter time",
+            get_scheduling("2025-03-03T13:00:00.000Z", "2025-03-03T16:00:00.000Z"),
+            datetime(2025, 3, 3, 14, 0),
+            datetime(2025, 3, 3, 17, 0),
+        ),
+        (
+            "Summer time",
+            get_scheduling("2025-06-03T12:00:00.000Z", "2025-06-03T15:00:00.000Z"),
+            datetime(2025, 6, 3, 14, 0),
+            datetime(2025, 6, 3, 17, 0),
+        ),
+        (
+            "No end date",
+            get_scheduling("2025-06-03T12:00:00.000Z", None),
+            datetime(2025, 6, 3, 14, 0),
+            datetime(2025, 6, 3, 14, 0),
+        ),
+        (
+            "Schedule to be determined",
+            get_scheduling(None, None, tbd=True),
+            FreskDateNotFound,
+            None,
+        ),
+        (
+            "Other timezone",
+            get_scheduling(
+                "2025-06-03T12:00:00.000Z", "2025-06-03T15:00:00.000Z", "America/Montreal"
+            ),
+            FreskDateDifferentTimezone,
+            None,
+        ),
+    ]
+    for test_case in test_cases:
+        logging.info(f"Running {test_case[0]}")
+        try:
+            actual = fec.get_event_dates(test_case[1])
+        except Exception as error:
+            actual = type(error)
+        expected = test_case[2] if isinstance(test_case[2], type) else test_case[2:]
+        if actual == expected:
+            logging.info("Result matches")
+        else:
+            logging.error(f"{test_case[0]}: expected {expected} but got {actual}")
+
+    logging.info("Running warmup fields")
+    fields = fec.get_warmup_fields(EVENT)
+    expected = {
+        "title": EVENT["title"],
+        "start": datetime(2099, 3, 3, 14, 0),
+        "end": datetime(2099, 3, 3, 17, 0),
+        "online": False,
+        "full_location": "La Cordée, 3 Rue Alphonse Fochier, 69002 Lyon",
+        "description": "Venez découvrir l'économie circulaire.",
+        "sold_out": True,
+    }
+    if fields != expected:
+        logging.error(f"Warmup fields: expected {expected} but got {fields}")
+
+    # tuple fields:
+    # 1. Test case name or ID
+    # 2. Event link
+    # 3. Expected rejection reason
+    test_cases = [
+        (
+            "Event of the site",
+            "https://www.lafresquedeleconomiecirculaire.com/event-details/" + EVENT["slug"],
+            None,
+        ),
+        (
+            "External registration",
+            "https://www.billetweb.fr/fresque-de-l-economie-circulaire-lyon",
+            "external registration",
+        ),
+    ]
+    for test_case in test_cases:
+        logging.info(f"Running {test_case[0]}")
+        actual = fec.get_listing_rejection({}, test_case[1], EVENT["title"])
+        if actual == test_case[2]:
+            logging.info("Result matches")
+        else:
+            logging.error(f"{test_case[0]}: expected {test_case[2]} but got {actual}")
@@ -1,231 +1,500 @@
-import time
 import re
 import json
 import logging
 
-from selenium import webdriver
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from datetime import datetime, timedelta
+
+from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 
 from db.records import get_record_dict
-from utils.date_and_time import get_dates
+from scraper.dom import extract, probe, require
+from scraper.embedded import find_dicts, parse_json, to_local_datetime
+from scraper.wait import (
+    get_url,
+    wait_for_clickable,
+    wait_for_element,
+    wait_for_network_idle,
+    wait_for_ready,
+    wait_for_stable_count,
+    wait_for_staleness,
+    wait_for_url_change,
+)
+from utils.date_and_time import get_dates, DEFAULT_DURATION
 from utils.errors import FreskError
+from utils import metrics
 from utils.keywords import *
 from utils.language import detect_language_code
 from utils.location import get_address
 
+# Downloads the JSON resources fetched by the Glide runtime again, from the page
+CAPTURE_SCRIPT = """
+var callback = arguments[arguments.length - 1];
+var urls = performance.getEntriesByType("resource").filter(function (e) {
+    return e.initiatorType === "fetch" || e.initiatorType === "xmlhttprequest";
+}).map(function (e) {
+    return e.name;
+});
+Promise.all(urls.map(function (url) {
+    return fetch(url, {credentials: "include"}).then(function (response) {
+        return response.ok ? response.text() : null;
+    }).catch(function () {
+        return null;
+    });
+})).then(callback);
+"""
+
+# Names of the app table columns, compared case-insensitively to the whole row keys.
+# Can be overridden per source with a "columns" entry, e.g. {"title": ["Nom"]}.
+COLUMNS = {
+    "id": ("$rowid", "rowid"),
+    "title": ("titre", "title", "nom"),
+    "date": ("date",),
+    "end": ("fin", "end"),
+    "format": ("format",),
+    "address": ("adresse", "address"),
+    "description": ("description",),
+    "attendees": ("participants", "nombre de participants"),
+    "status": ("statut", "status"),
+}
+
+ITEM_XPATH = "//div[contains(@class, 'collection-item') and @role='button']"
+
+# Dates of the app data formatted by the app when displayed
+ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+ITEM_TEXTS_SCRIPT = """
+var items = document.evaluate(
+    arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+);
+var texts = [];
+for (var i = 0; i < items.snapshotLength; i++) {
+    texts.push(items.snapshotItem(i).innerText);
+}
+return texts;
+"""
+
+# Fields of an item page, whose values follow their label
+ITEM_FIELDS = {
+    "large_title": {"css": "h2.headlineMedium"},
+    "title": {"css": "h2.headlineSmall"},
+    "event_time": {"xpath": "//li/div[contains(text(), 'Date')]/../*[2]"},
+    "format": {"xpath": "//li/div[contains(text(), 'Format')]/../*[2]"},
+    "full_location": {"xpath": "//li/div[contains(text(), 'Adresse')]/../*[2]"},
+    "description": {"xpath": "//li/div[contains(text(), 'Description')]/../*[2]"},
+    "attendees": {"xpath": "//li/div[contains(text(), 'participant')]/../*[2]"},
+}
+
+
+def wait_for_tab(driver, page):
+    """
+    Returns the button of the tab of a page once displayed, or None. The app may
+    take a while to load its data.
+    """
+    return wait_for_element(
+        driver,
+        By.XPATH,
+        f"//div[contains(@class, 'button-text') and text()='{page['filter']}']",
+        timeout=30,
+    )
+
+
+def get_next_button(driver):
+    """
+    Returns the button to the next page of items once clickable, or None on the
+    last page.
+    """
+    next_button = probe(driver, next="//button[@aria-label='Next']")["next"]
+    if next_button is None:
+        return None
+    return wait_for_clickable(driver, next_button, timeout=3)
+
+
+def get_item_records(pool, driver, page, sink):
+    """
+    Scrapes the items of the tab of the page loaded by the driver, by clicking
+    each of them.
+    """
+    records = []
 
-def get_glide_data(sources, service, options):
-    logging.info("Scraping data from glide.page")
+    tab_button_element = wait_for_tab(driver, page)
+    if tab_button_element is None:
+        raise NoSuchElementException(f"Tab {page['filter']} not found")
+    tab_button_element.click()
+
+    # Maybe there are multiple pages, so we loop.
+    while True:
+        num_el = wait_for_stable_count(driver, By.XPATH, ITEM_XPATH)
+        logging.info(f"Found {num_el} elements")
+
+        for i in range(num_el):
+            wait_for_stable_count(driver, By.XPATH, ITEM_XPATH, minimum=num_el)
+            ele = driver.find_elements(By.XPATH, ITEM_XPATH)
+
+            # The following is ugly, but necessary as elements are loaded dynamically in JS.
+            # We have to make sure that all elements are loaded before proceeding.
+            max_tries = 10
+            count = 0
+            while len(ele) != num_el:
+                driver.refresh()
+                wait_for_stable_count(driver, By.XPATH, ITEM_XPATH, minimum=num_el)
+                ele = driver.find_elements(By.XPATH, ITEM_XPATH)
+
+                count += 1
+                if count == max_tries:
+                    raise RuntimeError(f"Cannot load the {num_el} JS elements after {count} tries.")
+
+            el = ele[i]
+            listing_url = get_url(driver)
+            el.click()
+
+            wait_for_url_change(driver, listing_url)
+            wait_for_ready(driver)
+            link = driver.current_url
+            logging.info(f"\n-> Processing {link} ...")
+            metrics.set_event(link)
+
+            # The item is rendered by scripts
+            wait_for_element(driver, By.CSS_SELECTOR, "h2.headlineSmall", timeout=3)
+            fields = extract(driver, ITEM_FIELDS)
+
+            ################################################################
+            # Is it canceled?
+            ################################################################
+            if fields["large_title"] is not None and is_canceled(fields["large_title"]):
+                logging.info("Rejecting record: canceled")
+                driver.back()
+                continue
+
+            ################################################################
+            # Parse event id
+            ################################################################
+            uuid = link.split("/")[-1]
+            if not uuid:
+                logging.info("Rejecting record: UUID not found")
+                driver.back()
+                continue
 
-    driver = webdriver.Firefox(service=service, options=options)
+            require(fields, "title", "event_time", "format", "description", "attendees")
 
-    records = []
+            ################################################################
+            # Parse event title
+            ################################################################
+            title = fields["title"]
 
-    for page in sources:
-        logging.info(f"==================\nProcessing page {page}")
-        driver.get(page["url"])
-        driver.implicitly_wait(10)
-        time.sleep(20)
+            ################################################################
+            # Parse start and end dates
+            ################################################################
+            event_time = fields["event_time"].lower()
 
-        tab_button_element = driver.find_element(
-            By.XPATH,
-            f"//div[contains(@class, 'button-text') and text()='{page['filter']}']",
-        )
-        tab_button_element.click()
-
-        # Maybe there are multiple pages, so we loop.
-        while True:
-            time.sleep(5)
-            ele = driver.find_elements(
-                By.XPATH,
-                "//div[contains(@class, 'collection-item') and @role='button']",
-            )
-            num_el = len(ele)
-            logging.info(f"Found {num_el} elements")
-
-            for i in range(num_el):
-                time.sleep(5)
-                ele = driver.find_elements(
-                    By.XPATH,
-                    "//div[contains(@class, 'collection-item') and @role='button']",
-                )
-
-                # The following is ugly, but necessary as elements are loaded dynamically in JS.
-                # We have to make sure that all elements are loaded before proceeding.
-                max_tries = 10
-                count = 0
-                while len(ele) != num_el:
-                    driver.refresh()
-                    time.sleep(5)
-                    ele = driver.find_elements(
-                        By.XPATH,
-                        "//div[contains(@class, 'collection-item') and @role='button']",
-                    )
-
-                    count += 1
-                    if count == max_tries:
-                        raise RuntimeError(
-                            f"Cannot load the {num_el} JS elements after {count} tries."
-                        )
-
-                el = ele[i]
-                el.click()
-
-                time.sleep(5)
-                link = driver.current_url
-                logging.info(f"\n-> Processing {link} ...")
-                driver.implicitly_wait(3)
-
-                ################################################################
-                # Is it canceled?
-                ################################################################
-                try:
-                    # Attempt to find the div element by its id
-                    large_title_el = driver.find_element(By.CSS_SELECTOR, "h2.headlineMedium")
-                    large_title = large_title_el.text
-                    if is_canceled(large_title):
-                        logging.info("Rejecting record: canceled")
-                        driver.back()
-                        continue
-                except NoSuchElementException:
-                    pass
-
-                ################################################################
-                # Parse event id
-                ################################################################
-                uuid = link.split("/")[-1]
-                if not uuid:
-                    logging.info("Rejecting record: UUID not found")
+            try:
+                event_start_datetime, event_end_datetime = get_dates(event_time)
+            except Exception as e:
+                logging.info(f"Rejecting record: {e}")
+                driver.back()
+                continue
+
+            ################################################################
+            # Is it an online event?
+            ################################################################
+            online = is_online(fields["format"])
+
+            ################################################################
+            # Location data
+            ################################################################
+            full_location = ""
+            location_name = ""
+            address = ""
+            city = ""
+            department = ""
+            longitude = ""
+            latitude = ""
+            zip_code = ""
+            country_code = ""
+
+            if not online:
+                if fields["full_location"] is None:
+                    logging.info("Rejecting record: empty address")
                     driver.back()
                     continue
 
-                ################################################################
-                # Parse event title
-                ################################################################
-                title_el = driver.find_element(by=By.CSS_SELECTOR, value="h2.headlineSmall")
-                title = title_el.text
-
-                ################################################################
-                # Parse start and end dates
-                ################################################################
-                time_el = driver.find_element(
-                    by=By.XPATH,
-                    value="//li/div[contains(text(), 'Date')]",
-                )
-                parent_el = time_el.find_element(by=By.XPATH, value="..")
-                event_time_el = parent_el.find_element(by=By.XPATH, value="./*[2]")
-                event_time = event_time_el.text.lower()
+                full_location = fields["full_location"]
 
                 try:
-                    event_start_datetime, event_end_datetime = get_dates(event_time)
-                except Exception as e:
-                    logging.info(f"Rejecting record: {e}")
+                    address_dict = get_address(full_location)
+                    (
+                        location_name,
+                        address,
+                        city,
+                        department,
+                        zip_code,
+                        country_code,
+                        latitude,
+                        longitude,
+                    ) = address_dict.values()
+                except FreskError as error:
+                    logging.info(f"Rejecting record: {error}.")
                     driver.back()
                     continue
 
-                ################################################################
-                # Is it an online event?
-                ################################################################
-                time_label_el = driver.find_element(
-                    by=By.XPATH,
-                    value="//li/div[contains(text(), 'Format')]",
-                )
-                parent_el = time_label_el.find_element(by=By.XPATH, value="..")
-                online_el = parent_el.find_element(by=By.XPATH, value="./*[2]")
-                online = is_online(online_el.text)
-
-                ################################################################
-                # Location data
-                ################################################################
-                full_location = ""
-                location_name = ""
-                address = ""
-                city = ""
-                department = ""
-                longitude = ""
-                latitude = ""
-                zip_code = ""
-                country_code = ""
-
-                if not online:
-                    try:
-                        address_label_el = driver.find_element(
-                            by=By.XPATH,
-                            value="//li/div[contains(text(), 'Adresse')]",
-                        )
-                        parent_el = address_label_el.find_element(by=By.XPATH, value="..")
-                        address_el = parent_el.find_element(by=By.XPATH, value="./*[2]")
-                    except Exception:
-                        logging.info("Rejecting record: empty address")
-                        driver.back()
-                        continue
-
-                    full_location = address_el.text
-
-                    try:
-                        address_dict = get_address(full_location)
-                        (
-                            location_name,
-                            address,
-                            city,
-                            department,
-                            zip_code,
-                            country_code,
-                            latitude,
-                            longitude,
-                        ) = address_dict.values()
-                    except FreskError as error:
-                        logging.info(f"Rejecting record: {error}.")
-                        driver.back()
-                        continue
-
-                ################################################################
-                # Description
-                ################################################################
-                description_label_el = driver.find_element(
-                    by=By.XPATH,
-                    value="//li/div[contains(text(), 'Description')]",
-                )
-                parent_el = description_label_el.find_element(by=By.XPATH, value="..")
-                description_el = parent_el.find_element(by=By.XPATH, value="./*[2]")
-                description = description_el.text
-
-                ################################################################
-                # Training?
-                ################################################################
-                training = is_training(title)
-
-                ################################################################
-                # Is it full?
-                ################################################################
-                attendees_label_el = driver.find_element(
-                    by=By.XPATH,
-                    value="//li/div[contains(text(), 'participant')]",
-                )
-                parent_el = attendees_label_el.find_element(by=By.XPATH, value="..")
-                attendees_el = parent_el.find_element(by=By.XPATH, value="./*[2]")
-                attendees = attendees_el.text
-
-                sold_out = attendees.split("/")[0] == attendees.split("/")[1]
-
-                ################################################################
-                # Is it suited for kids?
-                ################################################################
-                kids = False
-
-                ################################################################
-                # Building final object
-                ################################################################
-                record = get_record_dict(
-                    f"{page['id']}-{uuid}",
-                    page["id"],
-                    title,
-                    event_start_datetime,
-                    event_end_datetime,
-                    full_location,
+            ################################################################
+            # Description
+            ################################################################
+            description = fields["description"]
+
+            ################################################################
+            # Training?
+            ################################################################
+            training = is_training(title)
+
+            ################################################################
+            # Is it full?
+            ################################################################
+            attendees = fields["attendees"]
+
+            sold_out = attendees.split("/")[0] == attendees.split("/")[1]
+
+            ################################################################
+            # Is it suited for kids?
+            ################################################################
+            kids = False
+
+            ################################################################
+            # Building final object
+            ################################################################
+            record = get_record_dict(
+                f"{page['id']}-{uuid}",
+                page["id"],
+                title,
+                event_start_datetime,
+                event_end_datetime,
+                full_location,
+                location_name,
+                address,
+                city,
+                department,
+                zip_code,
+                country_code,
+                latitude,
+                longitude,
+                page.get(
+                    "language_code",
+                    detect_language_code(title, description),
+                ),
+                online,
+                training,
+                sold_out,
+                kids,
+                link,
+                link,
+                description,
+            )
+
+            records.append(record)
+            sink.append(record)
+            logging.info(f"Successfully scraped {link}\n{json.dumps(record, indent=4)}")
+
+            driver.back()
+
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        next_button = get_next_button(driver)
+        if next_button is None:
+            break
+        next_button.location_once_scrolled_into_view
+        first_item = driver.find_element(By.XPATH, ITEM_XPATH)
+        next_button.click()
+        # The items of the next page replace those of the current one
+        wait_for_staleness(driver, first_item)
+
+    return records
+
+
+def get_column(row, column, columns=None):
+    """
+    Returns the non-empty value of a row under one of the names of a column,
+    tried in order.
+    """
+    names = (columns or {}).get(column) or COLUMNS[column]
+    values = {key.lower(): value for key, value in row.items() if isinstance(key, str)}
+    for name in names:
+        value = values.get(name.lower())
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def get_listed_items(driver):
+    """
+    Returns the texts of the items listed by the displayed tab, across its pages,
+    and the url of the page of its last item, or None if it lists no item.
+    """
+    texts = []
+    while True:
+        wait_for_stable_count(driver, By.XPATH, ITEM_XPATH)
+        texts += driver.execute_script(ITEM_TEXTS_SCRIPT, ITEM_XPATH)
+
+        next_button = get_next_button(driver)
+        if next_button is None:
+            break
+        first_item = driver.find_element(By.XPATH, ITEM_XPATH)
+        next_button.click()
+        wait_for_staleness(driver, first_item)
+
+    items = driver.find_elements(By.XPATH, ITEM_XPATH)
+    if not items:
+        return texts, None
+    listing_url = get_url(driver)
+    items[-1].click()
+    if not wait_for_url_change(driver, listing_url):
+        return texts, None
+    return texts, driver.current_url
+
+
+def get_rows(driver, tab, columns=None):
+    """
+    Returns the rows of the app data whose value is the name of a tab, captured
+    from the JSON downloaded by the Glide runtime.
+    """
+    driver.set_script_timeout(30)
+    bodies = driver.execute_async_script(CAPTURE_SCRIPT) or []
+    return find_rows([parse_json(body) for body in bodies if body], tab, columns)
+
+
+def find_rows(data, tab, columns=None):
+    """
+    Returns the rows of the app data whose value is the name of a tab, by id.
+    """
+
+    def is_tab_row(value):
+        return get_column(value, "date", columns) is not None and any(
+            isinstance(v, str) and v.strip().lower() == tab.strip().lower() for v in value.values()
+        )
+
+    rows = {}
+    for row in find_dicts(data, is_tab_row):
+        uuid = get_column(row, "id", columns)
+        if uuid:
+            rows.setdefault(str(uuid), row)
+    return rows
+
+
+def is_listed(row, lines, columns=None):
+    """
+    Returns whether an item displays a row, from the lines of the item text: the
+    first one is the title of the row, and one of the following ones its date,
+    unless the row holds an ISO 8601 date the app formats.
+    """
+    title = str(get_column(row, "title", columns) or "").strip().lower()
+    if not lines or lines[0] != title:
+        return False
+    date = str(get_column(row, "date", columns) or "").strip().lower()
+    if not date or ISO_DATE.match(date):
+        return True
+    return any(line in date or date in line for line in lines[1:])
+
+
+def get_listed_rows(rows, texts, columns=None):
+    """
+    Returns the rows displayed by one of the listed items, as the tab may filter
+    out some of the rows of its value.
+    """
+    items = [[line.strip().lower() for line in text.splitlines() if line.strip()] for text in texts]
+    return {
+        uuid: row
+        for uuid, row in rows.items()
+        if any(is_listed(row, lines, columns) for lines in items)
+    }
+
+
+def get_row_dates(row, columns=None):
+    """
+    Returns the start and end of a row, whose date is either displayed text or
+    an ISO 8601 date.
+    """
+    date = get_column(row, "date", columns)
+    try:
+        return get_dates(str(date).lower())
+    except FreskError:
+        pass
+
+    event_start_datetime = to_local_datetime(str(date))
+    end = get_column(row, "end", columns)
+    if end is not None:
+        return event_start_datetime, to_local_datetime(str(end))
+    return event_start_datetime, event_start_datetime + timedelta(hours=DEFAULT_DURATION)
+
+
+def get_row_records(page, rows, item_url):
+    """
+    Returns the records of the rows of the app data. Item pages differ by their
+    last path segment, the id of their row: their links are built from the url
+    of one of them.
+    """
+    records = []
+    columns = page.get("columns")
+    item_url_prefix = item_url.rsplit("/", 1)[0]
+
+    for uuid, row in rows.items():
+        link = f"{item_url_prefix}/{uuid}"
+        logging.info(f"\n-> Processing row {uuid} ...")
+        metrics.set_event(uuid)
+
+        title = str(get_column(row, "title", columns) or "")
+        description = get_column(row, "description", columns)
+        if not title or description is None:
+            logging.info("Rejecting record: title or description not found")
+            continue
+        description = str(description)
+
+        ################################################################
+        # Is it canceled?
+        ################################################################
+        if is_canceled(str(get_column(row, "status", columns) or "")) or is_canceled(title):
+            logging.info("Rejecting record: canceled")
+            continue
+
+        ################################################################
+        # Parse start and end dates
+        ################################################################
+        try:
+            event_start_datetime, event_end_datetime = get_row_dates(row, columns)
+        except Exception as e:
+            logging.info(f"Rejecting record: {e}")
+            continue
+
+        # The app data may also hold past events
+        if event_start_datetime < datetime.now():
+            logging.info("Rejecting record: event is over")
+            continue
+
+        ################################################################
+        # Is it an online event?
+        ################################################################
+        online = is_online(str(get_column(row, "format", columns) or ""))
+
+        ################################################################
+        # Location data
+        ################################################################
+        full_location = ""
+        location_name = ""
+        address = ""
+        city = ""
+        department = ""
+        longitude = ""
+        latitude = ""
+        zip_code = ""
+        country_code = ""
+
+        if not online:
+            full_location = get_column(row, "address", columns)
+            if full_location is None:
+                logging.info("Rejecting record: empty address")
+                continue
+            full_location = str(full_location)
+
+            try:
+                address_dict = get_address(full_location)
+                (
                     location_name,
                     address,
                     city,
@@ -234,43 +503,103 @@ def get_glide_data(sources, service, options):
                     country_code,
                     latitude,
                     longitude,
-                    page.get(
-                        "language_code",
-                        detect_language_code(title, description),
-                    ),
-                    online,
-                    training,
-                    sold_out,
-                    kids,
-                    link,
-                    link,
-                    description,
-                )
-
-                records.append(record)
-                logging.info(f"Successfully scraped {link}\n{json.dumps(record, indent=4)}")
+                ) = address_dict.values()
+            except FreskError as error:
+                logging.info(f"Rejecting record: {error}.")
+                continue
+
+        ################################################################
+        # Training?
+        ################################################################
+        training = is_training(title)
+
+        ################################################################
+        # Is it full?
+        ################################################################
+        attendees = str(get_column(row, "attendees", columns) or "").split("/")
+        sold_out = len(attendees) == 2 and attendees[0].strip() == attendees[1].strip()
+
+        ################################################################
+        # Is it suited for kids?
+        ################################################################
+        kids = False
+
+        ################################################################
+        # Building final object
+        ################################################################
+        record = get_record_dict(
+            f"{page['id']}-{uuid}",
+            page["id"],
+            title,
+            event_start_datetime,
+            event_end_datetime,
+            full_location,
+            location_name,
+            address,
+            city,
+            department,
+            zip_code,
+            country_code,
+            latitude,
+            longitude,
+            page.get(
+                "language_code",
+                detect_language_code(title, description),
+            ),
+            online,
+            training,
+            sold_out,
+            kids,
+            link,
+            link,
+            description,
+        )
 
-                driver.back()
+        records.append(record)
+        logging.info(f"Successfully scraped row {uuid}\n{json.dumps(record, indent=4)}")
 
-            try:
-                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                driver.implicitly_wait(2)
-                time.sleep(2)
-                next_button = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable(
-                        (
-                            By.XPATH,
-                            "//button[@aria-label='Next']",
-                        )
-                    )
-                )
-                next_button.location_once_scrolled_into_view
-                time.sleep(2)
-                next_button.click()
-                time.sleep(2)
-            except TimeoutException:
-                break
-
-    driver.quit()
+    return records
+
+
+def get_glide_data(sources, pool, store, sink):
+    logging.info("Scraping data from glide.page")
+
+    driver = pool.acquire()
+
+    records = []
+
+    for page in sources:
+        logging.info(f"==================\nProcessing page {page}")
+        driver = pool.recycle(driver)
+        pool.load(driver, page["url"])
+
+        # The tabs are displayed once the app data is loaded
+        tab_button_element = wait_for_tab(driver, page)
+        if tab_button_element is None:
+            logging.warning(f"Rejecting page: tab {page['filter']} not found")
+            continue
+        wait_for_network_idle(driver)
+        rows = get_rows(driver, page["filter"], page.get("columns"))
+        if rows:
+            logging.info(f"Found {len(rows)} rows in the app data")
+            tab_button_element.click()
+            texts, item_url = get_listed_items(driver)
+            rows = get_listed_rows(rows, texts, page.get("columns"))
+            if item_url is not None and item_url.rsplit("/", 1)[-1] in rows:
+                logging.info(f"Keeping the {len(rows)} rows listed by the tab")
+                page_records = get_row_records(page, rows, item_url)
+                records += page_records
+                sink.extend(page_records)
+                continue
+
+            logging.info("Item links cannot be built from the app data")
+            pool.load(driver, page["url"])
+        else:
+            logging.info("App data not found")
+
+        logging.info("Clicking through the items instead")
+        records += get_item_records(pool, driver, page, sink)
+
+    pool.release(driver)
 
     return records
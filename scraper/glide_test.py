@@ -0,0 +1,143 @@
+import json
+import logging
+
+from datetime import datetime
+
+from scraper import glide
+from scraper.embedded import parse_json
+
+# Bodies of the table data downloaded by the Glide runtime of an app
+BODIES = [
+    json.dumps(
+        {
+            "data": {
+                "rows": [
+                    {
+                        "$rowID": "5aQx0ZzYRBWbPJ8mXkXh2g",
+                        "Nom": "Atelier 1er Degré",
+                        "Nombre de participants": "3/12",
+                        "Date": "mercredi 12 février 2099 de 19h00 à 22h00",
+                        "updatedAt": "2025-01-20T10:00:00.000Z",
+                        "Format": "Présentiel",
+                        "Adresse": "12 rue de la Paix, 75002 Paris",
+                        "Catégorie": "Ateliers",
+                    },
+                    {
+                        "$rowID": "Ykq3H3nNT7yWm2Q0PZb1vA",
+                        "Nom": "Atelier 1er Degré en ligne",
+                        "Nombre de participants": "12/12",
+                        "Date": "2099-03-05T18:00:00",
+                        "Fin": "2099-03-05T20:30:00",
+                        "Format": "En ligne",
+                        "Catégorie": "ateliers ",
+                    },
+                    {
+                        "$rowID": "J4U9d7hTQ4S6f4kqY2cV1w",
+                        "Nom": "Formation animateur",
+                        "Date": "2099-04-01T09:00:00",
+                        "Catégorie": "Formations",
+                    },
+                ]
+            }
+        }
+    ),
+    # Rows may be downloaded several times
+    json.dumps(
+        [
+            {
+                "$rowID": "5aQx0ZzYRBWbPJ8mXkXh2g",
+                "Nom": "Atelier 1er Degré",
+                "Date": "mercredi 12 février 2099 de 19h00 à 22h00",
+                "Catégorie": "Ateliers",
+            }
+        ]
+    ),
+]
+
+# Texts of the items rendered by the tab
+TEXTS = ["Atelier 1er Degré\nmercredi 12 février 2099\n3/12"]
+
+
+def run_tests():
+    data = [parse_json(body) for body in BODIES]
+
+    logging.info("Running rows of a tab")
+    rows = glide.find_rows(data, "Ateliers")
+    if list(rows) != ["5aQx0ZzYRBWbPJ8mXkXh2g", "Ykq3H3nNT7yWm2Q0PZb1vA"]:
+        logging.error(f"Rows: unexpected rows {list(rows)}")
+
+    # tuple fields:
+    # 1. Test case name or ID
+    # 2. Row
+    # 3. Column
+    # 4. Columns of the app, if any
+    # 5. Expected value
+    row = rows["5aQx0ZzYRBWbPJ8mXkXh2g"]
+    test_cases = [
+        ("Title next to a longer key", row, "title", None, "Atelier 1er Degré"),
+        ("Date next to updatedAt", row, "date", None, "mercredi 12 février 2099 de 19h00 à 22h00"),
+        ("Attendees", row, "attendees", None, "3/12"),
+        ("Missing column", row, "end", None, None),
+        ("App columns", row, "address", {"address": ["Lieu", "Adresse"]}, row["Adresse"]),
+        ("App columns only", row, "title", {"title": ["Titre"]}, None),
+    ]
+    for test_case in test_cases:
+        logging.info(f"Running {test_case[0]}")
+        actual = glide.get_column(test_case[1], test_case[2], test_case[3])
+        if actual == test_case[4]:
+            logging.info("Result matches")
+        else:
+            logging.error(f"{test_case[0]}: expected {test_case[4]} but got {actual}")
+
+    # tuple fields:
+    # 1. Test case name or ID
+    # 2. Texts of the items listed by the tab
+    # 3. Expected ids of the listed rows
+    test_cases = [
+        ("Listed title and date", TEXTS, ["5aQx0ZzYRBWbPJ8mXkXh2g"]),
+        (
+            "Title prefix of a listed title",
+            ["Atelier 1er Degré en ligne\n5 mars 2099\n12/12"],
+            ["Ykq3H3nNT7yWm2Q0PZb1vA"],
+        ),
+        ("Listed title on another date", ["Atelier 1er Degré\njeudi 13 février 2099\n0/12"], []),
+    ]
+    for test_case in test_cases:
+        logging.info(f"Running {test_case[0]}")
+        actual = list(glide.get_listed_rows(rows, test_case[1]))
+        if actual == test_case[2]:
+            logging.info("Result matches")
+        else:
+            logging.error(f"{test_case[0]}: expected {test_case[2]} but got {actual}")
+
+    # tuple fields:
+    # 1. Test case name or ID
+    # 2. Row id
+    # 3. Expected start datetime
+    # 4. Expected end datetime
+    test_cases = [
+        (
+            "Displayed date",
+            "5aQx0ZzYRBWbPJ8mXkXh2g",
+            datetime(2099, 2, 12, 19, 0),
+            datetime(2099, 2, 12, 22, 0),
+        ),
+        (
+            "ISO dates",
+            "Ykq3H3nNT7yWm2Q0PZb1vA",
+            datetime(2099, 3, 5, 18, 0),
+            datetime(2099, 3, 5, 20, 30),
+        ),
+    ]
+    for test_case in test_cases:
+        logging.info(f"Running {test_case[0]}")
+        actual = glide.get_row_dates(rows[test_case[1]])
+        if actual == test_case[2:]:
+            logging.info("Result matches")
+        else:
+            logging.error(f"{test_case[0]}: expected {test_case[2:]} but got {actual}")
+
+    logging.info("Running row without end date")
+    start, end = glide.get_row_dates({"Date": "2099-04-01T09:00:00"})
+    if end != datetime(2099, 4, 1, 9 + glide.DEFAULT_DURATION, 0):
+        logging.error(f"Row dates: unexpected default end {end}")
@@ -1,87 +1,387 @@
 import json
 import re
-import time
 import logging
 
-from selenium import webdriver
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from bs4 import BeautifulSoup
+from datetime import datetime
+from urllib.parse import urljoin
+
+from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 
 from db.records import get_record_dict
+from scraper.dom import extract, probe
+from scraper.embedded import (
+    find_dicts,
+    get_json_ld,
+    has_type,
+    is_sold_out_offer,
+    parse_json,
+    to_local_datetime,
+    unflatten,
+)
+from scraper.listing import get_listing
+from scraper.static import fetch_all, get_soup, get_text, is_static_enabled, select_text
+from scraper.store import get_fingerprint
+from scraper.wait import (
+    count_elements,
+    wait_for_clickable,
+    wait_for_element,
+    wait_for_network_idle,
+    wait_for_stable_count,
+)
 from utils.date_and_time import get_dates
-from utils.errors import FreskError, FreskDateNotFound, FreskDateBadFormat
+from utils.errors import FreskError, FreskDateNotFound, FreskDateBadFormat, FreskStaticParseError
+from utils import metrics
 from utils.keywords import *
 from utils.language import detect_language_code
 from utils.location import get_address
 
+# Fields of an event page
+EVENT_FIELDS = {
+    "title": {"css": "h1"},
+    "event_time": {"css": "span.CampaignHeader--Date"},
+    "full_location": {"css": "section.CardAddress--Location"},
+    "description": {"css": "div.CampaignHeader--Description"},
+}
+
 
 def scroll_to_bottom(driver):
     while True:
         logging.info("Scrolling to the bottom...")
+        # The button is removed once all events are displayed
+        if probe(driver, button='button[data-hook="load-more-button"]')["button"] is None:
+            break
+        next_button = wait_for_clickable(
+            driver, By.CSS_SELECTOR, 'button[data-hook="load-more-button"]', timeout=3
+        )
+        if next_button is None:
+            break
+        desired_y = (next_button.size["height"] / 2) + next_button.location["y"]
+        window_h = driver.execute_script("return window.innerHeight")
+        window_y = driver.execute_script("return window.pageYOffset")
+        current_y = (window_h / 2) + window_y
+        scroll_y_by = desired_y - current_y
+        driver.execute_script("window.scrollBy(0, arguments[0]);", scroll_y_by)
+        count = count_elements(driver, By.CSS_SELECTOR, "a.ActionLink-Event")
+        next_button.click()
+        wait_for_stable_count(driver, By.CSS_SELECTOR, "a.ActionLink-Event", minimum=count + 1)
+
+
+def is_event_form(value):
+    return str(value.get("formType", "")).lower() == "event" and bool(value.get("startDate"))
+
+
+def get_event_forms(soup):
+    """
+    Returns the event forms found in the Nuxt state embedded in a page.
+    """
+    script = soup.select_one("script#__NUXT_DATA__")
+    if script is None:
+        return []
+    return find_dicts(unflatten(parse_json(script.string)), is_event_form)
+
+
+def get_form_link(form, base_url):
+    if form.get("url"):
+        return urljoin(base_url, form["url"])
+    if form.get("formSlug"):
+        return f"{base_url.rstrip('/')}/evenements/{form['formSlug']}"
+    return None
+
+
+def get_static_listing(page):
+    """
+    Returns the (link, card text) pairs of the upcoming events of an organization,
+    read from the state embedded in its page.
+    """
+    soup, url = get_soup(page["url"])
+
+    now = datetime.now()
+    cards = {}
+    for form in get_event_forms(soup):
+        link = get_form_link(form, url)
+        if link is None:
+            continue
         try:
-            time.sleep(2)
-            next_button = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable(
-                    (
-                        By.CSS_SELECTOR,
-                        'button[data-hook="load-more-button"]',
-                    )
-                )
+            if to_local_datetime(form.get("endDate") or form["startDate"]) < now:
+                continue
+        except (TypeError, ValueError):
+            pass
+        place = form.get("place") or {}
+        cards.setdefault(
+            link,
+            "\n".join(
+                str(part)
+                for part in [
+                    form.get("title", ""),
+                    form.get("startDate", ""),
+                    form.get("endDate", ""),
+                    place.get("city", "") if isinstance(place, dict) else "",
+                ]
+            ),
+        )
+
+    if not cards:
+        # The state may be missing or laid out differently
+        raise FreskStaticParseError(page["url"], "no events found")
+    return list(cards.items())
+
+
+def get_static_fields(soup, link):
+    """
+    Returns the fields of an event page, read from its embedded Nuxt state or,
+    failing that, from its JSON-LD data.
+    """
+    uuid = link.split("/")[-1]
+    forms = get_event_forms(soup)
+    form = next((f for f in forms if f.get("formSlug") == uuid), None)
+    if forms and form is None:
+        # The state may hold other forms of the organization, never to be taken for this one
+        raise FreskStaticParseError(link, "event form not found")
+    if form is None:
+        events = [
+            item
+            for item in get_json_ld(
+                [s.string for s in soup.select('script[type="application/ld+json"]')]
             )
-            desired_y = (next_button.size["height"] / 2) + next_button.location["y"]
-            window_h = driver.execute_script("return window.innerHeight")
-            window_y = driver.execute_script("return window.pageYOffset")
-            current_y = (window_h / 2) + window_y
-            scroll_y_by = desired_y - current_y
-            driver.execute_script("window.scrollBy(0, arguments[0]);", scroll_y_by)
-            time.sleep(2)
-            next_button.click()
-        except TimeoutException:
-            break
-
+            if has_type(item, "Event") and item.get("startDate")
+        ]
+        if not events:
+            raise FreskStaticParseError(link, "no event data")
+        form = events[0]
+
+    try:
+        event_start_datetime = to_local_datetime(form["startDate"])
+        event_end_datetime = to_local_datetime(form.get("endDate") or form["startDate"])
+    except (TypeError, ValueError):
+        raise FreskStaticParseError(link, "bad event dates")
+
+    # Nuxt forms have a place, JSON-LD events a location with a postal address
+    place = form.get("place") or form.get("location") or {}
+    if isinstance(place, list):
+        place = place[0] if place else {}
+    address = place.get("address") or ""
+    if isinstance(address, dict):
+        city = [address.get("postalCode"), address.get("addressLocality")]
+        address = address.get("streetAddress")
+    else:
+        city = [place.get("zipCode"), place.get("city")]
+    city = " ".join(str(part) for part in city if part)
+    full_location = "\n".join(str(part) for part in [place.get("name"), address, city] if part)
+
+    description = select_text(soup, "div.CampaignHeader--Description")
+    if description is None and form.get("description"):
+        description = get_text(BeautifulSoup(form["description"], "html.parser"))
+
+    return {
+        "title": form.get("title") or form.get("name") or select_text(soup, "h1") or "",
+        "start": event_start_datetime,
+        "end": event_end_datetime,
+        "full_location": full_location or None,
+        "description": description,
+        "sold_out": bool(form.get("isSoldOut")) or is_sold_out_offer(form.get("offers")),
+    }
+
+
+def get_selenium_listing(pool, driver, page):
+    """
+    Returns the (link, card text) pairs of the events of an organization page
+    loaded with the webdriver.
+    """
+    pool.load(driver, page["url"])
+    wait_for_network_idle(driver)
+
+    # Scroll to bottom to load all events
+    desired_y = 2300
+    window_h = driver.execute_script("return window.innerHeight")
+    window_y = driver.execute_script("return window.pageYOffset")
+    current_y = (window_h / 2) + window_y
+    scroll_y_by = desired_y - current_y
+    driver.execute_script("window.scrollBy(0, arguments[0]);", scroll_y_by)
+    wait_for_network_idle(driver)
+
+    show_all_xpath = (
+        '//button[@data-ux="Explore_OrganizationPublicPage_Actions_ActionEvent_ShowAllActions"]'
+    )
+    button = None
+    if probe(driver, button=show_all_xpath)["button"] is not None:
+        button = wait_for_clickable(driver, By.XPATH, show_all_xpath, timeout=5)
+    if button is not None:
+        count = count_elements(driver, By.CSS_SELECTOR, "a.ActionLink-Event")
+        button.click()
+        wait_for_stable_count(driver, By.CSS_SELECTOR, "a.ActionLink-Event", minimum=count + 1)
+
+    return get_listing(driver, "a.ActionLink-Event", "a.ActionLink-Event")
+
+
+def get_selenium_fields(driver):
+    """
+    Returns the fields of the event page loaded by the driver, or None if the
+    event is rejected.
+    """
+    # The page is rendered by scripts
+    wait_for_element(driver, By.TAG_NAME, "h1")
+    fields = extract(driver, EVENT_FIELDS, required=("title",))
+
+    ################################################################
+    # Parse start and end dates
+    ################################################################
+    if fields["event_time"] is None:
+        logging.info("Reject record: date not found")
+        return None
+
+    try:
+        event_start_datetime, event_end_datetime = get_dates(fields["event_time"])
+    except Exception as e:
+        logging.info(f"Rejecting record: {e}")
+        return None
+
+    return {
+        "title": fields["title"],
+        "start": event_start_datetime,
+        "end": event_end_datetime,
+        "full_location": fields["full_location"],
+        "description": fields["description"],
+        "sold_out": False,
+    }
+
+
+def get_helloasso_record(page, link, uuid, fields):
+    """
+    Returns the record of an event from its fields, or None if the event is rejected.
+    """
+    title = fields["title"]
+
+    ################################################################
+    # Is it an online event?
+    ################################################################
+    online = is_online(title)
+
+    ################################################################
+    # Location data
+    ################################################################
+    full_location = ""
+    location_name = ""
+    address = ""
+    city = ""
+    department = ""
+    longitude = ""
+    latitude = ""
+    zip_code = ""
+    country_code = ""
+
+    if not online:
+        if fields["full_location"] is None:
+            logging.info("Rejecting record: no location")
+            return None
+
+        full_location = fields["full_location"]
 
-def get_helloasso_data(sources, service, options):
+        try:
+            address_dict = get_address(full_location)
+            (
+                location_name,
+                address,
+                city,
+                department,
+                zip_code,
+                country_code,
+                latitude,
+                longitude,
+            ) = address_dict.values()
+        except FreskError as error:
+            logging.info(f"Rejecting record: {error}.")
+            return None
+
+    ################################################################
+    # Description
+    ################################################################
+    description = fields["description"]
+    if description is None:
+        logging.info(f"Rejecting record: no description")
+        return None
+
+    ################################################################
+    # Training?
+    ################################################################
+    training = is_training(title)
+
+    ################################################################
+    # Is it suited for kids?
+    ################################################################
+    kids = is_for_kids(title)
+
+    ################################################################
+    # Building final object
+    ################################################################
+    return get_record_dict(
+        f"{page['id']}-{uuid}",
+        page["id"],
+        title,
+        fields["start"],
+        fields["end"],
+        full_location,
+        location_name,
+        address,
+        city,
+        department,
+        zip_code,
+        country_code,
+        latitude,
+        longitude,
+        page.get(
+            "language_code",
+            detect_language_code(title, description),
+        ),
+        online,
+        training,
+        fields["sold_out"],
+        kids,
+        link,
+        link,
+        description,
+    )
+
+
+def get_helloasso_data(sources, pool, store, sink):
     logging.info("Scraping data from helloasso.com")
 
-    driver = webdriver.Firefox(service=service, options=options)
+    # Pages are fetched without a browser when possible, the webdriver is
+    # only acquired for those which cannot be parsed statically
+    driver = None
 
     records = []
 
     for page in sources:
         logging.info(f"==================\nProcessing page {page}")
-        driver.get(page["url"])
-        driver.implicitly_wait(5)
-        time.sleep(3)
 
-        # Scroll to bottom to load all events
-        desired_y = 2300
-        window_h = driver.execute_script("return window.innerHeight")
-        window_y = driver.execute_script("return window.pageYOffset")
-        current_y = (window_h / 2) + window_y
-        scroll_y_by = desired_y - current_y
-        driver.execute_script("window.scrollBy(0, arguments[0]);", scroll_y_by)
-        time.sleep(5)
+        static = is_static_enabled(page["url"])
+        cards = None
+        if static:
+            try:
+                cards = get_static_listing(page)
+            except FreskStaticParseError as error:
+                logging.info(f"{error} Falling back to the webdriver.")
 
-        try:
-            button = driver.find_element(
-                By.XPATH,
-                '//button[@data-ux="Explore_OrganizationPublicPage_Actions_ActionEvent_ShowAllActions"]',
-            )
-            button.click()
-        except NoSuchElementException:
-            pass
+        if cards is None:
+            driver = pool.recycle(driver) if driver else pool.acquire()
+            cards = get_selenium_listing(pool, driver, page)
 
-        ele = driver.find_elements(By.CSS_SELECTOR, "a.ActionLink-Event")
-        links = [e.get_attribute("href") for e in ele]
-        num_el = len(ele)
-        logging.info(f"Found {num_el} elements")
+        logging.info(f"Found {len(cards)} elements")
 
-        for link in links:
+        pending = []
+        for link, card in cards:
             logging.info(f"\n-> Processing {link} ...")
-            driver.get(link)
-            driver.implicitly_wait(3)
+            metrics.set_event(link)
+
+            # Reuse the record of events unchanged since the previous run
+            fingerprint = get_fingerprint(card)
+            stored_records = store.get(page, link, fingerprint)
+            if stored_records is not None:
+                records += stored_records
+                sink.extend(stored_records)
+                continue
 
             ################################################################
             # Parse event id
@@ -91,146 +391,42 @@ def get_helloasso_data(sources, service, options):
                 logging.info("Rejecting record: UUID not found")
                 continue
 
-            ################################################################
-            # Parse event title
-            ################################################################
-            title_el = driver.find_element(
-                by=By.TAG_NAME,
-                value="h1",
-            )
-            title = title_el.text
-
-            ################################################################
-            # Parse start and end dates
-            ################################################################
-            try:
-                date_info_el = driver.find_element(
-                    by=By.CSS_SELECTOR,
-                    value="span.CampaignHeader--Date",
-                )
-                event_time = date_info_el.text
-            except NoSuchElementException as error:
-                logging.info(f"Reject record: {error}")
-                continue
-
-            try:
-                event_start_datetime, event_end_datetime = get_dates(event_time)
-            except Exception as e:
-                logging.info(f"Rejecting record: {e}")
-                continue
-
-            ################################################################
-            # Is it an online event?
-            ################################################################
-            online = is_online(title)
+            pending.append((link, uuid, fingerprint))
 
-            ################################################################
-            # Location data
-            ################################################################
-            full_location = ""
-            location_name = ""
-            address = ""
-            city = ""
-            department = ""
-            longitude = ""
-            latitude = ""
-            zip_code = ""
-            country_code = ""
-
-            if not online:
-                try:
-                    location_el = driver.find_element(
-                        By.CSS_SELECTOR, "section.CardAddress--Location"
-                    )
-                except NoSuchElementException:
-                    logging.info("Rejecting record: no location")
-                    continue
+        # Event pages are independent, fetch them all at once
+        event_pages = fetch_all([link for link, _, _ in pending]) if static else {}
 
-                full_location = location_el.text
+        for link, uuid, fingerprint in pending:
+            logging.info(f"\n-> Parsing {link} ...")
+            metrics.set_event(link)
 
+            fields = None
+            result = event_pages.get(link)
+            if isinstance(result, tuple):
                 try:
-                    address_dict = get_address(full_location)
-                    (
-                        location_name,
-                        address,
-                        city,
-                        department,
-                        zip_code,
-                        country_code,
-                        latitude,
-                        longitude,
-                    ) = address_dict.values()
-                except FreskError as error:
-                    logging.info(f"Rejecting record: {error}.")
+                    fields = get_static_fields(result[0], link)
+                except FreskStaticParseError as error:
+                    logging.info(f"{error} Falling back to the webdriver.")
+            elif result is not None:
+                logging.info(f"{result} Falling back to the webdriver.")
+
+            if fields is None:
+                driver = pool.recycle(driver) if driver else pool.acquire()
+                pool.load(driver, link)
+                fields = get_selenium_fields(driver)
+                if fields is None:
                     continue
 
-            ################################################################
-            # Description
-            ################################################################
-            try:
-                description_el = driver.find_element(
-                    By.CSS_SELECTOR, "div.CampaignHeader--Description"
-                )
-            except NoSuchElementException:
-                logging.info(f"Rejecting record: no description")
+            record = get_helloasso_record(page, link, uuid, fields)
+            if record is None:
                 continue
 
-            description = description_el.text
-
-            ################################################################
-            # Training?
-            ################################################################
-            training = is_training(title)
-
-            ################################################################
-            # Is it full?
-            ################################################################
-            sold_out = False
-
-            ################################################################
-            # Is it suited for kids?
-            ################################################################
-            kids = is_for_kids(title)
-
-            ################################################################
-            # Parse tickets link
-            ################################################################
-            tickets_link = link
-
-            ################################################################
-            # Building final object
-            ################################################################
-            record = get_record_dict(
-                f"{page['id']}-{uuid}",
-                page["id"],
-                title,
-                event_start_datetime,
-                event_end_datetime,
-                full_location,
-                location_name,
-                address,
-                city,
-                department,
-                zip_code,
-                country_code,
-                latitude,
-                longitude,
-                page.get(
-                    "language_code",
-                    detect_language_code(title, description),
-                ),
-                online,
-                training,
-                sold_out,
-                kids,
-                link,
-                link,
-                description,
-            )
-
             records.append(record)
+            sink.append(record)
+            store.put(page, link, fingerprint, [record])
             logging.info(f"Successfully scraped {link}\n{json.dumps(record, indent=4)}")
 
-    driver.quit()
+    if driver is not None:
+        pool.release(driver)
 
     return records
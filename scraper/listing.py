@@ -0,0 +1,23 @@
+def get_listing(driver, selector, card_selector=None, title_selector=None):
+    """
+    Returns the (link, card text) pairs of the event links matching `selector`,
+    in a single round-trip. The card is the closest ancestor matching
+    `card_selector`, or the parent of the link by default.
+
+    With `title_selector`, (link, card text, title) triples are returned instead,
+    the title being the text of the first element of the card matching it, or None.
+    """
+    script = """
+    var selector = arguments[0];
+    var cardSelector = arguments[1];
+    var titleSelector = arguments[2];
+    return Array.from(document.querySelectorAll(selector)).map(function (e) {
+        var card = (cardSelector && e.closest(cardSelector)) || e.parentElement || e;
+        var title = titleSelector && card.querySelector(titleSelector);
+        return [e.href, card.innerText, title ? title.innerText.trim() : null];
+    });
+    """
+    cards = driver.execute_script(script, selector, card_selector, title_selector)
+    if title_selector:
+        return [(link, text, title) for link, text, title in cards]
+    return [(link, text) for link, text, _ in cards]
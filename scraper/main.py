@@ -1,5 +1,10 @@
+import logging
+import multiprocessing
 import os
-import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.util import Finalize
 
 from scraper.fdc import get_fdc_data
 from scraper.fec import get_fec_data
@@ -7,8 +12,16 @@ from scraper.billetweb import get_billetweb_data
 from scraper.eventbrite import get_eventbrite_data
 from scraper.glide import get_glide_data
 from scraper.helloasso import get_helloasso_data
+from scraper.pool import DriverPool, DEFAULT_MAX_PAGES, DEFAULT_MAX_RSS_MB, DEFAULT_SIZE
+from scraper.profile import apply_lean_profile, get_consent_cookies
+from scraper.static import is_static_enabled
+from scraper.store import EventStore, DEFAULT_TTL_HOURS
 from selenium.webdriver.firefox.options import Options as FirefoxOptions
 from selenium.webdriver.firefox.service import Service
+from utils import metrics
+from utils.checkpoint import Checkpoint
+from utils.location import share_cache
+from utils.sink import RecordSink
 from utils.utils import get_config
 
 SCRAPER_FNS = {
@@ -22,6 +35,22 @@ SCRAPER_FNS = {
 }
 
 
+# Scraper functions loading their pages with the webdriver even when static
+# scraping is enabled
+BROWSER_FNS = {get_eventbrite_data, get_glide_data}
+
+# Default number of browsers sharing the sources of a single scraper function.
+# Can be overridden per domain with the "shards" entry of config.json, e.g.
+# {"shards": {"billetweb.fr": 3}}. Keep it low to stay polite with ticketing sites.
+DEFAULT_SHARDS = 1
+
+# Driver pool, event store, record sink and checkpoint of the current worker process
+worker_pool = None
+worker_store = None
+worker_sink = None
+worker_checkpoint = None
+
+
 def get_webdriver_executable():
     webdriver = get_config("webdriver")
 
@@ -31,15 +60,258 @@ def get_webdriver_executable():
     return webdriver
 
 
-def main(scrapers, headless=False):
-    records = []
-
+def get_webdriver_options(headless=False):
     service = Service(executable_path=get_webdriver_executable())
     options = FirefoxOptions()
     options.set_preference("intl.accept_languages", "en-us")
     if headless:
         options.add_argument("-headless")
+    apply_lean_profile(options)
+
+    return service, options
+
+
+def get_driver_pool(headless=False):
+    """
+    Returns a pool recycling its drivers according to the "driver_pool" entry of
+    config.json. Drivers are only launched for scrapers needing a browser, so
+    that scrapers fetching their pages without one never start it.
+    """
+    config = get_config("driver_pool") or {}
+    service, options = get_webdriver_options(headless)
+    return DriverPool(
+        service,
+        options,
+        size=config.get("size", DEFAULT_SIZE),
+        max_pages=config.get("max_pages", DEFAULT_MAX_PAGES),
+        max_rss_mb=config.get("max_rss_mb", DEFAULT_MAX_RSS_MB),
+        consent_cookies=get_consent_cookies(),
+    )
+
+
+def get_event_store(full_refresh=False):
+    config = get_config("event_store") or {}
+    return EventStore(
+        ttl_hours=config.get("ttl_hours", DEFAULT_TTL_HOURS), full_refresh=full_refresh
+    )
+
+
+def get_stats(pool, store):
+    return {**pool.stats, **store.stats}
+
+
+def log_stats(stats):
+    logging.info(
+        f"Webdriver pool: {stats['launches']} launches, {stats['recycles']} recycles, "
+        f"{stats['pages']} pages loaded, {stats['bytes'] / 1e6:.1f} MB transferred"
+    )
+    logging.info(
+        f"Event store: {stats['hits']} events reused, {stats['misses']} events scraped again, "
+        f"{stats['skips']} events rejected from the listing without loading their page"
+    )
+
+
+def get_shards(fn):
+    """
+    Returns the number of browsers allowed to scrape the sources of a scraper function,
+    as configured for the domains it handles.
+    """
+    shards = get_config("shards") or {}
+    domains = [sourcek for sourcek, fn_value in SCRAPER_FNS.items() if fn_value == fn]
+    return max([int(shards.get(domain, DEFAULT_SHARDS)) for domain in domains] + [1])
+
+
+def split_sources(sources, shards):
+    """
+    Splits sources into at most `shards` non-empty slices. Sources are dealt
+    round-robin so that each slice gets a similar share of the pages.
+    """
+    shards = max(1, min(shards, len(sources)))
+    return [sources[i::shards] for i in range(shards)]
+
+
+def get_log_files():
+    """
+    Returns the files the root logger writes to, so that worker processes
+    can log to the same files as the main process.
+    """
+    return [
+        (handler.baseFilename, handler.level)
+        for handler in logging.getLogger().handlers
+        if isinstance(handler, logging.FileHandler)
+    ]
+
+
+def init_worker(log_files, sink_path, headless=False, full_refresh=False, results_path=None):
+    configure_worker_logging(log_files)
+
+    # The pool and store live as long as the worker, and are reused by all its tasks
+    global worker_pool, worker_store, worker_sink, worker_checkpoint
+    worker_pool = get_driver_pool(headless)
+    Finalize(worker_pool, worker_pool.close, exitpriority=10)
+    worker_store = get_event_store(full_refresh)
+    Finalize(worker_store, worker_store.close, exitpriority=10)
+    worker_sink = RecordSink(sink_path)
+    Finalize(worker_sink, worker_sink.close, exitpriority=10)
+    if results_path:
+        worker_checkpoint = Checkpoint(results_path)
+        # Geocode through the cache of the run, sequentially with the other processes
+        share_cache(results_path)
+
 
+def configure_worker_logging(log_files):
+    logger = logging.getLogger()
+    if logger.handlers:
+        # Already configured, e.g. inherited from the main process
+        return
+
+    logger.setLevel(logging.INFO)
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    stream_handler = logging.StreamHandler()
+    stream_handler.setLevel(logging.INFO)
+    stream_handler.setFormatter(formatter)
+    logger.addHandler(stream_handler)
+    for path, level in log_files:
+        file_handler = logging.FileHandler(path)
+        file_handler.setLevel(level)
+        file_handler.setFormatter(formatter)
+        logger.addHandler(file_handler)
+
+
+def needs_browser(fn, sources):
+    return fn in BROWSER_FNS or not all(is_static_enabled(source["url"]) for source in sources)
+
+
+def scrape_sources(fn, sources, pool, store, sink, checkpoint=None, failed=None):
+    """
+    Runs a scraper function one source at a time, so that each completed source
+    can be checkpointed. Sources completed by an interrupted run are skipped.
+
+    With a `failed` list, a failing source is logged and its url appended to the
+    list instead of aborting the remaining ones. It is not checkpointed, so a
+    resumed run retries it.
+
+    Returns the number of records scraped.
+    """
+    sources = [source for source in sources if not (checkpoint and checkpoint.is_done(source))]
+
+    # Launch the configured number of browsers at once, before the scraper needs one
+    if sources and needs_browser(fn, sources):
+        try:
+            pool.prelaunch()
+        except Exception as e:
+            logging.warning(f"Unable to launch the webdrivers ahead of time: {e}")
+
+    count = 0
+    for source in sources:
+        metrics.set_source(source["url"])
+        try:
+            source_records = fn([source], pool, store, sink)
+        except Exception as e:
+            if failed is None:
+                raise
+            logging.exception(f"Scraper {fn.__name__} failed on {source['url']}: {e}")
+            failed.append(source["url"])
+            continue
+        if checkpoint:
+            sink.flush()
+            checkpoint.save(source, len(source_records))
+        count += len(source_records)
+    return count
+
+
+def run_scraper(fn, sources):
+    """
+    Runs a single scraper function on its sources, in a worker process.
+    Failures are logged and result in no records, so that other scrapers
+    running in parallel are not affected.
+
+    Returns the number of records and the urls of the failed sources, along with
+    the pool and store statistics and the timing samples of this run.
+    """
+    stats_before = get_stats(worker_pool, worker_store)
+    failed = []
+    count = scrape_sources(
+        fn, sources, worker_pool, worker_store, worker_sink, worker_checkpoint, failed
+    )
+    worker_sink.flush()
+    stats = get_stats(worker_pool, worker_store)
+    stats = {key: value - stats_before[key] for key, value in stats.items()}
+    return count, failed, stats, metrics.drain()
+
+
+def get_executor(jobs, initargs):
+    # Workers are spawned rather than forked: the API thread of the main process
+    # may hold the geocoding lock at fork time, which would never be released
+    return ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=initargs,
+    )
+
+
+def get_task_result(future, name):
+    """
+    Returns the result of a task, or None if it failed.
+    """
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        raise
+    except Exception as e:
+        logging.error(f"Worker for {name} failed: {e}")
+        return None
+
+
+def run_tasks(tasks, jobs, initargs):
+    """
+    Runs the (fn, name, sources) tasks in `jobs` worker processes, and yields the
+    name of each task along with its result, or None if it failed.
+
+    A worker dying (e.g. killed by the OOM killer) breaks the whole pool, and
+    fails every task left unfinished. These are then run again, each in a process
+    of its own, so that only the task that actually crashed is reported.
+    """
+    unfinished = []
+    with get_executor(jobs, initargs) as executor:
+        futures = {
+            executor.submit(run_scraper, fn, sources): (fn, name, sources)
+            for fn, name, sources in tasks
+        }
+        for future in as_completed(futures):
+            name = futures[future][1]
+            try:
+                yield name, get_task_result(future, name)
+            except BrokenProcessPool:
+                unfinished.append(futures[future])
+
+    if unfinished:
+        logging.warning(f"A worker crashed, running {len(unfinished)} unfinished tasks again")
+    for index in range(0, len(unfinished), jobs):
+        batch = unfinished[index : index + jobs]
+        executors = [get_executor(1, initargs) for _ in batch]
+        futures = {
+            executor.submit(run_scraper, fn, sources): name
+            for executor, (fn, name, sources) in zip(executors, batch)
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                yield name, get_task_result(future, name)
+            except BrokenProcessPool as e:
+                logging.error(f"Worker for {name} crashed: {e}")
+                yield name, None
+        for executor in executors:
+            executor.shutdown()
+
+
+def main(scrapers, sink, headless=False, jobs=1, full_refresh=False, results_path=None):
+    """
+    Scrapes all sources, appending their records to the sink.
+    Returns the number of records scraped, and the urls of the sources, or the
+    names of the worker tasks, that failed and were not checkpointed.
+    """
     sorted_workshops = {}
 
     # Make sure that we have a scraper available for each fresk entry
@@ -51,10 +323,59 @@ def main(scrapers, headless=False):
                     sorted_workshops[fn_value] = []
                 sorted_workshops[fn_value].append(workshop)
 
+    if jobs <= 1:
+        count = 0
+        pool = get_driver_pool(headless)
+        store = get_event_store(full_refresh)
+        checkpoint = Checkpoint(results_path) if results_path else None
+        try:
+            for fn_key, sourcev in sorted_workshops.items():
+                count += scrape_sources(fn_key, sourcev, pool, store, sink, checkpoint)
+        finally:
+            pool.close()
+            store.close()
+            sink.flush()
+        log_stats(get_stats(pool, store))
+        return count, []
+
+    # Each platform runs in its own worker process, with its own webdriver.
+    # Platforms configured with several shards have their sources split
+    # across as many workers.
+    tasks = []
     for fn_key, sourcev in sorted_workshops.items():
-        records += fn_key(sourcev, service=service, options=options)
+        slices = split_sources(sourcev, get_shards(fn_key))
+        for index, sources_slice in enumerate(slices):
+            tasks.append((fn_key, f"{fn_key.__name__} [{index + 1}/{len(slices)}]", sources_slice))
+
+    # Workers append to the same record stream as the main process
+    count = 0
+    failed = []
+    stats = {
+        "launches": 0,
+        "recycles": 0,
+        "pages": 0,
+        "bytes": 0,
+        "hits": 0,
+        "misses": 0,
+        "skips": 0,
+    }
+    initargs = (get_log_files(), sink.path, headless, full_refresh, results_path)
+    for name, result in run_tasks(tasks, jobs, initargs):
+        task_count = 0
+        if result is None:
+            failed.append(name)
+        else:
+            task_count, task_failed, task_stats, task_samples = result
+            failed += task_failed
+            for key, value in task_stats.items():
+                stats[key] += value
+            metrics.add(task_samples)
+        count += task_count
+        logging.info(f"{name} done with {task_count} records")
+
+    log_stats(stats)
 
-    return pd.DataFrame(records)
+    return count, failed
 
 
 if __name__ == "__main__":
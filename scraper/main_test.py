@@ -0,0 +1,70 @@
+import logging
+import tempfile
+
+from pathlib import Path
+
+from scraper.main import scrape_sources, split_sources
+from utils.checkpoint import Checkpoint
+from utils.sink import RecordSink
+
+
+def scrape_or_fail(sources, pool, store, sink):
+    """
+    Scrapes one record per source, failing on sources whose id is odd.
+    """
+    records = []
+    for source in sources:
+        if source["id"] % 2:
+            raise ValueError(f"unable to scrape {source['url']}")
+        records.append({"id": source["id"]})
+    sink.extend(records)
+    return records
+
+
+def run_tests():
+    sources = [{"id": i, "url": f"https://www.billetweb.fr/pro/{i}"} for i in range(5)]
+
+    # tuple fields:
+    # 1. Test case name or ID
+    # 2. Number of shards
+    # 3. Expected ids of the sources of each slice
+    test_cases = [
+        ("Single shard", 1, [[0, 1, 2, 3, 4]]),
+        ("Round-robin", 2, [[0, 2, 4], [1, 3]]),
+        ("More shards than sources", 8, [[0], [1], [2], [3], [4]]),
+        ("No shard", 0, [[0, 1, 2, 3, 4]]),
+    ]
+    for test_case in test_cases:
+        logging.info(f"Running {test_case[0]}")
+        slices = split_sources(sources, test_case[1])
+        actual = [[source["id"] for source in sources_slice] for sources_slice in slices]
+        if actual == test_case[2]:
+            logging.info("Result matches")
+        else:
+            logging.error(f"{test_case[0]}: expected {test_case[2]} but got {actual}")
+
+    logging.info("Running no sources")
+    if split_sources([], 3) != [[]]:
+        logging.error(f"No sources: unexpected slices {split_sources([], 3)}")
+
+    logging.info("Running failing sources")
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoint = Checkpoint(directory)
+        sink = RecordSink(Path(directory) / "events.jsonl")
+        failed = []
+        count = scrape_sources(scrape_or_fail, sources, None, None, sink, checkpoint, failed)
+        if count != 3:
+            logging.error(f"Failing sources: expected 3 records but got {count}")
+        if failed != [sources[1]["url"], sources[3]["url"]]:
+            logging.error(f"Failing sources: unexpected failed sources {failed}")
+        done = [source["id"] for source in sources if checkpoint.is_done(source)]
+        if done != [0, 2, 4]:
+            logging.error(f"Failing sources: expected sources 0, 2 and 4 done but got {done}")
+
+        logging.info("Running failing sources without a failed list")
+        try:
+            scrape_sources(scrape_or_fail, sources, None, None, sink, Checkpoint(directory))
+            logging.error("Failing sources: expected the failure to be raised")
+        except ValueError:
+            logging.info("Result matches")
+        sink.close()
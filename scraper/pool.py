@@ -0,0 +1,263 @@
+import logging
+import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from selenium import webdriver
+
+from utils import metrics
+
+# A driver is relaunched after having loaded this many pages...
+DEFAULT_MAX_PAGES = 200
+# ... or when Firefox and its content processes use more than this much memory.
+DEFAULT_MAX_RSS_MB = 1500
+
+# Number of drivers launched ahead of time by a process whose scrapers need a browser
+DEFAULT_SIZE = 1
+
+# Bytes transferred for the document of the current frame and its subresources.
+# Cross-origin resources not allowing timing report 0.
+TRANSFER_SIZE_SCRIPT = """
+return performance.getEntriesByType("navigation")
+    .concat(performance.getEntriesByType("resource"))
+    .reduce(function (total, entry) { return total + (entry.transferSize || 0); }, 0);
+"""
+
+
+def get_children(pid):
+    """
+    Returns the pids of the direct children of a process.
+    """
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children", "r") as file:
+                children += [int(child) for child in file.read().split()]
+    except (OSError, ValueError):
+        pass
+    return children
+
+
+def get_geckodriver_pid(pid):
+    """
+    Returns the pid of the geckodriver which launched a Firefox process, or None.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "r") as file:
+            # The process name may contain spaces, so split after it
+            ppid = int(file.read().rsplit(")", 1)[1].split()[1])
+        with open(f"/proc/{ppid}/comm", "r") as file:
+            return ppid if file.read().strip() == "geckodriver" else None
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def get_rss_mb(pid):
+    """
+    Returns the resident memory of a Firefox process, its content processes and
+    its geckodriver in MB, or 0 if it cannot be determined (e.g. /proc is not
+    available). Only the process tree of the driver is read.
+    """
+    pids = []
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        pending += get_children(current)
+    geckodriver_pid = get_geckodriver_pid(pid)
+    if geckodriver_pid is not None:
+        pids.append(geckodriver_pid)
+
+    rss_kb = 0
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/status", "r") as file:
+                for line in file:
+                    if line.startswith("VmRSS:"):
+                        rss_kb += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            continue
+
+    return rss_kb / 1024
+
+
+class DriverPool:
+    """
+    Pool of Firefox webdrivers shared by the scrapers of a process.
+
+    Up to `size` drivers are launched ahead of time with `prelaunch()`, and handed
+    out with `acquire()`, which launches one if none is idle. Scrapers
+    load pages through `load()` so that the pool can count them, and call
+    `recycle()` at points where the browser state can be safely thrown away, which
+    relaunches the driver when it has loaded too many pages or uses too much memory.
+
+    Before a driver loads its first page of a domain with `consent_cookies`, they
+    are set on a lightweight page of the domain, so that no consent overlay shows.
+    """
+
+    def __init__(
+        self,
+        service,
+        options,
+        size=DEFAULT_SIZE,
+        max_pages=DEFAULT_MAX_PAGES,
+        max_rss_mb=DEFAULT_MAX_RSS_MB,
+        consent_cookies=None,
+    ):
+        self.service = service
+        self.options = options
+        self.size = size
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.consent_cookies = consent_cookies or {}
+        self.stats = {"launches": 0, "recycles": 0, "pages": 0, "bytes": 0}
+        self.pages = {}
+        # Drivers whose current page has not been counted in the bytes stats yet
+        self.uncounted = set()
+        # (driver, domain) pairs whose consent cookies are set
+        self.consented = set()
+        self.drivers = {}
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def prelaunch(self):
+        """
+        Launches drivers until `size` of them are idle. Cold starts are slow, so
+        they are launched concurrently.
+        """
+        with self.lock:
+            missing = self.size - len(self.idle)
+        if missing <= 0:
+            return
+        with ThreadPoolExecutor(max_workers=missing) as executor:
+            drivers = list(executor.map(lambda _: self.launch(), range(missing)))
+        with self.lock:
+            self.idle += drivers
+
+    def launch(self):
+        driver = webdriver.Firefox(service=self.service, options=self.options)
+        # Scrapers only rely on bounded explicit waits, missing elements never block
+        driver.implicitly_wait(0)
+        with self.lock:
+            self.stats["launches"] += 1
+            self.pages[driver.session_id] = 0
+            self.drivers[driver.session_id] = driver
+        return driver
+
+    def count_bytes(self, driver):
+        """
+        Adds the bytes transferred for the page loaded by a driver to the stats.
+        Called before leaving the page, so that resources loaded after the page
+        was handed over to the scraper are counted too.
+        """
+        with self.lock:
+            if driver.session_id not in self.uncounted:
+                return
+            self.uncounted.discard(driver.session_id)
+        try:
+            driver.switch_to.default_content()
+            transferred = driver.execute_script(TRANSFER_SIZE_SCRIPT) or 0
+        except Exception as e:
+            logging.debug(f"Unable to measure the bytes transferred: {e}")
+            return
+        with self.lock:
+            self.stats["bytes"] += int(transferred)
+
+    def quit(self, driver):
+        with self.lock:
+            self.pages.pop(driver.session_id, None)
+            self.uncounted.discard(driver.session_id)
+            self.drivers.pop(driver.session_id, None)
+            self.consented = {pair for pair in self.consented if pair[0] != driver.session_id}
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.warning(f"Unable to quit webdriver: {e}")
+
+    def acquire(self):
+        with self.lock:
+            driver = self.idle.pop() if self.idle else None
+        if driver is None:
+            driver = self.launch()
+        return driver
+
+    def release(self, driver):
+        """
+        Gives a driver back to the pool, resetting the state scrapers usually change.
+        """
+        self.count_bytes(driver)
+        try:
+            driver.implicitly_wait(0)
+            driver.switch_to.default_content()
+        except Exception as e:
+            logging.warning(f"Discarding webdriver in a bad state: {e}")
+            self.quit(driver)
+            return
+        with self.lock:
+            self.idle.append(driver)
+
+    def set_consent_cookies(self, driver, url):
+        host = urlsplit(url).hostname or ""
+        for domain, cookies in self.consent_cookies.items():
+            if not (host == domain or host.endswith(f".{domain}")):
+                continue
+            with self.lock:
+                if (driver.session_id, domain) in self.consented:
+                    continue
+                self.consented.add((driver.session_id, domain))
+
+            # Cookies can only be set on a page of their domain
+            try:
+                with metrics.timer("consent_cookies"):
+                    driver.get(f"https://{host}/robots.txt")
+                    for name, value in cookies.items():
+                        driver.add_cookie(
+                            {"name": name, "value": value, "domain": f".{domain}", "path": "/"}
+                        )
+            except Exception as e:
+                logging.warning(f"Unable to set the consent cookies of {domain}: {e}")
+
+    def load(self, driver, url):
+        self.count_bytes(driver)
+        self.set_consent_cookies(driver, url)
+        with metrics.timer("page_load"):
+            driver.get(url)
+        with self.lock:
+            self.stats["pages"] += 1
+            self.uncounted.add(driver.session_id)
+            self.pages[driver.session_id] = self.pages.get(driver.session_id, 0) + 1
+
+    def recycle(self, driver):
+        """
+        Returns the given driver, or a fresh one if it has served too many pages
+        or grown too large.
+        """
+        pages = self.pages.get(driver.session_id, 0)
+        rss_mb = 0
+        if self.max_rss_mb:
+            rss_mb = get_rss_mb(driver.capabilities.get("moz:processID", -1))
+
+        too_many_pages = self.max_pages and pages >= self.max_pages
+        too_large = self.max_rss_mb and rss_mb >= self.max_rss_mb
+        if not too_many_pages and not too_large:
+            return driver
+
+        logging.info(f"Recycling webdriver after {pages} pages ({rss_mb:.0f} MB)")
+        self.count_bytes(driver)
+        self.quit(driver)
+        with self.lock:
+            self.stats["recycles"] += 1
+        return self.launch()
+
+    def close(self):
+        """
+        Quits all drivers, including those never released by a failing scraper.
+        """
+        with self.lock:
+            drivers = list(self.drivers.values())
+            self.idle = []
+        for driver in drivers:
+            self.quit(driver)
@@ -0,0 +1,131 @@
+import base64
+import json
+
+from urllib.parse import quote
+
+from utils.utils import get_config
+
+# Hosts of analytics, ads and video embeds never read by the scrapers. Can be
+# extended with the "blocked_hosts" list of the "lean_profile" entry of config.json.
+BLOCKED_HOSTS = [
+    "doubleclick.net",
+    "facebook.net",
+    "google-analytics.com",
+    "googleadservices.com",
+    "googlesyndication.com",
+    "googletagmanager.com",
+    "hotjar.com",
+    "hotjar.io",
+    "clarity.ms",
+    "segment.io",
+    "mixpanel.com",
+    "sentry.io",
+    "intercom.io",
+    "youtube.com",
+    "vimeo.com",
+]
+
+# Hosts of consent managers, blocked so that their overlays never render
+CONSENT_HOSTS = [
+    "transcend-cdn.com",
+    "transcend.io",
+    "cookielaw.org",
+    "onetrust.com",
+    "cookiebot.com",
+    "didomi.io",
+    "axept.io",
+    "usercentrics.eu",
+    "trustarc.com",
+    "quantcast.com",
+]
+
+# Cookies recording that only essential cookies were accepted, set once per
+# driver on each domain. Can be overridden per domain with the "consent_cookies"
+# entry of config.json, e.g. {"consent_cookies": {"example.com": {"consent": "no"}}}.
+CONSENT_COOKIES = {
+    # Wix sites
+    "lafresquedeleconomiecirculaire.com": {
+        "consent-policy": quote('{"ess":1,"func":0,"anl":0,"adv":0,"dt3":1}'),
+    },
+}
+
+# Unreachable proxy the blocked hosts are sent to, so that they fail immediately
+BLACKHOLE_PROXY = "PROXY 127.0.0.1:9"
+
+PAC_SCRIPT = """
+function FindProxyForURL(url, host) {
+    var hosts = %s;
+    for (var i = 0; i < hosts.length; i++) {
+        if (host === hosts[i] || dnsDomainIs(host, "." + hosts[i])) {
+            return "%s";
+        }
+    }
+    return "DIRECT";
+}
+"""
+
+LEAN_PREFERENCES = {
+    # Images, fonts and media
+    "permissions.default.image": 2,
+    "gfx.downloadable_fonts.enabled": False,
+    "media.autoplay.default": 5,
+    "media.preload.default": 0,
+    "media.preload.auto": 0,
+    # Trackers
+    "privacy.trackingprotection.enabled": True,
+    "privacy.trackingprotection.socialtracking.enabled": True,
+    # Prefetch and speculative connections
+    "network.prefetch-next": False,
+    "network.dns.disablePrefetch": True,
+    "network.predictor.enabled": False,
+    "network.http.speculative-parallel-limit": 0,
+    # Service workers
+    "dom.serviceWorkers.enabled": False,
+    # Session history, kept large enough to go back to a listing
+    "browser.sessionhistory.max_total_viewers": 0,
+    "browser.sessionhistory.max_entries": 5,
+    "browser.sessionstore.max_tabs_undo": 0,
+    "browser.sessionstore.resume_from_crash": False,
+}
+
+
+def get_pac_url(hosts):
+    """
+    Returns a data url of a proxy auto-config script sending the hosts, and
+    their subdomains, to an unreachable proxy.
+    """
+    script = PAC_SCRIPT % (json.dumps(sorted(set(hosts))), BLACKHOLE_PROXY)
+    encoded = base64.b64encode(script.encode("utf-8")).decode("ascii")
+    return f"data:application/x-ns-proxy-autoconfig;base64,{encoded}"
+
+
+def apply_lean_profile(options):
+    """
+    Configures Firefox to only download what the scrapers read, according to the
+    "lean_profile" entry of config.json (enabled by default): no images, fonts,
+    media or trackers, and pages handed over once their DOM is ready.
+    """
+    config = get_config("lean_profile") or {}
+    if not config.get("enabled", True):
+        return options
+
+    for name, value in LEAN_PREFERENCES.items():
+        options.set_preference(name, value)
+
+    options.set_preference("network.proxy.type", 2)
+    options.set_preference(
+        "network.proxy.autoconfig_url",
+        get_pac_url(BLOCKED_HOSTS + CONSENT_HOSTS + config.get("blocked_hosts", [])),
+    )
+
+    # Scrapers wait for the elements they need, not for every subresource
+    options.page_load_strategy = "eager"
+
+    return options
+
+
+def get_consent_cookies():
+    """
+    Returns the consent cookies to set by domain.
+    """
+    return {**CONSENT_COOKIES, **(get_config("consent_cookies") or {})}
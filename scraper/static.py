@@ -0,0 +1,162 @@
+import contextvars
+import re
+
+from bs4 import BeautifulSoup, Comment, NavigableString
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+from utils import metrics
+from utils.errors import FreskStaticParseError
+from utils.http import get_session
+from utils.utils import get_config
+
+TIMEOUT = 30
+
+# Maximum number of pages of a source fetched concurrently
+MAX_WORKERS = 4
+
+# Elements rendered on their own lines by a browser
+BLOCK_TAGS = {
+    "address",
+    "article",
+    "aside",
+    "blockquote",
+    "dd",
+    "div",
+    "dl",
+    "dt",
+    "figcaption",
+    "figure",
+    "footer",
+    "form",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "header",
+    "hr",
+    "li",
+    "main",
+    "nav",
+    "ol",
+    "p",
+    "pre",
+    "section",
+    "table",
+    "tr",
+    "ul",
+}
+HIDDEN_TAGS = {"script", "style", "noscript", "template"}
+
+
+def is_static_enabled(url):
+    """
+    Returns whether the pages of a source should be fetched without a browser first.
+    Enabled by default, it can be disabled per domain with the "static_scraping"
+    entry of config.json, e.g. {"static_scraping": {"billetweb.fr": false}}.
+    """
+    config = get_config("static_scraping") or {}
+    return all(enabled for domain, enabled in config.items() if domain in url)
+
+
+@metrics.timed("http_get")
+def get_soup(url):
+    """
+    Fetches a server-rendered page and returns it parsed, along with its final url
+    for resolving relative links.
+    """
+    try:
+        response = get_session(url).get(url, timeout=TIMEOUT)
+        response.raise_for_status()
+    except Exception as e:
+        raise FreskStaticParseError(url, str(e))
+    return BeautifulSoup(response.text, "html.parser"), response.url
+
+
+@metrics.timed("http_get")
+def get_json(url, params=None):
+    """
+    Fetches a JSON resource and returns its decoded content.
+    """
+    try:
+        response = get_session(url).get(url, params=params, timeout=TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        raise FreskStaticParseError(url, str(e))
+
+
+def fetch_all(urls, max_workers=MAX_WORKERS):
+    """
+    Fetches pages concurrently. Returns the result of `get_soup` by url, or the
+    error raised when the page could not be fetched.
+    """
+
+    def fetch(url):
+        metrics.set_event(url)
+        try:
+            return get_soup(url)
+        except FreskStaticParseError as error:
+            return error
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Each fetch runs in a copy of the current context, so that its timing
+        # is attributed to the current source and to its own event
+        futures = [executor.submit(contextvars.copy_context().run, fetch, url) for url in urls]
+        return {url: future.result() for url, future in zip(urls, futures)}
+
+
+def get_attribute(soup, selector, attribute, base_url):
+    """
+    Returns an attribute of the first element matching the selector, resolved
+    against base_url, or None if there is no such element.
+    """
+    element = soup.select_one(selector)
+    if element is None or not element.get(attribute):
+        return None
+    return urljoin(base_url, element[attribute])
+
+
+def get_text(element):
+    """
+    Approximates the `innerText` of an element as Selenium returns it: one line
+    per block, with collapsed whitespaces.
+    """
+    parts = []
+    collect_text(element, parts)
+    lines = (" ".join(line.split()) for line in "".join(parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def collect_text(element, parts):
+    for child in element.children:
+        if isinstance(child, Comment):
+            continue
+        if isinstance(child, NavigableString):
+            parts.append(re.sub(r"\s+", " ", str(child)))
+            continue
+        if child.name in HIDDEN_TAGS:
+            continue
+        if child.name == "br":
+            parts.append("\n")
+            continue
+        block = child.name in BLOCK_TAGS
+        if block:
+            parts.append("\n")
+        collect_text(child, parts)
+        if block:
+            parts.append("\n")
+
+
+def select_text(soup, *selectors):
+    """
+    Returns the text of the first element matching one of the selectors, tried in order,
+    or None if none matches.
+    """
+    for selector in selectors:
+        element = soup.select_one(selector)
+        if element is not None:
+            return get_text(element)
+    return None
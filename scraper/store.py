@@ -0,0 +1,101 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+
+from pathlib import Path
+
+from db.records import get_scrape_date
+
+STORE_PATH = Path("cache/events.sqlite")
+
+# Records of an event are reused for at most this long
+DEFAULT_TTL_HOURS = 24
+
+
+def get_fingerprint(*parts):
+    """
+    Returns a digest of what the listing shows about an event (title, date,
+    sold-out badge...), ignoring whitespace differences.
+    """
+    text = "\n".join(" ".join(str(part).split()) for part in parts)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EventStore:
+    """
+    Persistent store of the records scraped from each event link, keyed by source
+    id and link. Records are reused while the listing fingerprint of the event is
+    unchanged and the TTL has not expired, so the detail page is not loaded again.
+    """
+
+    def __init__(self, path=STORE_PATH, ttl_hours=DEFAULT_TTL_HOURS, full_refresh=False):
+        self.ttl = ttl_hours * 3600
+        self.full_refresh = full_refresh
+        self.stats = {"hits": 0, "misses": 0, "skips": 0}
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Several worker processes may write to the store at the same time
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS events (
+                source_id TEXT,
+                link TEXT,
+                fingerprint TEXT,
+                records TEXT,
+                scraped_at REAL,
+                PRIMARY KEY (source_id, link)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get(self, page, link, fingerprint):
+        """
+        Returns the stored records of the event with an updated scrape date,
+        or None if the event has to be scraped again.
+        """
+        if self.full_refresh:
+            return None
+
+        row = self.conn.execute(
+            "SELECT fingerprint, records, scraped_at FROM events WHERE source_id = ? AND link = ?",
+            (str(page["id"]), link),
+        ).fetchone()
+        if not row or row[0] != fingerprint or time.time() - row[2] > self.ttl:
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["hits"] += 1
+        records = json.loads(row[1])
+        scrape_date = get_scrape_date()
+        for record in records:
+            record["scrape_date"] = scrape_date
+        logging.info(f"Reusing {len(records)} stored records for unchanged event {link}")
+        return records
+
+    def skip(self, reason):
+        """
+        Counts an event rejected from its listing card, whose page is not loaded.
+        """
+        self.stats["skips"] += 1
+        logging.info(f"Rejecting record from the listing: {reason}")
+
+    def put(self, page, link, fingerprint, records):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?)",
+            (
+                str(page["id"]),
+                link,
+                fingerprint,
+                json.dumps(records, ensure_ascii=False, default=str),
+                time.time(),
+            ),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
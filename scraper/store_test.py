@@ -0,0 +1,71 @@
+import logging
+import tempfile
+import time
+
+from pathlib import Path
+
+from scraper.store import EventStore, get_fingerprint
+
+PAGE = {"id": 200, "url": "https://www.billetweb.fr/pro/fdnr"}
+OTHER_PAGE = {"id": 201, "url": "https://www.billetweb.fr/pro/atelier"}
+LINK = "https://www.billetweb.fr/atelier-paris&multi=21569"
+RECORDS = [{"id": "200-atelier-paris", "scrape_date": "2025-01-20T10:00:00+01:00"}]
+
+
+def run_tests():
+    fingerprint = get_fingerprint("Atelier Paris", "Thu Oct 19, 2099 from 01:00 PM")
+
+    logging.info("Running fingerprint whitespace")
+    if get_fingerprint(" Atelier  Paris", "Thu Oct 19, 2099\nfrom 01:00 PM ") != fingerprint:
+        logging.error("get_fingerprint: whitespace differences should be ignored")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "events.sqlite"
+        store = EventStore(path, ttl_hours=1)
+        store.put(PAGE, LINK, fingerprint, RECORDS)
+
+        # tuple fields:
+        # 1. Test case name or ID
+        # 2. Page
+        # 3. Listing fingerprint
+        # 4. Whether the stored records are reused
+        test_cases = [
+            ("Unchanged event", PAGE, fingerprint, True),
+            (
+                "Sold out since",
+                PAGE,
+                get_fingerprint("Atelier Paris", "Thu Oct 19, 2099 from 01:00 PM", "Complet"),
+                False,
+            ),
+            ("Same link of another source", OTHER_PAGE, fingerprint, False),
+        ]
+        for test_case in test_cases:
+            logging.info(f"Running {test_case[0]}")
+            actual = store.get(test_case[1], LINK, test_case[2])
+            if (actual is not None) == test_case[3]:
+                logging.info("Result matches")
+            else:
+                logging.error(f"{test_case[0]}: expected reuse {test_case[3]} but got {actual}")
+
+        logging.info("Running scrape date of reused records")
+        records = store.get(PAGE, LINK, fingerprint)
+        if records[0]["scrape_date"] == RECORDS[0]["scrape_date"]:
+            logging.error("EventStore: reused records should have an updated scrape date")
+        if store.stats != {"hits": 2, "misses": 2, "skips": 0}:
+            logging.error(f"EventStore: unexpected stats {store.stats}")
+
+        logging.info("Running full refresh")
+        refresh_store = EventStore(path, ttl_hours=1, full_refresh=True)
+        if refresh_store.get(PAGE, LINK, fingerprint) is not None:
+            logging.error("EventStore: a full refresh should not reuse records")
+        refresh_store.put(PAGE, LINK, fingerprint, [{**RECORDS[0], "id": "refreshed"}])
+        refresh_store.close()
+        if store.get(PAGE, LINK, fingerprint)[0]["id"] != "refreshed":
+            logging.error("EventStore: records of a full refresh should be stored")
+
+        logging.info("Running expired records")
+        store.conn.execute("UPDATE events SET scraped_at = ?", (time.time() - 2 * 3600,))
+        store.conn.commit()
+        if store.get(PAGE, LINK, fingerprint) is not None:
+            logging.error("EventStore: records older than the TTL should not be reused")
+        store.close()
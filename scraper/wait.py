@@ -0,0 +1,167 @@
+import time
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from utils import metrics
+
+# Upper bound of a wait, in seconds, unless specified otherwise
+DEFAULT_TIMEOUT = 10
+POLL_FREQUENCY = 0.2
+
+# How long a page must stay unchanged to be considered settled, in seconds
+DEFAULT_SETTLE = 1
+DEFAULT_IDLE = 0.5
+
+COUNT_SCRIPT = """
+var by = arguments[0];
+var value = arguments[1];
+if (by === "xpath") {
+    return document.evaluate(
+        value, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+    ).snapshotLength;
+}
+return document.querySelectorAll(value).length;
+"""
+
+NETWORK_SCRIPT = """
+return [document.readyState, performance.getEntriesByType("resource").length];
+"""
+
+
+def wait_for(driver, condition, timeout=DEFAULT_TIMEOUT, phase="wait"):
+    """
+    Waits until `condition(driver)` returns a truthy value, for at most `timeout`
+    seconds, and records how long it actually waited under `phase`.
+
+    Returns the value of the condition, or None if it timed out.
+    """
+    with metrics.timer(phase):
+        try:
+            return WebDriverWait(driver, timeout, poll_frequency=POLL_FREQUENCY).until(condition)
+        except TimeoutException:
+            return None
+
+
+def wait_for_ready(driver, timeout=DEFAULT_TIMEOUT):
+    return (
+        wait_for(
+            driver,
+            lambda driver: driver.execute_script("return document.readyState") == "complete",
+            timeout,
+            "wait_ready",
+        )
+        is not None
+    )
+
+
+def wait_for_element(driver, by, value, timeout=DEFAULT_TIMEOUT):
+    """
+    Returns the first element located by (by, value) once present, or None.
+    """
+    return wait_for(driver, EC.presence_of_element_located((by, value)), timeout, "wait_element")
+
+
+def wait_for_clickable(driver, by_or_element, value=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Returns an element once clickable, or None. The element is either given,
+    or located by (by, value).
+    """
+    mark = by_or_element if value is None else (by_or_element, value)
+    return wait_for(driver, EC.element_to_be_clickable(mark), timeout, "wait_clickable")
+
+
+def wait_for_frame(driver, by, value, timeout=DEFAULT_TIMEOUT):
+    """
+    Switches to a frame once available. Returns whether it did.
+    """
+    return (
+        wait_for(
+            driver,
+            EC.frame_to_be_available_and_switch_to_it((by, value)),
+            timeout,
+            "wait_frame",
+        )
+        is not None
+    )
+
+
+def wait_for_staleness(driver, element, timeout=DEFAULT_TIMEOUT):
+    """
+    Waits until an element is detached from the page, e.g. replaced by a new page
+    of results. Returns whether it was.
+    """
+    return wait_for(driver, EC.staleness_of(element), timeout, "wait_staleness") is not None
+
+
+def count_elements(driver, by, value):
+    """
+    Returns the number of elements located by a CSS selector, a tag name or an
+    XPath, without being slowed down by the implicit wait of the driver.
+    """
+    return driver.execute_script(COUNT_SCRIPT, "xpath" if by == By.XPATH else "css", value)
+
+
+def wait_for_stable_count(
+    driver, by, value, timeout=DEFAULT_TIMEOUT, settle=DEFAULT_SETTLE, minimum=1
+):
+    """
+    Waits until at least `minimum` elements are located by (by, value) and their
+    number has not changed for `settle` seconds, e.g. for a list loaded by scripts.
+
+    Returns the last number of elements, even if the wait timed out.
+    """
+    state = {"count": None, "since": 0}
+
+    def is_stable(driver):
+        count = count_elements(driver, by, value)
+        now = time.monotonic()
+        if count != state["count"]:
+            state.update(count=count, since=now)
+            return False
+        return count >= minimum and now - state["since"] >= settle
+
+    wait_for(driver, is_stable, timeout, "wait_count")
+    return state["count"] or 0
+
+
+def wait_for_network_idle(driver, timeout=DEFAULT_TIMEOUT, idle=DEFAULT_IDLE):
+    """
+    Waits until the page is loaded and no resource has finished loading for
+    `idle` seconds. Returns whether it did before the timeout.
+    """
+    state = {"count": None, "since": 0}
+
+    def is_idle(driver):
+        ready_state, count = driver.execute_script(NETWORK_SCRIPT)
+        now = time.monotonic()
+        if ready_state != "complete" or count != state["count"]:
+            state.update(count=count, since=now)
+            return False
+        return now - state["since"] >= idle
+
+    return wait_for(driver, is_idle, timeout, "wait_network_idle") is not None
+
+
+def wait_for_url_change(driver, url, timeout=DEFAULT_TIMEOUT):
+    """
+    Waits until the url of the current frame differs from `url`. Returns whether it did.
+    """
+    return (
+        wait_for(
+            driver,
+            lambda driver: driver.execute_script("return window.location.href") != url,
+            timeout,
+            "wait_url",
+        )
+        is not None
+    )
+
+
+def get_url(driver):
+    """
+    Returns the url of the current frame, which `driver.current_url` does not.
+    """
+    return driver.execute_script("return window.location.href")
@@ -0,0 +1,60 @@
+import hashlib
+import json
+import logging
+
+from pathlib import Path
+
+
+class Checkpoint:
+    """
+    Records the sources completed by a run in the `checkpoint` folder of the run's
+    results directory. A resumed run skips the sources found there, their records
+    being already in the run's record stream. Once the run has written its results,
+    it is marked complete and can no longer be resumed.
+    """
+
+    COMPLETE_MARKER = "complete"
+
+    def __init__(self, results_path):
+        self.path = Path(results_path) / "checkpoint"
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def is_resumable(cls, results_path):
+        """
+        Returns whether a run has a checkpoint and was interrupted before completion.
+        """
+        path = Path(results_path) / "checkpoint"
+        return path.is_dir() and not (path / cls.COMPLETE_MARKER).exists()
+
+    def complete(self):
+        """
+        Marks the run as complete, once its results are written.
+        """
+        (self.path / self.COMPLETE_MARKER).touch()
+
+    def get_source_path(self, source):
+        key = f"{source['id']}-{source['url']}-{source.get('filter', '')}"
+        return self.path / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json"
+
+    def is_done(self, source):
+        try:
+            with open(self.get_source_path(source), "r", encoding="utf-8") as file:
+                count = json.load(file)["count"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return False
+
+        logging.info(f"Resuming: {source['url']} already done with {count} records")
+        return True
+
+    def save(self, source, count):
+        """
+        Marks the source as completed. Its records must have been flushed to the
+        record stream beforehand.
+        """
+        path = self.get_source_path(source)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"source": source, "count": count}, file, ensure_ascii=False)
+        # Renaming is atomic, so an interrupted run never leaves a partial checkpoint
+        tmp_path.replace(path)
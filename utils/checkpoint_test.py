@@ -0,0 +1,34 @@
+import logging
+import tempfile
+
+from utils.checkpoint import Checkpoint
+
+
+def run_tests():
+    source = {
+        "id": 1,
+        "url": "https://www.billetweb.fr/multi_event.php?user=1",
+        "filter": "fresque",
+    }
+    other = {**source, "filter": "atelier"}
+
+    with tempfile.TemporaryDirectory() as directory:
+        logging.info("Running completed sources")
+        checkpoint = Checkpoint(directory)
+        if checkpoint.is_done(source):
+            logging.error("Checkpoint: no source should be done yet")
+        checkpoint.save(source, 12)
+        if not Checkpoint(directory).is_done(source):
+            logging.error("Checkpoint: saved source should be done for a resumed run")
+        if checkpoint.is_done(other):
+            logging.error("Checkpoint: sources differing by filter should be told apart")
+
+        logging.info("Running run completion")
+        if not Checkpoint.is_resumable(directory):
+            logging.error("Checkpoint: an interrupted run should be resumable")
+        checkpoint.complete()
+        if Checkpoint.is_resumable(directory):
+            logging.error("Checkpoint: a complete run should not be resumable")
+
+    if Checkpoint.is_resumable(directory):
+        logging.error("Checkpoint: a run without checkpoint should not be resumable")
@@ -4,6 +4,7 @@ import traceback
 from datetime import datetime, timedelta
 from dateutil.parser import parse
 
+from utils import metrics
 from utils.errors import FreskError, FreskDateBadFormat, FreskDateDifferentTimezone
 
 DEFAULT_DURATION = 3
@@ -60,6 +61,7 @@ FRENCH_MONTHS = {
 }
 
 
+@metrics.timed("get_dates")
 def get_dates(event_time):
     try:
         # ===================
@@ -1,5 +1,6 @@
 class FreskError(Exception):
-    pass
+    # Whether the error may not happen again on a later run, e.g. a network failure
+    transient = False
 
 
 class FreskDateNotFound(FreskError):
@@ -40,6 +41,14 @@ class FreskAddressIncomplete(FreskError):
         super().__init__(self.message)
 
 
+class FreskGeocoderUnavailable(FreskError):
+    transient = True
+
+    def __init__(self, input_str: str, reason: str):
+        self.message = f"Geocoder unavailable, retry later (input: {input_str}, reason: {reason})."
+        super().__init__(self.message)
+
+
 class FreskDepartmentNotFound(FreskError):
     def __init__(self, department: str):
         self.message = f"Department {department} not recognized."
@@ -58,3 +67,9 @@ class FreskLanguageNotRecognized(FreskError):
     def __init__(self, language_text: str):
         self.message = f'Language "{language_text}" is not recognized.'
         super().__init__(self.message)
+
+
+class FreskStaticParseError(FreskError):
+    def __init__(self, url: str, reason: str):
+        self.message = f"Unable to parse {url} without a browser ({reason})."
+        super().__init__(self.message)
@@ -0,0 +1,34 @@
+import threading
+import requests
+
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+
+# Maximum number of kept-alive connections to a single host
+MAX_CONNECTIONS_PER_HOST = 4
+
+# Pages are requested as the webdriver would, so that they come in the same language
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0",
+    "Accept-Language": "en-us",
+}
+
+sessions = {}
+sessions_lock = threading.Lock()
+
+
+def get_session(url):
+    """
+    Returns the session dedicated to the host of the url, so that consecutive
+    requests to a host reuse the same kept-alive connections.
+    """
+    host = urlsplit(url).netloc
+    with sessions_lock:
+        if host not in sessions:
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONNECTIONS_PER_HOST)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            sessions[host] = session
+        return sessions[host]
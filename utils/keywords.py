@@ -48,6 +48,13 @@ def is_sold_out(input_string):
     return any(word.lower() in input_string for word in sold_out)
 
 
+def is_sales_ended(input_string):
+    # Only whole statuses match, e.g. not "Presque complet" or a title
+    sales_ended = ["sold out", "sales ended", "ventes terminées", "complet"]
+    input_string = input_string.strip().lower()
+    return any(word.lower() == input_string for word in sales_ended)
+
+
 def is_gift_card(input_string):
     gift = ["cadeau", "don"]
     input_string = input_string.lower()
@@ -1,5 +1,6 @@
 import logging
 
+from utils import metrics
 from utils.errors import FreskLanguageNotRecognized
 from langdetect import detect
 
@@ -23,6 +24,7 @@ LANGUAGE_STRINGS = {
 }
 
 
+@metrics.timed("detect_language_code")
 def detect_language_code(title, description):
     """
     Returns the language code of the language specified in the title if any, otherwise auto-detects from title and description.
@@ -1,7 +1,15 @@
+import fcntl
+import json
 import logging
+import threading
 
+from contextlib import contextmanager
+from pathlib import Path
+
+from utils import metrics
 from utils.errors import *
 
+from geopy.exc import GeocoderRateLimited, GeocoderTimedOut, GeocoderUnavailable
 from geopy.geocoders import Nominatim
 
 geolocator = Nominatim(user_agent="trouver-une-fresque", timeout=10)
@@ -110,9 +118,85 @@ departments = {
     "976": "Mayotte",
 }
 
+# Raw Nominatim results by query, None when nothing was found
 cache = {}
 
+# Scrapers and API handlers may run in different threads, but Nominatim
+# requests must stay sequential.
+geocode_lock = threading.Lock()
+
+# File of the results directory sharing the cache with the worker processes of the
+# run, one JSON line per query, and how far this process has read it. The file is
+# locked while geocoding, so that the requests of all processes stay sequential.
+SHARED_CACHE_FILE = "geocode.jsonl"
+shared_cache_path = None
+shared_cache_offset = 0
+
+
+def share_cache(results_path):
+    """
+    Shares the geocoding cache, and the Nominatim request slot, with the other
+    processes of the run writing to the same results directory.
+    """
+    global shared_cache_path, shared_cache_offset
+    shared_cache_path = Path(results_path) / SHARED_CACHE_FILE
+    shared_cache_offset = 0
+
+
+@contextmanager
+def lock_shared_cache():
+    """
+    Locks the shared cache for the block, after loading the results other
+    processes added to it. Yields a function adding a result to it.
+    """
+    global shared_cache_offset
+    if shared_cache_path is None:
+        yield lambda query, result: None
+        return
+
+    with open(shared_cache_path, "ab+") as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            file.seek(shared_cache_offset)
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Line truncated by a crash
+                    continue
+                cache[entry["query"]] = entry["result"]
+
+            def add(query, result):
+                # Do not glue results to a line truncated by a crash
+                prefix = "\n" if file.seek(0, 2) > 0 and not is_line_end(file) else ""
+                entry = json.dumps({"query": query, "result": result}, ensure_ascii=False)
+                file.write(f"{prefix}{entry}\n".encode("utf-8"))
+                file.flush()
 
+            yield add
+        finally:
+            shared_cache_offset = file.seek(0, 2)
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def is_line_end(file):
+    file.seek(-1, 2)
+    return file.read(1) == b"\n"
+
+
+def geocode(location):
+    """
+    Requests Nominatim for the raw result of a query, raising a transient error
+    when it cannot answer, so that the result is not cached.
+    """
+    try:
+        result = geolocator.geocode(location, addressdetails=True)
+    except (GeocoderRateLimited, GeocoderTimedOut, GeocoderUnavailable) as e:
+        raise FreskGeocoderUnavailable(location, type(e).__name__)
+    return result.raw if result else None
+
+
+@metrics.timed("get_address")
 def get_address(full_location):
     """
     This function requests Nomatim to get structured location data from an
@@ -122,24 +206,27 @@ def get_address(full_location):
         if not full_location:
             raise FreskAddressNotFound("")
 
-        if full_location in cache:
-            location = cache[full_location]
-        else:
-            location = geolocator.geocode(full_location, addressdetails=True)
-            if location is None and "," in full_location:
-                partial_location = full_location.split(",", 1)[1]
-                if partial_location in cache:
-                    location = cache[partial_location]
-                else:
-                    logging.warning(f"Retrying address parse with {partial_location}...")
-                    location = geolocator.geocode(partial_location, addressdetails=True)
-                    cache[partial_location] = location
-            cache[full_location] = location
+        with geocode_lock, lock_shared_cache() as add_shared:
+            if full_location in cache:
+                location = cache[full_location]
+            else:
+                location = geocode(full_location)
+                if location is None and "," in full_location:
+                    partial_location = full_location.split(",", 1)[1]
+                    if partial_location in cache:
+                        location = cache[partial_location]
+                    else:
+                        logging.warning(f"Retrying address parse with {partial_location}...")
+                        location = geocode(partial_location)
+                        cache[partial_location] = location
+                        add_shared(partial_location, location)
+                cache[full_location] = location
+                add_shared(full_location, location)
 
         if location is None:
             raise FreskAddressNotFound(full_location)
 
-        address = location.raw["address"]
+        address = location["address"]
 
         if address["country_code"] != "fr" and address["country_code"] != "ch":
             raise FreskCountryNotSupported(address, full_location)
@@ -201,18 +288,18 @@ def get_address(full_location):
             raise FreskAddressIncomplete(address, full_location, "postcode")
 
     except FreskError as e:
-        logging.error(f"get_address: {e}")
+        logging.error(f"get_address: {e}", extra={"transient": e.transient})
         raise
 
     return {
-        "location_name": location.raw["name"],
+        "location_name": location["name"],
         "address": f"{house_number}{road}",
         "city": city,
         "department": num_department,
         "zip_code": address["postcode"],
         "country_code": address["country_code"],
-        "latitude": location.raw["lat"],
-        "longitude": location.raw["lon"],
+        "latitude": location["lat"],
+        "longitude": location["lon"],
     }
 
 
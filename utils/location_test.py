@@ -0,0 +1,91 @@
+import logging
+import multiprocessing
+import tempfile
+import time
+
+from pathlib import Path
+
+from utils import location
+
+RAW = {
+    "name": "La Cordée",
+    "lat": "45.7597",
+    "lon": "4.8291",
+    "address": {
+        "house_number": "3",
+        "road": "Rue Alphonse Fochier",
+        "city": "Lyon",
+        "county": "Rhône",
+        "postcode": "69002",
+        "country_code": "fr",
+    },
+}
+
+
+class Result:
+    raw = RAW
+
+
+class Geolocator:
+    """
+    Answers every query with the same address, writing when each request starts
+    and ends to a log shared by the processes.
+    """
+
+    def __init__(self, log_path):
+        self.log_path = log_path
+
+    def log(self, line):
+        with open(self.log_path, "a", encoding="utf-8") as file:
+            file.write(f"{line}\n")
+
+    def geocode(self, query, addressdetails=False):
+        self.log("start")
+        time.sleep(0.2)
+        self.log("end")
+        return Result()
+
+
+def geocode_in_worker(results_path, log_path, queries):
+    location.share_cache(results_path)
+    location.geolocator = Geolocator(log_path)
+    for query in queries:
+        location.get_address(query)
+
+
+def run_tests():
+    with tempfile.TemporaryDirectory() as directory:
+        log_path = Path(directory) / "requests.log"
+
+        logging.info("Running requests of concurrent processes")
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            context.Process(
+                target=geocode_in_worker, args=(directory, log_path, [f"{index} Lyon"])
+            )
+            for index in range(3)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        requests = log_path.read_text().split()
+        if requests != ["start", "end"] * 3:
+            logging.error(f"Shared cache: expected sequential requests but got {requests}")
+
+        logging.info("Running cache shared between processes")
+        geolocator, cache = location.geolocator, dict(location.cache)
+        try:
+            location.cache.clear()
+            location.share_cache(directory)
+            location.geolocator = Geolocator(log_path)
+            actual = location.get_address("1 Lyon")
+            if len(log_path.read_text().split()) != 6:
+                logging.error("Shared cache: expected the result of another process")
+            if actual["zip_code"] != "69002" or actual["department"] != "69":
+                logging.error(f"Shared cache: unexpected address {actual}")
+        finally:
+            location.geolocator = geolocator
+            location.cache.clear()
+            location.cache.update(cache)
+            location.shared_cache_path = None
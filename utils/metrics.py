@@ -0,0 +1,168 @@
+import contextvars
+import functools
+import json
+import threading
+import time
+
+from contextlib import contextmanager
+
+# Number of slowest events listed in the summary
+SLOWEST_EVENTS = 20
+
+# Phases counting occurrences instead of timing them, e.g. elements missing from
+# a page. They are summarized apart, by their total count overall and by source.
+COUNTED_PHASES = {"negative_lookup"}
+
+# Samples recorded by the current process: (phase, source, event, seconds)
+samples = []
+samples_lock = threading.Lock()
+
+current_source = contextvars.ContextVar("current_source", default=None)
+current_event = contextvars.ContextVar("current_event", default=None)
+
+
+def set_source(source):
+    """
+    Attributes the following samples of the current thread to a source,
+    and to no event in particular.
+    """
+    current_source.set(source)
+    current_event.set(None)
+
+
+def set_event(event):
+    current_event.set(event)
+
+
+def record(phase, seconds):
+    with samples_lock:
+        samples.append((phase, current_source.get(), current_event.get(), seconds))
+
+
+@contextmanager
+def timer(phase):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - start)
+
+
+def timed(phase):
+    """
+    Decorator recording the duration of each call of a function.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(phase):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(phase, occurrences=1):
+    record(phase, occurrences)
+
+
+def sleep(seconds):
+    with timer("sleep"):
+        time.sleep(seconds)
+
+
+def drain():
+    """
+    Returns the samples recorded so far and forgets them, e.g. to send them
+    from a worker process to the main process.
+    """
+    global samples
+    with samples_lock:
+        drained, samples = samples, []
+    return drained
+
+
+def add(new_samples):
+    with samples_lock:
+        samples.extend(tuple(sample) for sample in new_samples)
+
+
+def percentile(values, q):
+    """
+    Returns the q-th percentile of values, interpolating between the closest ranks.
+    """
+    values = sorted(values)
+    if not values:
+        return 0
+    rank = (len(values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def get_stats(values):
+    return {
+        "count": len(values),
+        "total": round(sum(values), 3),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "max": round(max(values, default=0), 3),
+    }
+
+
+def summarize(all_samples):
+    """
+    Aggregates samples by phase, by source and phase, and by event. Events are
+    summarized by the distribution of their total time in each phase. Counted
+    phases are summed up apart.
+    """
+    phases = {}
+    sources = {}
+    events = {}
+    counts = {}
+    for phase, source, event, seconds in all_samples:
+        if phase in COUNTED_PHASES:
+            phase_counts = counts.setdefault(phase, {"total": 0, "sources": {}})
+            phase_counts["total"] += seconds
+            if source is not None:
+                phase_counts["sources"][source] = phase_counts["sources"].get(source, 0) + seconds
+            continue
+        phases.setdefault(phase, []).append(seconds)
+        if source is not None:
+            sources.setdefault(source, {}).setdefault(phase, []).append(seconds)
+        if event is not None:
+            event_phases = events.setdefault((source, event), {})
+            event_phases[phase] = event_phases.get(phase, 0) + seconds
+
+    event_totals = {}
+    for event_phases in events.values():
+        for phase, seconds in event_phases.items():
+            event_totals.setdefault(phase, []).append(seconds)
+
+    slowest = sorted(events.items(), key=lambda item: sum(item[1].values()), reverse=True)
+
+    return {
+        "phases": {phase: get_stats(values) for phase, values in phases.items()},
+        "sources": {
+            source: {phase: get_stats(values) for phase, values in source_phases.items()}
+            for source, source_phases in sources.items()
+        },
+        "events": {phase: get_stats(values) for phase, values in event_totals.items()},
+        "counts": counts,
+        "slowest_events": [
+            {
+                "source": source,
+                "event": event,
+                "total": round(sum(event_phases.values()), 3),
+                "phases": {phase: round(seconds, 3) for phase, seconds in event_phases.items()},
+            }
+            for (source, event), event_phases in slowest[:SLOWEST_EVENTS]
+        ],
+    }
+
+
+def write_summary(path):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(summarize(drain()), file, ensure_ascii=False, indent=2)
@@ -0,0 +1,48 @@
+import logging
+
+
+from utils import metrics
+
+
+def run_tests():
+    # tuple fields:
+    # 1. Test case name or ID
+    # 2. Input values
+    # 3. Percentile
+    # 4. Expected percentile value
+    test_cases = [
+        ("Median of odd count", [3, 1, 2], 50, 2),
+        ("Median of even count", [1, 2, 3, 4], 50, 2.5),
+        ("p95 interpolated", list(range(1, 101)), 95, 95.05),
+        ("Single value", [7], 95, 7),
+        ("No values", [], 50, 0),
+    ]
+    for test_case in test_cases:
+        logging.info(f"Running {test_case[0]}")
+        actual = metrics.percentile(test_case[1], test_case[2])
+        if abs(actual - test_case[3]) < 1e-9:
+            logging.info("Result matches")
+        else:
+            logging.error(f"{test_case[0]}: expected {test_case[3]} but got {actual}")
+
+    logging.info("Running summary by source and event")
+    summary = metrics.summarize(
+        [
+            ("page_load", "source", "event1", 2.0),
+            ("page_load", "source", "event2", 4.0),
+            ("sleep", "source", "event1", 3.0),
+            ("get_address", None, None, 1.0),
+            ("negative_lookup", "source", "event1", 2),
+            ("negative_lookup", "source", "event2", 1),
+        ]
+    )
+    if summary["phases"]["page_load"]["total"] != 6.0:
+        logging.error(f"Summary: unexpected page_load phase {summary['phases']['page_load']}")
+    if summary["sources"]["source"]["sleep"]["count"] != 1:
+        logging.error(f"Summary: unexpected sleep for source {summary['sources']['source']}")
+    if summary["slowest_events"][0]["event"] != "event1":
+        logging.error(f"Summary: unexpected slowest event {summary['slowest_events'][0]}")
+    if summary["counts"]["negative_lookup"] != {"total": 3, "sources": {"source": 3}}:
+        logging.error(f"Summary: unexpected negative_lookup count {summary['counts']}")
+    if "negative_lookup" in summary["slowest_events"][0]["phases"]:
+        logging.error("Summary: counted phases should be left out of the event totals")
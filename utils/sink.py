@@ -0,0 +1,85 @@
+import fcntl
+import json
+import threading
+import time
+
+# Buffered records are written after this many records or seconds
+FLUSH_EVERY = 20
+FLUSH_INTERVAL = 30
+
+
+class RecordSink:
+    """
+    Appends records to a JSON Lines file as they are scraped, so that a crash only
+    loses the last few records. Writes are buffered and flushed periodically. The
+    file is locked while writing, so several processes can share the same file.
+    """
+
+    def __init__(self, path, flush_every=FLUSH_EVERY, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.count = 0
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+
+    def append(self, record):
+        with self.lock:
+            self.buffer.append(json.dumps(record, ensure_ascii=False, default=str))
+            self.count += 1
+            if (
+                len(self.buffer) >= self.flush_every
+                or time.monotonic() - self.last_flush >= self.flush_interval
+            ):
+                self.write()
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def flush(self):
+        with self.lock:
+            self.write()
+
+    def write(self):
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return
+        data = ("\n".join(self.buffer) + "\n").encode("utf-8")
+        with open(self.path, "ab+") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                # Do not glue records to a line truncated by a crash
+                if file.seek(0, 2) > 0:
+                    file.seek(-1, 2)
+                    if file.read(1) != b"\n":
+                        data = b"\n" + data
+                file.write(data)
+                file.flush()
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+
+
+def read_records(path):
+    """
+    Reads the records of a JSON Lines file. A record appearing several times, e.g.
+    because its source was scraped again after a resume, is kept once with its
+    latest value. A truncated last line, left by a crash, is ignored.
+    """
+    records = {}
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record["id"]] = record
+    except FileNotFoundError:
+        pass
+    return list(records.values())
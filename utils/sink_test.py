@@ -0,0 +1,35 @@
+import logging
+import tempfile
+
+from pathlib import Path
+
+from utils.sink import RecordSink, read_records
+
+
+def run_tests():
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "events.jsonl"
+
+        logging.info("Running buffered writes")
+        sink = RecordSink(path, flush_every=2, flush_interval=3600)
+        sink.append({"id": "a", "title": "first"})
+        if path.exists():
+            logging.error("RecordSink: a single record should stay buffered")
+        sink.append({"id": "b", "title": "second"})
+        if len(read_records(path)) != 2:
+            logging.error(f"RecordSink: expected 2 flushed records in {path.read_text()}")
+
+        logging.info("Running truncated last line")
+        with open(path, "a", encoding="utf-8") as file:
+            file.write('{"id": "c", "tit')
+        sink.extend([{"id": "a", "title": "updated"}])
+        sink.close()
+        records = {record["id"]: record["title"] for record in read_records(path)}
+        if records != {"a": "updated", "b": "second"}:
+            logging.error(f"read_records: unexpected records {records}")
+        if sink.count != 3:
+            logging.error(f"RecordSink: expected 3 appended records but got {sink.count}")
+
+    logging.info("Running missing file")
+    if read_records(Path(directory) / "missing.jsonl") != []:
+        logging.error("read_records: expected no records for a missing file")